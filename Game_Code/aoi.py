@@ -0,0 +1,67 @@
+"""Area-of-interest helpers: who is close enough to a boat to be worth sending.
+
+The world is split into square cells of AOI_CELL_SIZE. A query is the
+bounding box of AOI_RADIUS around the viewer, so a backend can answer it with
+plain x/y range filters, or with an equality/IN filter on the coarse cell key
+when the table has a `cell` column.
+"""
+
+import math
+from config import AOI_RADIUS, AOI_CELL_SIZE, AOI_GRID_STRIDE
+
+
+def cell_of(x, y, cell_size=AOI_CELL_SIZE):
+    return int(math.floor(x / cell_size)), int(math.floor(y / cell_size))
+
+
+def cell_key(x, y, cell_size=AOI_CELL_SIZE):
+    """Single integer key for the cell containing (x, y) (boats never leave the world, so it is >= 0)."""
+    cx, cy = cell_of(x, y, cell_size)
+    return cy * AOI_GRID_STRIDE + cx
+
+
+def bounds_around(x, y, radius=AOI_RADIUS):
+    """(min_x, min_y, max_x, max_y) of the box around a viewer."""
+    return (x - radius, y - radius, x + radius, y + radius)
+
+
+def in_bounds(bounds, x, y):
+    min_x, min_y, max_x, max_y = bounds
+    return min_x <= x <= max_x and min_y <= y <= max_y
+
+
+def cells_in_bounds(bounds, cell_size=AOI_CELL_SIZE):
+    """Every (cx, cy) cell the box touches."""
+    min_x, min_y, max_x, max_y = bounds
+    cx0, cy0 = cell_of(min_x, min_y, cell_size)
+    cx1, cy1 = cell_of(max_x, max_y, cell_size)
+    return [(cx, cy) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1)]
+
+
+def cell_keys_in_bounds(bounds, cell_size=AOI_CELL_SIZE):
+    #cells outside the world can't hold a boat, so leave them out of the query
+    return [cy * AOI_GRID_STRIDE + cx for cx, cy in cells_in_bounds(bounds, cell_size)
+            if cx >= 0 and cy >= 0]
+
+
+class GridIndex:
+    """Buckets rows by cell so a box query only looks at nearby rows."""
+
+    def __init__(self, cell_size=AOI_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (cx, cy) -> [row]
+
+    def add(self, row):
+        cell = cell_of(float(row["x"]), float(row["y"]), self.cell_size)
+        self.cells.setdefault(cell, []).append(row)
+
+    def query(self, bounds):
+        rows = []
+        for cell in cells_in_bounds(bounds, self.cell_size):
+            for row in self.cells.get(cell, ()):
+                if in_bounds(bounds, float(row["x"]), float(row["y"])):
+                    rows.append(row)
+        return rows
+
+    def rows(self):
+        return [row for bucket in self.cells.values() for row in bucket]
@@ -0,0 +1,219 @@
+"""HEADLESS LOAD GENERATOR: HUNDREDS OF BOTS PLAYING OVER THE REAL PROTOCOL
+
+Every bot is a NetworkManager (the game's own networking) driving a headless
+boat through movement.step from random inputs and firing CannonBalls, just
+without a window:
+
+    python bot_swarm.py -n 200 --processes 2 --duration 60 --transport udp
+
+Run the backend (relay_server.py, game_server.py, local_supabase.py, ...)
+first. At the end it reports each bot's send and receive rates, percentiles of
+request round trips, and how old other boats' samples and shots were by the
+time a bot received them. Raise -n until those fall apart to find the lobby
+size the backend (or the clients) can take.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import *
+from movement import BoatState
+import movement
+from cannonball import CannonBall
+from network import NetworkManager
+from telemetry import Histogram
+from transport import create_transport, TRANSPORTS
+
+CannonBall.load_images = False  # only the kinematics, there's no window
+
+#main.py's cannon cooldown: a bot can't fire faster than a player
+FIRE_COOLDOWN = 1.0
+
+
+class Bot:
+    """One headless player: a boat on random inputs, firing now and then."""
+
+    def __init__(self, transport_kind=None, room=ROOM, engine=None, fire_interval=BOT_FIRE_INTERVAL):
+        self.boat = BoatState(random.uniform(1.0, WORLD_WIDTH - 1.0), random.uniform(1.0, WORLD_HEIGHT - 1.0),
+                              random.uniform(0, 2 * math.pi))
+        self.network = NetworkManager(self.boat, transport=create_transport(transport_kind, room=room),
+                                      engine=engine, room=room)
+        self.fire_interval = fire_interval
+        self.move = self.turn = 0.0
+        self.sprint = False
+        self.next_input = 0.0
+        self.next_shot = time.time() + random.uniform(0.0, fire_interval)
+        self.started = time.time()
+
+    def step(self, dt, now):
+        """One frame, in the same order as main.py's game loop."""
+        self.network.reconcile_player()
+        if now >= self.next_input:
+            self.move = random.choice((1.0, 1.0, 1.0, 0.5, 0.0, -1.0))
+            self.turn = random.choice((-1.0, 0.0, 0.0, 1.0))
+            self.sprint = random.random() < 0.2
+            self.next_input = now + random.uniform(*BOT_INPUT_HOLD)
+        movement.step(self.boat, self.move, self.turn, self.sprint, dt)
+        self.network.record_input(dt, self.move, self.turn, self.sprint)
+
+        if self.network.connected and now >= self.next_shot:
+            ball = CannonBall(self.boat.x, self.boat.y, self.boat.rotation, random.choice(("left", "right")))
+            self.network.create_cannonball(ball.to_dict())
+            self.next_shot = now + max(FIRE_COOLDOWN, random.expovariate(1.0 / self.fire_interval))
+
+    def stats(self, now):
+        #everything comes from the NetworkManager's own telemetry
+        elapsed = max(now - self.started, 1e-9)
+        telemetry = self.network.metrics
+        snapshot = telemetry.snapshot()
+        calls = snapshot["endpoints"]
+        sent = sum(calls[e]["count"] for e in ("upsert_player", "send_inputs", "insert_cannonball", "insert_cannonballs")
+                   if e in calls)
+        fetches = sum(calls[e]["count"] for e in ("fetch_world", "fetch_players", "fetch_cannonballs") if e in calls)
+        rows = snapshot["counters"].get("rows_received", 0)
+        return {
+            "player_id": self.network.PLAYER_ID,
+            "connected": self.network.connected,
+            "seconds": elapsed,
+            "sent": sent,
+            "shots": self.network.cannonball_sender.sent,
+            "fetches": fetches,
+            "rows": rows,
+            "errors": sum(call["errors"] for call in calls.values()),
+            "send_rate": sent / elapsed,
+            "recv_rate": rows / elapsed,
+            "visible": len(self.network.snapshot.players),
+            "rtt": telemetry.histogram("rtt").to_dict(),
+            "sample_age": telemetry.histogram("sample_delay").to_dict(),
+            "shot_age": telemetry.histogram("shot_delay").to_dict(),
+        }
+
+
+async def run_swarm(count, duration, transport_kind=None, room=ROOM, engine=None,
+                    fire_interval=BOT_FIRE_INTERVAL, tick_rate=BOT_TICK_RATE):
+    """Run count bots for duration seconds on this event loop. Returns their stats."""
+    if (engine or NETWORK_ENGINE) == "asyncio":
+        #blocking transports run their calls on the default executor; give every bot room there
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=min(256, 2 * count)))
+
+    bots = []
+    for _ in range(count):
+        bots.append(Bot(transport_kind, room, engine, fire_interval))
+        await asyncio.sleep(0)  # let the ones already in start talking
+
+    dt = 1.0 / tick_rate
+    end = time.time() + duration
+    last = time.time()
+    while time.time() < end:
+        now = time.time()
+        frame_dt = min(now - last, INPUT_MAX_DT)
+        last = now
+        for bot in bots:
+            bot.step(frame_dt, now)
+        await asyncio.sleep(max(0.0, now + dt - time.time()))
+
+    now = time.time()
+    stats = [bot.stats(now) for bot in bots]
+    for bot in bots:
+        bot.network.stop()
+    return stats
+
+
+def _worker(queue, count, args):
+    #every NetworkManager prints as it goes; a few hundred of them would bury the report
+    output = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+        stats = asyncio.run(run_swarm(count, args.duration, args.transport, args.room, args.engine,
+                                      args.fire_interval, args.tick_rate))
+    queue.put(stats)
+
+
+def report(stats, duration, per_bot=False):
+    def ms(hist, p):
+        return hist.percentile(p) * 1000
+
+    rtt, sample_age, shot_age = Histogram(), Histogram(), Histogram()
+    for bot in stats:
+        bot["rtt"] = Histogram.from_dict(bot["rtt"])
+        bot["sample_age"] = Histogram.from_dict(bot["sample_age"])
+        bot["shot_age"] = Histogram.from_dict(bot["shot_age"])
+        rtt.merge(bot["rtt"])
+        sample_age.merge(bot["sample_age"])
+        shot_age.merge(bot["shot_age"])
+
+    if per_bot:
+        print(f"{'bot':>8} {'sent/s':>7} {'rows/s':>8} {'seen':>5} {'err':>4} "
+              f"{'rtt p50':>8} {'rtt p99':>8} {'age p50':>8} {'age p99':>8}")
+        for bot in stats:
+            print(f"{bot['player_id'][:8]:>8} {bot['send_rate']:7.1f} {bot['recv_rate']:8.1f} {bot['visible']:5d} "
+                  f"{bot['errors']:4d} {ms(bot['rtt'], 50):7.1f}ms {ms(bot['rtt'], 99):7.1f}ms "
+                  f"{ms(bot['sample_age'], 50):7.1f}ms {ms(bot['sample_age'], 99):7.1f}ms")
+        print()
+
+    send_rates = sorted(bot["send_rate"] for bot in stats)
+    recv_rates = sorted(bot["recv_rate"] for bot in stats)
+    connected = sum(bot["connected"] for bot in stats)
+    print(f"📊 {len(stats)} bots for {duration:.0f}s, {connected} still connected, "
+          f"{sum(bot['errors'] for bot in stats)} errors, {sum(bot['shots'] for bot in stats)} shots")
+    if stats:
+        print(f"   send/s per bot:    min {send_rates[0]:.1f}  median {send_rates[len(stats) // 2]:.1f}  max {send_rates[-1]:.1f}")
+        print(f"   rows/s per bot:    min {recv_rates[0]:.1f}  median {recv_rates[len(stats) // 2]:.1f}  max {recv_rates[-1]:.1f}")
+    for name, hist in (("request rtt", rtt), ("boat sample age", sample_age), ("shot age", shot_age)):
+        print(f"   {name + ':':<19}p50 {ms(hist, 50):.1f}ms  p90 {ms(hist, 90):.1f}ms  "
+              f"p99 {ms(hist, 99):.1f}ms  max {hist.max * 1000:.1f}ms  ({hist.count} samples)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Boat Man Shooters headless bot swarm")
+    parser.add_argument("-n", "--bots", type=int, default=100, help="how many bots in all (default 100)")
+    parser.add_argument("-p", "--processes", type=int, default=1, help="split the bots over this many processes")
+    parser.add_argument("-d", "--duration", type=float, default=30.0, help="seconds to play for")
+    parser.add_argument("--transport", choices=list(TRANSPORTS), help="backend (default BMS_TRANSPORT)")
+    parser.add_argument("--room", default=ROOM)
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="asyncio",
+                        help="NetworkManager engine; asyncio (default) runs every bot on one event loop per process")
+    parser.add_argument("--fire-interval", type=float, default=BOT_FIRE_INTERVAL, help="mean seconds between a bot's shots")
+    parser.add_argument("--tick-rate", type=float, default=BOT_TICK_RATE, help="bot frames per second")
+    parser.add_argument("--per-bot", action="store_true", help="print a line for every bot")
+    parser.add_argument("--json", help="also write every bot's stats to this file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="keep the bots' own output")
+    args = parser.parse_args()
+
+    processes = max(1, min(args.processes, args.bots))
+    print(f"🤖 Starting {args.bots} bots in {processes} process(es) for {args.duration:.0f}s...")
+    queue = multiprocessing.Queue()
+    workers = []
+    for i in range(processes):
+        count = args.bots // processes + (1 if i < args.bots % processes else 0)
+        worker = multiprocessing.Process(target=_worker, args=(queue, count, args))
+        worker.start()
+        workers.append(worker)
+
+    stats = []
+    results = 0
+    while results < len(workers):
+        try:
+            stats.extend(queue.get(timeout=1.0))
+            results += 1
+        except Exception:
+            #queue.Empty: carry on unless a worker died without answering
+            if not any(worker.is_alive() for worker in workers) and queue.empty():
+                print(f"❌ {len(workers) - results} bot process(es) died early")
+                break
+    for worker in workers:
+        worker.join()
+
+    report(stats, args.duration, args.per_bot)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([dict(bot, rtt=bot["rtt"].to_dict(), sample_age=bot["sample_age"].to_dict(),
+                            shot_age=bot["shot_age"].to_dict()) for bot in stats], f, indent=1)
+        print(f"✅ Wrote per-bot stats to {args.json}")
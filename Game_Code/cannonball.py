@@ -4,6 +4,7 @@ import time
 from datetime import datetime
 import os
 import sys
+from config import CANNONBALL_LIFETIME
 
 
 class CannonBall:
@@ -11,6 +12,8 @@ class CannonBall:
     _base_image = None
     _enemy_image = None
     _logged_enemy_image = False
+    #the dedicated server turns this off: it only needs the kinematics
+    load_images = True
 
     @staticmethod
     def _resolve_asset_path(rel_path: str) -> str:
@@ -92,7 +95,7 @@ class CannonBall:
         self.rotation = rotation
         self.side = side
         self.speed = 1.2
-        self.lifetime = 5.0
+        self.lifetime = CANNONBALL_LIFETIME
         self.server_id = server_id
         self.is_remote = is_remote
 
@@ -115,10 +118,11 @@ class CannonBall:
 
         # use cached image and keep a per-instance copy for alpha adjustments
         # remote (enemy) cannonballs use the red enemy image
-        if is_remote:
-            self.image = self._get_enemy_image().copy()
-        else:
-            self.image = self._get_base_image().copy()
+        if self.load_images:
+            if is_remote:
+                self.image = self._get_enemy_image().copy()
+            else:
+                self.image = self._get_base_image().copy()
 
         offset_distance = 0.18
         angle_offset = 1.5 if side == "left" else -1.5
@@ -0,0 +1,425 @@
+"""PUSH-BASED CHANGE STREAMING FOR THE PLAYERS, CANNONBALLS AND CHAT TABLES
+
+Instead of polling the tables, a client holds one WebSocket open and the
+backend pushes every INSERT, UPDATE and DELETE as it happens. It uses the same
+protocol as Supabase Realtime's Postgres changes (Phoenix channels: phx_join,
+heartbeat, postgres_changes). ChangeFeed works against the hosted project
+(SUPABASE_SUBSCRIBE) and against ChangeFeedServer, a local stand-in with
+in-memory tables for tests and benchmarks:
+
+    python changefeed.py --port 4000
+
+and start the game with BMS_TRANSPORT=feed. An idle lobby costs one heartbeat
+every CHANGEFEED_HEARTBEAT seconds, and a new shot reaches the other clients
+one hop after it is written.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import socket
+import time
+from collections import deque, namedtuple
+from threading import Thread, Event, Lock
+from config import *
+import aoi
+import websock
+
+#one row change, as Postgres reports it (old is just the primary key on DELETE)
+Change = namedtuple("Change", ["table", "type", "record", "old"])
+
+#primary key of each table
+KEYS = {"players": "player_id", "cannonballs": "id", "chat": "id"}
+#the backend-stamped time column of each table the cache ages rows out of
+STAMPS = {"players": "updated_at", "cannonballs": "created_at"}
+
+
+def _frame(topic, event, payload, ref=None):
+    return json.dumps({"topic": topic, "event": event, "payload": payload, "ref": ref},
+                      separators=(",", ":"))
+
+
+def _timestamp():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _matches(row, flt):
+    """Check a row against a Realtime filter such as "room=eq.lobby" (only eq is used)."""
+    if not flt:
+        return True
+    column, _, rest = flt.partition("=")
+    op, _, value = rest.partition(".")
+    return op == "eq" and str(row.get(column)) == value
+
+
+class ChangeFeed:
+    """One channel subscribed to postgres_changes on some tables.
+
+    on_change(Change) is called from the reader thread for every change.
+    """
+
+    def __init__(self, url, tables, on_change, filters=None, token=None, topic="realtime:game"):
+        self.url = url
+        self.tables = tables
+        self.filters = filters or {}  # table -> filter such as "room=eq.lobby"
+        self.on_change = on_change
+        self.token = token
+        self.topic = topic
+        self.ws = None
+        self._refs = itertools.count(1)
+        self._pending = {}  # ref -> [Event, reply payload]
+        self._lock = Lock()
+        self._stopped = Event()
+
+        #counters
+        self.changes = 0
+        self.messages = 0
+        self.bytes_in = 0
+
+    @property
+    def alive(self):
+        return self.ws is not None and not self._stopped.is_set()
+
+    def connect(self, timeout=CHANGEFEED_CONNECT_TIMEOUT):
+        """Open the socket and join the channel; raises if the backend says no."""
+        self.ws = websock.connect(self.url, timeout)
+        self._stopped.clear()
+        Thread(target=self._reader, daemon=True).start()
+        config = {"postgres_changes": [
+            dict({"event": "*", "schema": "public", "table": table},
+                 **({"filter": self.filters[table]} if self.filters.get(table) else {}))
+            for table in self.tables
+        ]}
+        payload = {"config": config}
+        if self.token:
+            payload["access_token"] = self.token
+        reply = self.call("phx_join", payload, timeout)
+        if reply is None or reply.get("status") != "ok":
+            self.close()
+            raise ConnectionError(f"change feed join refused: {reply}")
+        Thread(target=self._heartbeat, daemon=True).start()
+
+    def close(self):
+        self._stopped.set()
+        if self.ws is not None:
+            self.ws.close()
+
+    def send(self, event, payload, topic=None):
+        self.ws.send(_frame(topic or self.topic, event, payload, str(next(self._refs))))
+
+    def call(self, event, payload, timeout=CHANGEFEED_CONNECT_TIMEOUT, topic=None):
+        """Send event and wait for its phx_reply payload (None on timeout)."""
+        ref = str(next(self._refs))
+        waiter = [Event(), None]
+        with self._lock:
+            self._pending[ref] = waiter
+        try:
+            self.ws.send(_frame(topic or self.topic, event, payload, ref))
+            waiter[0].wait(timeout)
+        finally:
+            with self._lock:
+                self._pending.pop(ref, None)
+        return waiter[1]
+
+    def _heartbeat(self):
+        #the server drops sockets that stay silent, so say something now and then
+        while not self._stopped.wait(CHANGEFEED_HEARTBEAT):
+            try:
+                self.send("heartbeat", {}, topic="phoenix")
+            except OSError:
+                break
+
+    def _reader(self):
+        try:
+            while not self._stopped.is_set():
+                data = self.ws.recv()
+                if data is None:
+                    break
+                self.messages += 1
+                self.bytes_in += len(data)
+                msg = json.loads(data)
+                event = msg.get("event")
+                payload = msg.get("payload") or {}
+                if event == "postgres_changes":
+                    data = payload.get("data") or {}
+                    self.changes += 1
+                    self.on_change(Change(data.get("table"), data.get("type"),
+                                          data.get("record") or {}, data.get("old_record") or {}))
+                elif event == "phx_reply":
+                    with self._lock:
+                        waiter = self._pending.get(msg.get("ref"))
+                    if waiter:
+                        waiter[1] = payload
+                        waiter[0].set()
+                elif event in ("phx_error", "phx_close"):
+                    print(f"❌ Change feed channel closed: {payload}")
+                    break
+        except (OSError, ConnectionError, ValueError, websock.WebSocketError) as e:
+            if not self._stopped.is_set():
+                print(f"❌ Change feed lost: {e}")
+        finally:
+            self._stopped.set()
+
+
+class ChangeCache:
+    """Local copy of the rows a ChangeFeed reports, queried like the tables."""
+
+    def __init__(self):
+        self.tables = {name: {} for name in KEYS}
+        self.removed = deque(maxlen=CANNONBALL_QUEUE_SIZE * 4)  # cannonball ids deleted since take_removed
+        self.listener = None  # called (from the feed thread) after each change
+        #newest updated_at/created_at seen: rows age out on the clock that stamped them, not ours
+        self.latest = 0.0
+        self._lock = Lock()
+        self._wakeup = None  # asyncio.Event for wait()
+
+    def apply(self, change):
+        key = KEYS.get(change.table)
+        if key is None:
+            return
+        with self._lock:
+            rows = self.tables[change.table]
+            if change.type == "DELETE":
+                pk = change.old.get(key)
+                if rows.pop(pk, None) is not None and change.table == "cannonballs":
+                    self.removed.append(pk)
+            else:
+                rows[change.record[key]] = change.record
+                self._saw(change.table, change.record)
+        if self.listener:
+            self.listener()
+
+    async def wait(self, timeout):
+        """Wait until a change lands (True) or timeout passes (False)."""
+        if self._wakeup is None:
+            loop = asyncio.get_running_loop()
+            wakeup = self._wakeup = asyncio.Event()
+            self.listener = lambda: loop.call_soon_threadsafe(wakeup.set)
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._wakeup.clear()
+
+    def load(self, table, rows):
+        """Seed a table from a one-off select."""
+        with self._lock:
+            for row in rows:
+                self.tables[table][row[KEYS[table]]] = row
+                self._saw(table, row)
+
+    def _saw(self, table, row):
+        if table not in STAMPS:
+            return
+        stamp = row.get(STAMPS[table])
+        if isinstance(stamp, (int, float)) and stamp > self.latest:
+            self.latest = float(stamp)
+
+    def players_since(self, since, bounds=None):
+        with self._lock:
+            #boats that left without a DELETE (crashed) age out
+            cutoff = self.latest - PLAYER_STALE_TIMEOUT
+            players = self.tables["players"]
+            for pid in [k for k, row in players.items() if float(row.get("updated_at") or 0.0) < cutoff]:
+                del players[pid]
+            rows = [row for row in players.values() if float(row.get("updated_at") or 0.0) > since
+                    and (not bounds or aoi.in_bounds(bounds, float(row["x"]), float(row["y"])))]
+        return sorted(rows, key=lambda row: row["updated_at"])
+
+    def cannonballs_since(self, since, exclude_player_id=None):
+        with self._lock:
+            cannonballs = self.tables["cannonballs"]
+            cutoff = self.latest - CANNONBALL_RETENTION
+            for cb_id in [k for k, row in cannonballs.items() if row["created_at"] < cutoff]:
+                del cannonballs[cb_id]
+            rows = [row for row in cannonballs.values()
+                    if row["created_at"] >= since and row.get("player_id") != exclude_player_id]
+        return sorted(rows, key=lambda row: row["created_at"])
+
+    def take_removed(self):
+        with self._lock:
+            removed = tuple(self.removed)
+            self.removed.clear()
+        return removed
+
+    def chats(self):
+        with self._lock:
+            return list(self.tables["chat"].values())
+
+
+class ChangeFeedServer:
+    """Local stand-in for Supabase Realtime with in-memory tables.
+
+    Besides the Realtime protocol it answers three events on a joined channel,
+    so a client can use it as its whole backend: "write" ({"table", "type":
+    INSERT/UPSERT/DELETE, "record" or "match"}), "select" ({"table"}) and "now".
+    Code in the same process can write with write(). With port=None it opens
+    no socket of its own, and another server hands it websockets with serve().
+    """
+
+    def __init__(self, host="127.0.0.1", port=CHANGEFEED_PORT):
+        self.sock = None
+        self.url = None
+        if port is not None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind((host, port))
+            self.sock.listen()
+            self.address = self.sock.getsockname()
+            self.url = f"ws://{self.address[0]}:{self.address[1]}/realtime/v1/websocket"
+        self.running = port is None
+        self.tables = {name: {} for name in KEYS}
+        self._lock = Lock()
+        self._subscribers = []  # (ws, topic, {table: filter})
+
+        #counters
+        self.changes_out = 0
+        self.writes = 0
+
+    def start(self):
+        """Serve on a background thread (handy for local tests and benchmarks)."""
+        self.running = True
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        try:
+            if self.sock:
+                self.sock.close()
+        except OSError:
+            pass
+
+    def serve_forever(self):
+        self.running = True
+        print(f"📡 Change feed listening on {self.url}")
+        while self.running:
+            try:
+                conn, addr = self.sock.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+
+    def _serve_client(self, conn):
+        try:
+            ws, path = websock.accept(conn)
+        except (OSError, ConnectionError, websock.WebSocketError) as e:
+            print(f"❌ Bad change feed connection: {e}")
+            conn.close()
+            return
+        self.serve(ws)
+
+    def serve(self, ws):
+        """Talk the Realtime protocol on one websocket until it closes."""
+        try:
+            while self.running:
+                data = ws.recv()
+                if data is None:
+                    break
+                msg = json.loads(data)
+                self._handle(ws, msg)
+        except (OSError, ConnectionError, ValueError, KeyError, websock.WebSocketError):
+            pass
+        finally:
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s[0] is not ws]
+            ws.close()
+
+    def _reply(self, ws, msg, response=None, status="ok"):
+        ws.send(_frame(msg["topic"], "phx_reply", {"status": status, "response": response or {}}, msg.get("ref")))
+
+    def _handle(self, ws, msg):
+        event = msg.get("event")
+        payload = msg.get("payload") or {}
+        if event == "heartbeat":
+            self._reply(ws, msg)
+        elif event == "phx_join":
+            wanted = payload.get("config", {}).get("postgres_changes", [])
+            subscriptions = {entry["table"]: entry.get("filter") for entry in wanted if entry.get("table") in KEYS}
+            with self._lock:
+                self._subscribers.append((ws, msg["topic"], subscriptions))
+            self._reply(ws, msg, {"postgres_changes": [dict(entry, id=i) for i, entry in enumerate(wanted)]})
+        elif event == "phx_leave":
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if not (s[0] is ws and s[1] == msg["topic"])]
+            self._reply(ws, msg)
+        elif event == "write":
+            self.write(payload["table"], payload["type"], payload.get("record"), payload.get("match"))
+            self._reply(ws, msg)
+        elif event == "select":
+            self._reply(ws, msg, {"rows": self.rows(payload["table"])})
+        elif event == "now":
+            self._reply(ws, msg, {"time": time.time()})
+        else:
+            self._reply(ws, msg, {"reason": f"unknown event {event}"}, status="error")
+
+    def rows(self, table):
+        """A copy of every row in a table."""
+        with self._lock:
+            return list(self.tables[table].values())
+
+    def write(self, table, kind, record=None, match=None):
+        """Apply one write to the tables and push the changes it makes to subscribers.
+
+        match picks the rows a DELETE removes: {column: value} or a function of
+        the row. Returns the changes (a DELETE's record is the row it removed);
+        an INSERT of a key that already exists changes nothing.
+        """
+        key = KEYS[table]
+        changes = []
+        with self._lock:
+            rows = self.tables[table]
+            if kind == "DELETE":
+                if not callable(match):
+                    wanted = match or {}
+                    match = lambda row: all(row.get(c) == v for c, v in wanted.items())
+                for pk in [k for k, row in rows.items() if match(row)]:
+                    changes.append(Change(table, "DELETE", rows.pop(pk), {key: pk}))
+            else:
+                old = rows.get(record[key])
+                if kind == "INSERT" and old is not None:
+                    return []  # duplicate key
+                if old is not None:
+                    record = dict(old, **record)
+                rows[record[key]] = record
+                changes.append(Change(table, "UPDATE" if old is not None else "INSERT", record,
+                                      {key: record[key]} if old is not None else {}))
+            self.writes += 1
+            subscribers = list(self._subscribers)
+        for change in changes:
+            self._push(change, subscribers)
+        return changes
+
+    def _push(self, change, subscribers):
+        #a delete only reports the key, as Postgres does
+        record = {} if change.type == "DELETE" else change.record
+        data = {"schema": "public", "table": change.table, "type": change.type,
+                "commit_timestamp": _timestamp(), "record": record, "old_record": change.old}
+        for ws, topic, subscriptions in subscribers:
+            if change.table not in subscriptions:
+                continue
+            #like Realtime, filters don't apply to deletes (there's only the key to filter on)
+            if change.type != "DELETE" and not _matches(change.record, subscriptions[change.table]):
+                continue
+            try:
+                ws.send(_frame(topic, "postgres_changes", {"ids": [0], "data": data}))
+                self.changes_out += 1
+            except OSError:
+                pass  # its reader thread cleans it up
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Boat Man Shooters local change feed (Supabase Realtime stand-in)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=CHANGEFEED_PORT)
+    args = parser.parse_args()
+
+    server = ChangeFeedServer(args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Change feed stopped")
@@ -0,0 +1,80 @@
+"""Estimates the offset (and drift) between this machine's clock and the backend's.
+
+Timestamps that cross the network (player updated_at, cannonball created_at)
+are written in backend time and converted back to local time on arrival, so a
+client whose clock is a few seconds out no longer shifts everyone else's boats
+and shots.
+"""
+
+import time
+from collections import deque
+from config import CLOCK_SYNC_WINDOW, CLOCK_MAX_DRIFT, CLOCK_DRIFT_MIN_SPAN
+
+
+class ClockSync:
+    """NTP-style estimator fed with (t0, t1, t2, t3) probe samples.
+
+    t0/t3 are when the probe left and its answer came back (local clock), t1/t2
+    when the backend received and answered it (backend clock). Queueing delay
+    only ever makes a sample worse, so only the lower-RTT half of the recent
+    samples is used: their mean offset, plus a least-squares drift once they
+    span CLOCK_DRIFT_MIN_SPAN seconds.
+    """
+
+    def __init__(self, window=CLOCK_SYNC_WINDOW):
+        self.samples = deque(maxlen=window)  # (local midpoint, offset, rtt)
+        self.offset = 0.0  # backend - local, at ref
+        self.drift = 0.0  # seconds of offset gained per local second
+        self.ref = 0.0
+        self.rtt = None
+        self.synced = False
+
+    def add_sample(self, t0, t1, t2, t3):
+        rtt = (t3 - t0) - (t2 - t1)
+        if rtt < 0:
+            return False
+        offset = ((t1 - t0) + (t2 - t3)) / 2.0
+        self.samples.append((t0 + (t3 - t0) / 2.0, offset, rtt))
+        self._fit()
+        return True
+
+    def _fit(self):
+        best = sorted(self.samples, key=lambda s: s[2])[:max(1, (len(self.samples) + 1) // 2)]
+        n = len(best)
+        ref = sum(s[0] for s in best) / n
+        offset = sum(s[1] for s in best) / n
+
+        drift = 0.0
+        span = max(s[0] for s in best) - min(s[0] for s in best)
+        if n >= 3 and span >= CLOCK_DRIFT_MIN_SPAN:
+            var = sum((s[0] - ref) ** 2 for s in best)
+            drift = sum((s[0] - ref) * (s[1] - offset) for s in best) / var
+            drift = max(-CLOCK_MAX_DRIFT, min(CLOCK_MAX_DRIFT, drift))
+
+        self.ref = ref
+        self.offset = offset
+        self.drift = drift
+        self.rtt = best[0][2]
+        self.synced = True
+
+    def offset_at(self, local):
+        return self.offset + self.drift * (local - self.ref)
+
+    def to_server(self, local):
+        return local + self.offset_at(local)
+
+    def to_local(self, server):
+        #offset_at wants local time; the error from passing server time is drift * offset, i.e. nothing
+        return server - self.offset_at(server)
+
+    def server_time(self):
+        return self.to_server(time.time())
+
+    def stats(self):
+        return {
+            "synced": self.synced,
+            "offset": self.offset_at(time.time()),
+            "drift_ppm": self.drift * 1e6,
+            "rtt": self.rtt,
+            "samples": len(self.samples),
+        }
@@ -0,0 +1,504 @@
+"""Binary wire format for player and cannonball state.
+
+Positions are quantized to 16 bits over the world (plus a margin for shots
+that fly off the edge), rotation to 16 bits over a full turn, and entity ids
+are interned to 16-bit handles the first time they are sent. World snapshots
+are delta-encoded against the last snapshot the receiver acknowledged, so an
+idle boat costs nothing on the wire.
+"""
+
+import math
+import struct
+import uuid
+from config import WORLD_WIDTH, WORLD_HEIGHT
+
+#packet types (JSON control messages start with "{" so they never collide)
+SNAPSHOT = 0x01
+PLAYER_UPDATE = 0x02
+CANNONBALL = 0x03
+ACK = 0x04
+INPUTS = 0x05
+STATE = 0x06
+
+NO_BASELINE = 0xFFFFFFFF
+POSITION_MARGIN = 8.0
+VELOCITY_SCALE = 1000.0
+MAX_AGE_MS = 0xFFFF
+SIDES = ("left", "right")
+
+#player field mask bits
+FIELD_X = 0x01
+FIELD_Y = 0x02
+FIELD_ROT = 0x04
+FIELD_TS = 0x08
+ALL_FIELDS = FIELD_X | FIELD_Y | FIELD_ROT | FIELD_TS
+
+_HEADER = struct.Struct("<BIIdHHHH")
+_INTERN = struct.Struct("<HB")
+_PLAYER = struct.Struct("<HB")
+_U16 = struct.Struct("<H")
+_CANNONBALL = struct.Struct("<HHHHHhhBH")
+_PLAYER_UPDATE = struct.Struct("<B16sHHHdB")
+_CANNONBALL_UPDATE = struct.Struct("<B16s16sHHHhhBdH")
+_ACK = struct.Struct("<BI")
+_INPUTS = struct.Struct("<B16sH")
+_INPUT = struct.Struct("<IdddB")
+_STATE = struct.Struct("<BI16s7d")
+
+
+class CodecError(Exception):
+    pass
+
+
+#quantization helpers
+def quantize_x(x):
+    return _quantize(x, WORLD_WIDTH)
+
+
+def quantize_y(y):
+    return _quantize(y, WORLD_HEIGHT)
+
+
+def dequantize_x(q):
+    return _dequantize(q, WORLD_WIDTH)
+
+
+def dequantize_y(q):
+    return _dequantize(q, WORLD_HEIGHT)
+
+
+def _quantize(v, size):
+    span = size + 2 * POSITION_MARGIN
+    t = (v + POSITION_MARGIN) / span
+    return int(round(max(0.0, min(1.0, t)) * 0xFFFF))
+
+
+def _dequantize(q, size):
+    span = size + 2 * POSITION_MARGIN
+    return q / 0xFFFF * span - POSITION_MARGIN
+
+
+def quantize_rotation(rot):
+    return int(round((rot % (2 * math.pi)) / (2 * math.pi) * 0x10000)) & 0xFFFF
+
+
+def dequantize_rotation(q):
+    return q / 0x10000 * 2 * math.pi
+
+
+def quantize_velocity(v):
+    return int(max(-0x8000, min(0x7FFF, round(v * VELOCITY_SCALE))))
+
+
+def _age_ms(base_time, ts):
+    return int(max(0, min(MAX_AGE_MS, round((base_time - ts) * 1000.0))))
+
+
+def _id_bytes(key):
+    return uuid.UUID(key).bytes
+
+
+def _id_str(raw):
+    return str(uuid.UUID(bytes=raw))
+
+
+class IdTable:
+    """Interns string ids (UUIDs) to small integer handles and back."""
+
+    def __init__(self):
+        self.by_key = {}
+        self.by_handle = {}
+        self._free = []
+        self._next = 0
+
+    def intern(self, key):
+        handle = self.by_key.get(key)
+        if handle is None:
+            if self._free:
+                handle = self._free.pop()
+            elif self._next <= 0xFFFF:
+                handle = self._next
+                self._next += 1
+            else:
+                raise CodecError("id table full")
+            self.by_key[key] = handle
+            self.by_handle[handle] = key
+        return handle
+
+    def release(self, key):
+        handle = self.by_key.pop(key, None)
+        if handle is not None:
+            del self.by_handle[handle]
+            self._free.append(handle)
+        return handle
+
+    def assign(self, handle, key):
+        """Receiver side: record a handle the sender interned."""
+        old = self.by_handle.get(handle)
+        if old is not None and old != key:
+            self.by_key.pop(old, None)
+        self.by_handle[handle] = key
+        self.by_key[key] = handle
+
+    def lookup(self, handle):
+        return self.by_handle.get(handle)
+
+    def __len__(self):
+        return len(self.by_key)
+
+
+class SnapshotEncoder:
+    """Sender half of a snapshot stream (one per receiver)."""
+
+    def __init__(self, history=32):
+        self.history = history
+        self.ids = IdTable()
+        self.seq = 0
+        self.acked_seq = None
+        self.sent = {}  # seq -> (players {handle: (qx, qy, qrot, ts)}, cannonball handles, interned handles)
+        self.known = set()  # handles the receiver has acknowledged an intern for
+
+    def ack(self, seq):
+        if seq not in self.sent or (self.acked_seq is not None and seq <= self.acked_seq):
+            return
+        self.acked_seq = seq
+        self.known |= self.sent[seq][2]
+        for old in [s for s in self.sent if s < seq]:
+            del self.sent[old]
+
+    def _baseline(self):
+        if self.acked_seq is None or self.seq - self.acked_seq >= self.history:
+            return None
+        return self.sent.get(self.acked_seq)
+
+    def encode(self, players, cannonballs, now):
+        """Encode player and cannonball rows (the same dicts the tables hold) as one snapshot packet."""
+        self.seq += 1
+        seq = self.seq
+        baseline = self._baseline()
+        base_players, base_cannonballs = (baseline[0], baseline[1]) if baseline else ({}, set())
+
+        names = {}
+        interns = []
+        player_records = []
+        cannonball_records = []
+        state = {}
+        live_cannonballs = set()
+
+        def handle_for(key, name=""):
+            handle = self.ids.intern(key)
+            if handle not in self.known and handle not in names:
+                names[handle] = name
+                interns.append((handle, key, name))
+            return handle
+
+        for row in players:
+            handle = handle_for(row["player_id"], row.get("player_name", ""))
+            ts = float(row["updated_at"])
+            value = (quantize_x(float(row["x"])), quantize_y(float(row["y"])),
+                     quantize_rotation(float(row["rotation"])), ts)
+            state[handle] = value
+
+            old = base_players.get(handle)
+            mask = ALL_FIELDS
+            if old is not None:
+                mask = 0
+                for bit, a, b in ((FIELD_X, old[0], value[0]), (FIELD_Y, old[1], value[1]),
+                                  (FIELD_ROT, old[2], value[2]), (FIELD_TS, old[3], value[3])):
+                    if a != b:
+                        mask |= bit
+                if not mask:
+                    continue
+            player_records.append((handle, mask, value))
+
+        for row in cannonballs:
+            handle = handle_for(row["id"])
+            live_cannonballs.add(handle)
+            if handle in base_cannonballs:
+                continue
+            owner = handle_for(row["player_id"])
+            cannonball_records.append(_CANNONBALL.pack(
+                handle, owner,
+                quantize_x(float(row["x"])), quantize_y(float(row["y"])),
+                quantize_rotation(float(row["rotation"])),
+                quantize_velocity(float(row["velocity_x"])), quantize_velocity(float(row["velocity_y"])),
+                SIDES.index(row["side"]),
+                _age_ms(now, float(row["created_at"])),
+            ))
+
+        removed = [h for h in base_players if h not in state]
+        removed += [h for h in base_cannonballs if h not in live_cannonballs]
+
+        parts = [_HEADER.pack(SNAPSHOT, seq, self.acked_seq if baseline else NO_BASELINE, now,
+                              len(interns), len(player_records), len(cannonball_records), len(removed))]
+        for handle, key, name in interns:
+            raw = _id_bytes(key)
+            name_raw = name.encode()[:255]
+            parts.append(_INTERN.pack(handle, len(name_raw)))
+            parts.append(raw)
+            parts.append(name_raw)
+        for handle, mask, value in player_records:
+            parts.append(_PLAYER.pack(handle, mask))
+            if mask & FIELD_X:
+                parts.append(_U16.pack(value[0]))
+            if mask & FIELD_Y:
+                parts.append(_U16.pack(value[1]))
+            if mask & FIELD_ROT:
+                parts.append(_U16.pack(value[2]))
+            if mask & FIELD_TS:
+                parts.append(_U16.pack(_age_ms(now, value[3])))
+        parts.extend(cannonball_records)
+        for handle in removed:
+            parts.append(_U16.pack(handle))
+
+        self.sent[seq] = (state, live_cannonballs, set(names))
+        self._release_unused()
+        return b"".join(parts)
+
+    def _release_unused(self):
+        #free handles no retained snapshot refers to so long sessions don't run out
+        if len(self.ids) < 0x8000:
+            return
+        in_use = set()
+        for players, cannonballs, interned in self.sent.values():
+            in_use.update(players)
+            in_use.update(cannonballs)
+            in_use.update(interned)
+        for key, handle in list(self.ids.by_key.items()):
+            if handle not in in_use:
+                self.ids.release(key)
+                self.known.discard(handle)
+
+
+class Snapshot:
+    """One decoded snapshot: the full player set plus the cannonball changes."""
+
+    def __init__(self, seq, time, players, new_cannonballs, removed):
+        self.seq = seq
+        self.time = time
+        self.players = players
+        self.new_cannonballs = new_cannonballs
+        self.removed = removed
+
+
+class SnapshotDecoder:
+    """Receiver half of a snapshot stream."""
+
+    def __init__(self, history=32):
+        self.history = history
+        self.ids = IdTable()
+        self.names = {}
+        self.states = {}  # seq -> (players {handle: (x, y, rot, ts)}, cannonball handles)
+        self.latest_seq = None
+
+    def decode(self, packet):
+        try:
+            (kind, seq, baseline_seq, base_time,
+             n_interns, n_players, n_cannonballs, n_removed) = _HEADER.unpack_from(packet, 0)
+        except struct.error as e:
+            raise CodecError(f"short snapshot header: {e}")
+        if kind != SNAPSHOT:
+            raise CodecError(f"not a snapshot packet (type {kind})")
+        if self.latest_seq is not None and seq <= self.latest_seq:
+            return None  # stale or duplicate
+
+        if baseline_seq == NO_BASELINE:
+            base_players, base_cannonballs = {}, set()
+        elif baseline_seq in self.states:
+            base_players, base_cannonballs = self.states[baseline_seq]
+        else:
+            raise CodecError(f"missing baseline {baseline_seq}")
+
+        try:
+            offset = _HEADER.size
+            for _ in range(n_interns):
+                handle, name_len = _INTERN.unpack_from(packet, offset)
+                offset += _INTERN.size
+                key = _id_str(packet[offset:offset + 16])
+                offset += 16
+                name = packet[offset:offset + name_len].decode()
+                offset += name_len
+                self.ids.assign(handle, key)
+                if name:
+                    self.names[key] = name
+
+            players = dict(base_players)
+            for _ in range(n_players):
+                handle, mask = _PLAYER.unpack_from(packet, offset)
+                offset += _PLAYER.size
+                x, y, rot, ts = players.get(handle, (0.0, 0.0, 0.0, base_time))
+                if mask & FIELD_X:
+                    x = dequantize_x(_U16.unpack_from(packet, offset)[0])
+                    offset += 2
+                if mask & FIELD_Y:
+                    y = dequantize_y(_U16.unpack_from(packet, offset)[0])
+                    offset += 2
+                if mask & FIELD_ROT:
+                    rot = dequantize_rotation(_U16.unpack_from(packet, offset)[0])
+                    offset += 2
+                if mask & FIELD_TS:
+                    ts = base_time - _U16.unpack_from(packet, offset)[0] / 1000.0
+                    offset += 2
+                players[handle] = (x, y, rot, ts)
+
+            cannonballs = set(base_cannonballs)
+            new_cannonballs = []
+            for _ in range(n_cannonballs):
+                handle, owner, qx, qy, qrot, qvx, qvy, side, age = _CANNONBALL.unpack_from(packet, offset)
+                offset += _CANNONBALL.size
+                cannonballs.add(handle)
+                new_cannonballs.append({
+                    "id": self.ids.lookup(handle),
+                    "player_id": self.ids.lookup(owner),
+                    "x": dequantize_x(qx),
+                    "y": dequantize_y(qy),
+                    "rotation": dequantize_rotation(qrot),
+                    "velocity_x": qvx / VELOCITY_SCALE,
+                    "velocity_y": qvy / VELOCITY_SCALE,
+                    "side": SIDES[side],
+                    "created_at": base_time - age / 1000.0,
+                })
+
+            removed = []
+            for _ in range(n_removed):
+                handle = _U16.unpack_from(packet, offset)[0]
+                offset += 2
+                players.pop(handle, None)
+                cannonballs.discard(handle)
+                removed.append(self.ids.lookup(handle))
+        except (struct.error, IndexError, UnicodeDecodeError, ValueError) as e:
+            raise CodecError(f"truncated snapshot: {e}")
+
+        self.states[seq] = (players, cannonballs)
+        self.latest_seq = seq
+        for old in [s for s in self.states if s <= seq - self.history]:
+            del self.states[old]
+
+        rows = []
+        for handle, (x, y, rot, ts) in players.items():
+            key = self.ids.lookup(handle)
+            rows.append({
+                "player_id": key,
+                "player_name": self.names.get(key, "Unknown"),
+                "x": x,
+                "y": y,
+                "rotation": rot,
+                "updated_at": ts,
+            })
+        return Snapshot(seq, base_time, rows, new_cannonballs, removed)
+
+
+#single records sent from a client to the relay
+def encode_player_update(row):
+    name = row.get("player_name", "").encode()[:255]
+    return _PLAYER_UPDATE.pack(
+        PLAYER_UPDATE, _id_bytes(row["player_id"]),
+        quantize_x(float(row["x"])), quantize_y(float(row["y"])), quantize_rotation(float(row["rotation"])),
+        float(row["updated_at"]), len(name),
+    ) + name
+
+
+def decode_player_update(packet):
+    try:
+        kind, raw, qx, qy, qrot, ts, name_len = _PLAYER_UPDATE.unpack_from(packet, 0)
+        name = packet[_PLAYER_UPDATE.size:_PLAYER_UPDATE.size + name_len].decode()
+    except (struct.error, UnicodeDecodeError) as e:
+        raise CodecError(f"bad player update: {e}")
+    return {
+        "player_id": _id_str(raw),
+        "player_name": name,
+        "x": dequantize_x(qx),
+        "y": dequantize_y(qy),
+        "rotation": dequantize_rotation(qrot),
+        "updated_at": ts,
+    }
+
+
+def encode_cannonball(row):
+    return _CANNONBALL_UPDATE.pack(
+        CANNONBALL, _id_bytes(row["id"]), _id_bytes(row["player_id"]),
+        quantize_x(float(row["x"])), quantize_y(float(row["y"])), quantize_rotation(float(row["rotation"])),
+        quantize_velocity(float(row["velocity_x"])), quantize_velocity(float(row["velocity_y"])),
+        SIDES.index(row["side"]), float(row["created_at"]),
+        int(max(0, min(MAX_AGE_MS, round(float(row.get("lag", 0.0)) * 1000.0)))),
+    )
+
+
+def decode_cannonball(packet):
+    try:
+        (kind, raw, owner, qx, qy, qrot, qvx, qvy,
+         side, created_at, lag_ms) = _CANNONBALL_UPDATE.unpack_from(packet, 0)
+    except struct.error as e:
+        raise CodecError(f"bad cannonball: {e}")
+    return {
+        "id": _id_str(raw),
+        "player_id": _id_str(owner),
+        "x": dequantize_x(qx),
+        "y": dequantize_y(qy),
+        "rotation": dequantize_rotation(qrot),
+        "velocity_x": qvx / VELOCITY_SCALE,
+        "velocity_y": qvy / VELOCITY_SCALE,
+        "side": SIDES[side],
+        "created_at": created_at,
+        "lag": lag_ms / 1000.0,  # how far behind the shooter was seeing other boats
+    }
+
+
+def encode_ack(seq):
+    return _ACK.pack(ACK, seq)
+
+
+def decode_ack(packet):
+    try:
+        return _ACK.unpack_from(packet, 0)[1]
+    except struct.error as e:
+        raise CodecError(f"bad ack: {e}")
+
+
+#client-side prediction: inputs up to the relay, its authoritative state back.
+#full doubles so both sides replay bit-identical movement
+def encode_inputs(player_id, inputs):
+    parts = [_INPUTS.pack(INPUTS, _id_bytes(player_id), len(inputs))]
+    for seq, dt, move, turn, sprint in inputs:
+        parts.append(_INPUT.pack(seq, dt, move, turn, 1 if sprint else 0))
+    return b"".join(parts)
+
+
+def decode_inputs(packet):
+    """(player_id, [(seq, dt, move, turn, sprint)]) oldest first."""
+    try:
+        kind, raw, count = _INPUTS.unpack_from(packet, 0)
+        inputs = []
+        for i in range(count):
+            seq, dt, move, turn, sprint = _INPUT.unpack_from(packet, _INPUTS.size + i * _INPUT.size)
+            inputs.append((seq, dt, move, turn, bool(sprint)))
+    except struct.error as e:
+        raise CodecError(f"bad inputs: {e}")
+    return _id_str(raw), inputs
+
+
+def encode_state(player_id, seq, state, ts):
+    return _STATE.pack(STATE, seq, _id_bytes(player_id), state["x"], state["y"], state["rotation"],
+                       state["target_rotation"], state["current_velocity"], state["sprint"], ts)
+
+
+def decode_state(packet):
+    """(player_id, last input seq applied, movement state dict, server time)."""
+    try:
+        (kind, seq, raw, x, y, rot, target_rot,
+         velocity, sprint, ts) = _STATE.unpack_from(packet, 0)
+    except struct.error as e:
+        raise CodecError(f"bad state: {e}")
+    state = {
+        "x": x,
+        "y": y,
+        "rotation": rot,
+        "target_rotation": target_rot,
+        "current_velocity": velocity,
+        "sprint": sprint,
+    }
+    return _id_str(raw), seq, state, ts
+
+
+def packet_type(packet):
+    return packet[0] if packet else None
@@ -0,0 +1,149 @@
+"""CHECKS THE BINARY CODEC ROUND-TRIPS AND COMPARES IT AGAINST THE JSON ROWS
+
+Run with `python codec_benchmark.py [lobby sizes...]`.
+"""
+
+import json
+import math
+import random
+import sys
+import time
+import uuid
+import codec
+from config import WORLD_WIDTH, WORLD_HEIGHT
+
+
+def make_players(n, now):
+    players = []
+    for _ in range(n):
+        pid = str(uuid.uuid4())
+        players.append({
+            "player_id": pid,
+            "player_name": f"Player_{pid[:8]}",
+            "x": random.uniform(0.5, WORLD_WIDTH - 0.5),
+            "y": random.uniform(0.5, WORLD_HEIGHT - 0.5),
+            "rotation": random.uniform(0, 2 * math.pi),
+            "updated_at": now - random.uniform(0, 0.1),
+        })
+    return players
+
+
+def make_cannonballs(players, n, now):
+    cannonballs = []
+    for _ in range(n):
+        owner = random.choice(players)
+        angle = random.uniform(0, 2 * math.pi)
+        cannonballs.append({
+            "id": str(uuid.uuid4()),
+            "player_id": owner["player_id"],
+            "x": owner["x"],
+            "y": owner["y"],
+            "rotation": owner["rotation"],
+            "velocity_x": math.cos(angle) * 1.2,
+            "velocity_y": math.sin(angle) * 1.2,
+            "side": random.choice(codec.SIDES),
+            "created_at": now - random.uniform(0, 5.0),
+        })
+    return cannonballs
+
+
+def move(players, now, fraction=0.5):
+    #move roughly half the lobby, leave the rest idle
+    for row in players:
+        if random.random() < fraction:
+            row["x"] = min(WORLD_WIDTH - 0.5, max(0.5, row["x"] + random.uniform(-0.1, 0.1)))
+            row["y"] = min(WORLD_HEIGHT - 0.5, max(0.5, row["y"] + random.uniform(-0.1, 0.1)))
+            row["rotation"] = (row["rotation"] + random.uniform(-0.2, 0.2)) % (2 * math.pi)
+            row["updated_at"] = now
+
+
+def check_round_trip():
+    """Encode a few ticks of a lobby (with a lost packet) and make sure the decoder agrees."""
+    now = time.time()
+    players = make_players(20, now)
+    cannonballs = make_cannonballs(players, 10, now)
+    encoder = codec.SnapshotEncoder()
+    decoder = codec.SnapshotDecoder()
+    seen_cannonballs = set()
+
+    for tick in range(30):
+        now += 0.05
+        move(players, now)
+        if tick == 10:
+            players.pop()  # someone leaves
+        packet = encoder.encode(players, cannonballs, now)
+        if tick % 7 == 3:
+            continue  # dropped on the floor, never acked
+        snapshot = decoder.decode(packet)
+        encoder.ack(snapshot.seq)
+
+        assert len(snapshot.players) == len(players), "player count mismatch"
+        decoded = {row["player_id"]: row for row in snapshot.players}
+        for row in players:
+            got = decoded[row["player_id"]]
+            assert abs(got["x"] - row["x"]) < 1e-3, "x drifted"
+            assert abs(got["y"] - row["y"]) < 1e-3, "y drifted"
+            diff = (got["rotation"] - row["rotation"] + math.pi) % (2 * math.pi) - math.pi
+            assert abs(diff) < 1e-3, "rotation drifted"
+            assert abs(got["updated_at"] - row["updated_at"]) < 2e-3, "timestamp drifted"
+            assert got["player_name"] == row["player_name"], "name lost"
+        for row in snapshot.new_cannonballs:
+            seen_cannonballs.add(row["id"])
+
+    assert seen_cannonballs == {row["id"] for row in cannonballs}, "cannonball lost"
+
+    #single client -> relay records
+    row = players[0]
+    got = codec.decode_player_update(codec.encode_player_update(row))
+    assert got["player_id"] == row["player_id"] and got["updated_at"] == row["updated_at"]
+    shot = cannonballs[0]
+    got = codec.decode_cannonball(codec.encode_cannonball(shot))
+    assert got["id"] == shot["id"] and abs(got["velocity_x"] - shot["velocity_x"]) < 1e-3
+    print("✅ Round trip OK")
+
+
+def benchmark(n_players, ticks=200):
+    now = time.time()
+    players = make_players(n_players, now)
+    cannonballs = make_cannonballs(players, n_players // 2, now)
+    encoder = codec.SnapshotEncoder()
+    decoder = codec.SnapshotDecoder()
+
+    json_bytes = full_bytes = delta_bytes = 0
+    json_decode = binary_decode = encode_time = 0.0
+    for _ in range(ticks):
+        now += 0.05
+        move(players, now)
+
+        body = json.dumps(players + cannonballs).encode()
+        json_bytes += len(body)
+        t0 = time.perf_counter()
+        json.loads(body)
+        json_decode += time.perf_counter() - t0
+
+        #what a receiver with nothing acked gets: every row, names and all, like the JSON
+        full_bytes += len(codec.SnapshotEncoder().encode(players, cannonballs, now))
+
+        t0 = time.perf_counter()
+        packet = encoder.encode(players, cannonballs, now)
+        encode_time += time.perf_counter() - t0
+        delta_bytes += len(packet)
+
+        t0 = time.perf_counter()
+        snapshot = decoder.decode(packet)
+        binary_decode += time.perf_counter() - t0
+        encoder.ack(snapshot.seq)
+
+    #two separate gains: quantized binary over JSON (both full), then deltas over full binary
+    print(f"{n_players:>5} players | JSON {json_bytes / ticks:>9.0f} B {json_decode / ticks * 1e6:>8.1f} us decode"
+          f" | full binary {full_bytes / ticks:>8.0f} B ({json_bytes / full_bytes:>4.1f}x smaller than JSON)"
+          f" | delta {delta_bytes / ticks:>8.0f} B ({full_bytes / delta_bytes:>4.1f}x smaller than full)"
+          f" {encode_time / ticks * 1e6:>8.1f} us encode {binary_decode / ticks * 1e6:>8.1f} us decode")
+
+
+if __name__ == "__main__":
+    random.seed(1)
+    check_round_trip()
+    sizes = [int(a) for a in sys.argv[1:]] or [4, 16, 64, 256]
+    for n in sizes:
+        benchmark(n)
@@ -1,21 +1,182 @@
+import os
+import tempfile
+
 WIDTH, HEIGHT = 1280, 720
 INTERP_DELAY = 0.15
+#adaptive jitter buffer: each remote boat is drawn JITTER_SAFETY standard deviations
+#behind how late its samples usually are, within [JITTER_MIN_DELAY, JITTER_MAX_DELAY].
+#INTERP_DELAY is the starting point (and the fixed delay with ADAPTIVE_INTERP_DELAY off)
+ADAPTIVE_INTERP_DELAY = True
+JITTER_MIN_DELAY = 0.05
+JITTER_MAX_DELAY = 0.4
+JITTER_SAFETY = 2.0
+JITTER_SMOOTHING = 0.1
+JITTER_SLEW = 0.25
 MAX_HISTORY = 15
 FETCH_INTERVAL = 0.08
+CANNONBALL_FETCH_INTERVAL = 0.25
 SEND_INTERVAL = 0.10
 VISIBLE_RADIUS = 10.0
+#adaptive send: the local boat is only upserted (at most every SEND_INTERVAL) once
+#the position/rotation other clients are extrapolating is off by more than these,
+#or SEND_HEARTBEAT seconds have passed since the last update
+SEND_POSITION_THRESHOLD = 0.1
+SEND_ROTATION_THRESHOLD = 0.05
+SEND_HEARTBEAT = 1.0
 TARGET_FPS = 60
 SPRINT = 100
 VELOCITY_CORRECTION_SPEED = 0.15
 POSITION_CORRECTION_SPEED = 0.08
 ROTATION_CORRECTION_SPEED = 0.12
 MAX_POSITION_ERROR = 0.5
+PLAYER_STALE_TIMEOUT = 12.0
+#world fetch: players and cannonballs come back from one request every FETCH_INTERVAL
+#(one snapshot of the backend at one tick) instead of two separate polling streams
+WORLD_FETCH = os.environ.get("BMS_WORLD_FETCH", "1") == "1"
+
+#world size in world units (every client and server in a lobby must agree)
+WORLD_WIDTH = float(os.environ.get("BMS_WORLD_WIDTH", "15"))
+WORLD_HEIGHT = float(os.environ.get("BMS_WORLD_HEIGHT", "15"))
+if WORLD_WIDTH < 2.0 or WORLD_HEIGHT < 2.0:
+    #boats spawn at least a unit in from each edge
+    raise RuntimeError(f"World is {WORLD_WIDTH}x{WORLD_HEIGHT}, BMS_WORLD_WIDTH/HEIGHT must be at least 2")
+
+#gameplay
+PLAYER_MAX_HEALTH = 4
+HIT_RADIUS = 0.18  # cannonball to boat
+BOAT_COLLISION_RADIUS = 0.15  # boat to rocks
+
+#how NetworkManager runs: "threads" (two background threads) or "asyncio" (tasks on main()'s event loop)
+NETWORK_ENGINE = os.environ.get("BMS_NETWORK_ENGINE", "threads")
+
+#clock sync: probe the backend clock CLOCK_SYNC_BURST times quickly on connect, then every CLOCK_SYNC_INTERVAL
+CLOCK_SYNC_INTERVAL = 5.0
+CLOCK_SYNC_BURST = 4
+CLOCK_SYNC_BURST_INTERVAL = 0.25
+CLOCK_SYNC_WINDOW = 16
+CLOCK_PROBE_TIMEOUT = 0.25
+CLOCK_MAX_DRIFT = 500e-6
+CLOCK_DRIFT_MIN_SPAN = 20.0
+
+#network backend: "supabase" (hosted tables) or "udp" (relay_server.py)
+TRANSPORT = os.environ.get("BMS_TRANSPORT", "supabase")
+RELAY_HOST = os.environ.get("BMS_RELAY_HOST", "127.0.0.1")
+RELAY_PORT = int(os.environ.get("BMS_RELAY_PORT", "7777"))
+RELAY_CONNECT_TIMEOUT = 2.0
+RELAY_CLIENT_TIMEOUT = 10.0
+RELAY_TICK_INTERVAL = 0.05
+RELAY_MAX_DATAGRAM = 65507
+
+#rooms: players only see (and fetch) others in their room. BMS_ROOM_RELAYS spreads rooms
+#over several relays ("host:port,host:port"); empty means just RELAY_HOST:RELAY_PORT.
+#ROOM_COLUMN also writes/filters a `room` column on the supabase tables (they need one)
+ROOM = os.environ.get("BMS_ROOM", "lobby")
+ROOM_RELAYS = os.environ.get("BMS_ROOM_RELAYS", "")
+ROOM_COLUMN = os.environ.get("BMS_ROOM_COLUMN", "0") == "1"
+ROOM_NAME_MAX = 32
+ROOM_QUERY_TIMEOUT = 0.5
+ROOM_ACTIVE_WINDOW = 10.0
+
+#change feed: players, cannonballs and chat are pushed over one websocket instead of
+#polled. SUPABASE_SUBSCRIBE uses the hosted project's Realtime; BMS_TRANSPORT=feed uses
+#the local stand-in (changefeed.py) at CHANGEFEED_URL as the whole backend
+SUPABASE_SUBSCRIBE = os.environ.get("BMS_SUBSCRIBE", "0") == "1"
+CHANGEFEED_PORT = 4000
+CHANGEFEED_URL = os.environ.get("BMS_CHANGEFEED_URL", f"ws://127.0.0.1:{CHANGEFEED_PORT}/realtime/v1/websocket")
+CHANGEFEED_HEARTBEAT = 25.0
+CHANGEFEED_CONNECT_TIMEOUT = 5.0
+
+#shared-memory transport (BMS_TRANSPORT=shm): clients on one machine swap updates through
+#memory-mapped ring files under SHM_DIR (one per client, per room) instead of sockets
+SHM_DIR = os.environ.get("BMS_SHM_DIR") or os.path.join(tempfile.gettempdir(), "bms-shm")
+SHM_RING_SLOTS = 1024
+SHM_SLOT_SIZE = 512
+SHM_SCAN_INTERVAL = 0.5
+SHM_POLL_INTERVAL = 0.002
+SHM_STALE_AFTER = 30.0
+
+#client-side prediction: with a backend that owns movement (the relay), the local
+#boat sends its inputs instead of its position and rewinds to the relay's state,
+#replaying inputs it hasn't acknowledged yet. Inputs go out every INPUT_SEND_INTERVAL,
+#each batch repeating up to INPUT_BATCH_MAX unacknowledged ones in case of loss
+CLIENT_RECONCILIATION = os.environ.get("BMS_RECONCILE", "1") == "1"
+INPUT_LOG_SIZE = 256
+INPUT_SEND_INTERVAL = 0.033
+INPUT_BATCH_MAX = 32
+INPUT_MAX_DT = 0.1
+RECONCILE_EPSILON = 0.01
+
+#dedicated server (game_server.py): simulates at a fixed SERVER_TICK_RATE, running at
+#most SERVER_MAX_CATCHUP ticks in one go after a stall
+SERVER_TICK_RATE = 30
+SERVER_MAX_CATCHUP = 5
+#lag compensation: shots are checked against boats where the shooter saw them
+#(rewound by the shooter's interpolation delay), at most LAG_COMP_MAX seconds back
+LAG_COMPENSATION = True
+LAG_COMP_MAX = 0.4
+#sharded server (sharded_server.py): the world is cut into SHARD_WORKERS vertical
+#strips, each simulated by its own process
+SHARD_WORKERS = int(os.environ.get("BMS_SHARD_WORKERS", "0")) or (os.cpu_count() or 1)
+
+#network condition simulator (netsim.py): set BMS_NETSIM to a profile name ("wifi",
+#"mobile", "congested", ...) to play through a simulated link with that much delay,
+#jitter, loss, duplication and reordering
+NETSIM_PROFILE = os.environ.get("BMS_NETSIM", "")
+
+#network telemetry (telemetry.py): F3 in game toggles the overlay; with BMS_TELEMETRY_FILE
+#set, one JSON line of the last TELEMETRY_INTERVAL seconds' numbers is appended there
+TELEMETRY_FILE = os.environ.get("BMS_TELEMETRY_FILE", "")
+TELEMETRY_INTERVAL = 5.0
+TELEMETRY_OVERLAY_REFRESH = 0.5
+
+#connection prewarm (connection.py): the backend session is connected in the background
+#during the splash screen and menus and handed to the game on join. While it waits, it's
+#kept alive with a clock probe every PREWARM_KEEPALIVE seconds (under the usual 5s idle
+#timeout of pooled HTTP connections). BMS_PREWARM=0 connects on join instead
+PREWARM = os.environ.get("BMS_PREWARM", "1") == "1"
+PREWARM_KEEPALIVE = 4.0
+PREWARM_RETRY = 2.0
+PREWARM_RETRY_MAX = 30.0
+
+#bot swarm (bot_swarm.py): bots play at BOT_TICK_RATE frames a second, hold each random
+#input for BOT_INPUT_HOLD seconds and fire every BOT_FIRE_INTERVAL seconds on average
+BOT_TICK_RATE = 30
+BOT_INPUT_HOLD = (0.5, 2.5)
+BOT_FIRE_INTERVAL = 3.0
+
+#outgoing cannonballs
+CANNONBALL_LIFETIME = 5.0
+#how long relays and caches keep a shot's row: its lifetime plus slack for send delay and clock error
+CANNONBALL_RETENTION = CANNONBALL_LIFETIME + 2.0
+CANNONBALL_QUEUE_SIZE = 64
+CANNONBALL_RETRY_BASE = 0.25
+CANNONBALL_RETRY_MAX = 4.0
+
+#incremental sync: only rows newer than the last one we saw (minus an overlap
+#for late inserts and sender clock skew) are fetched, plus how far back to look at most
+SYNC_OVERLAP = 1.0
+PLAYER_SYNC_WINDOW = 10.0
+CANNONBALL_SYNC_WINDOW = 5.5
+#players are tracked per writer (their clocks differ); the whole window is fetched
+#this often to find writers we haven't heard from yet
+SYNC_DISCOVERY_INTERVAL = 2.0
+
+#area of interest: only players inside this box around the local boat are fetched.
+#AOI_GRID_COLUMN also writes/filters a coarse `cell` column (the players table needs one)
+AOI_RADIUS = VISIBLE_RADIUS
+AOI_CELL_SIZE = 5.0
+AOI_GRID_STRIDE = 1024
+AOI_GRID_COLUMN = os.environ.get("BMS_AOI_GRID_COLUMN", "0") == "1"
 
-WORLD_WIDTH = 15
-WORLD_HEIGHT = 15
+#local stand-in for the Supabase REST API and Realtime (local_supabase.py), for working
+#offline: point BMS_SUPABASE_URL at it. Every request is held LOCAL_SUPABASE_LATENCY
+#seconds plus up to LOCAL_SUPABASE_JITTER more before it's answered
+LOCAL_SUPABASE_PORT = 54321
+LOCAL_SUPABASE_LATENCY = float(os.environ.get("BMS_LOCAL_LATENCY", "0"))
+LOCAL_SUPABASE_JITTER = float(os.environ.get("BMS_LOCAL_JITTER", "0"))
 
-SUPABASE_URL = "https://ciuqcdaowlwztlzkanpq.supabase.co"
-SUPABASE_KEY = "sb_publishable_R8sevzo6mu8PBPNaQZSmOg_KKzoqAVR"
+SUPABASE_URL = os.environ.get("BMS_SUPABASE_URL", "https://ciuqcdaowlwztlzkanpq.supabase.co")
+SUPABASE_KEY = os.environ.get("BMS_SUPABASE_KEY", "sb_publishable_R8sevzo6mu8PBPNaQZSmOg_KKzoqAVR")
 
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError(
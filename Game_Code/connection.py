@@ -0,0 +1,124 @@
+"""CONNECTION PREWARM: THE BACKEND SESSION IS READY BEFORE THE PLAYER JOINS
+
+Connecting (DNS, the TLS handshake, building the Supabase client and its
+first query, the relay's hello) used to happen inside NetworkManager() on the
+frame thread, freezing the window as the loading bar finished. A
+ConnectionManager does it on a background thread while the splash screen and
+menus are up, then keeps the session alive with clock probes (which also get
+the clock synced ahead of time) until the game takes it:
+
+    connections = ConnectionManager()
+    connections.warm()                    # splash / menu
+    ...
+    network = NetworkManager(player, session=connections.take())   # join
+
+take() never waits. If the session isn't ready yet it returns None and
+NetworkManager connects on its own network thread instead.
+"""
+
+from collections import namedtuple
+from threading import Thread, Lock, Event
+from config import *
+from clock import ClockSync
+from transport import create_transport
+
+# A connected transport and the clock estimate built while it waited
+Session = namedtuple("Session", ["transport", "clock"])
+
+
+class ConnectionManager:
+    """Connects one transport in the background and hands it over, connected, on join."""
+
+    def __init__(self, transport_kind=None, room=ROOM):
+        self.transport_kind = transport_kind
+        self.room = room
+        self._lock = Lock()
+        self._wake = Event()
+        self._session = None  # set while a connected session is waiting to be taken
+        self._run_id = 0  # the warming thread whose session this would be (0: none)
+        self._runs = 0
+
+    @property
+    def ready(self):
+        return self._session is not None
+
+    def warm(self):
+        """Start connecting in the background, unless a session is already on its way."""
+        if not PREWARM:
+            return
+        with self._lock:
+            if self._run_id:
+                return
+            self._runs += 1
+            self._run_id = self._runs
+            self._wake = Event()
+            Thread(target=self._run, args=(self._run_id, self._wake), daemon=True).start()
+
+    def take(self):
+        """The ready session (it's the caller's from now on), or None. Doesn't wait either way."""
+        with self._lock:
+            session, self._session = self._session, None
+            self._run_id = 0
+            self._wake.set()
+        if session:
+            print(f"⚓ Using prewarmed connection ({session.transport.name})")
+        return session
+
+    def stop(self):
+        """Drop whatever is warming, closing it."""
+        session = self.take()
+        if session:
+            session.transport.close()
+
+    def _offer(self, run_id, session):
+        """Make session the one take() returns, if run_id is still the current run."""
+        with self._lock:
+            if self._run_id != run_id:
+                return False
+            self._session = session
+            return True
+
+    def _run(self, run_id, wake):
+        transport = None
+        clock = ClockSync()
+        offered = False
+        probes = 0
+        retry = PREWARM_RETRY
+        while True:
+            if not offered:
+                try:
+                    if transport is None:
+                        transport = create_transport(self.transport_kind, room=self.room)
+                    transport.connect()
+                except Exception as e:
+                    print(f"❌ Prewarm connection failed: {e}")
+                    print(f"   Will retry in {retry:.1f}s")
+                    if wake.wait(retry):
+                        break
+                    retry = min(PREWARM_RETRY_MAX, retry * 1.5)
+                    continue
+                retry = PREWARM_RETRY
+                if not self._offer(run_id, Session(transport, clock)):
+                    break
+                offered = True
+                print(f"✅ Connection ready ({transport.name}), waiting for join")
+
+            if wake.wait(CLOCK_SYNC_BURST_INTERVAL if probes < CLOCK_SYNC_BURST else PREWARM_KEEPALIVE):
+                #taken, or stopped (stop() closes it)
+                return
+            #a request now and then keeps pooled connections (and the relay's record of us) alive
+            try:
+                sample = transport.probe_clock()
+            except Exception as e:
+                print(f"⚠️  Prewarmed connection dropped: {e}")
+                offered = not self._offer(run_id, None)
+                if offered:
+                    return  # taken while probing: it's the game's to reconnect now
+                continue
+            if sample:
+                clock.add_sample(*sample)
+            probes += 1
+
+        #never handed over: nobody else will close it
+        if transport is not None:
+            transport.close()
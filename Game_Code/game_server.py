@@ -0,0 +1,235 @@
+"""HEADLESS DEDICATED GAME SERVER
+
+Speaks the same protocol as relay_server.py (start the game with
+BMS_TRANSPORT=udp), but runs the game itself on a fixed tick: boats move with
+the same code as Player, shots fly with CannonBall's kinematics, rocks collide
+through ItemManager, and the server decides who got hit. It needs no display
+or sound card, so it runs on any Linux box:
+
+    python game_server.py --port 7777 --tick-rate 30
+"""
+
+import os
+#no window or audio device on a server
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+from collections import deque
+import numpy as np
+from config import *
+from relay_server import RelayServer
+from cannonball import CannonBall
+from items import ItemManager
+from lagcomp import BoatHistory, segment_hits
+import movement
+
+#hits are sent over UDP, so each one goes out this many ticks in a row (clients drop repeats)
+HIT_RESEND_TICKS = 3
+
+
+class Simulation:
+    """Rocks, shots and hit detection for a set of boats: the whole world, or one region of it."""
+
+    def __init__(self, tick_rate=SERVER_TICK_RATE):
+        CannonBall.load_images = False
+        self.items = ItemManager(load_images=False)
+        self.balls = {}  # id -> (CannonBall, owner player_id, shooter's view lag)
+        self.history = BoatHistory(LAG_COMP_MAX, tick_rate)
+        self.inputs = {}  # player_id -> (RelayBoat, inputs) waiting for the next tick
+
+    def step_boat(self, state, move, turn, sprint, dt):
+        movement.step(state, move, turn, sprint, dt)
+        movement.collide(state, self.items)
+
+    def queue_inputs(self, player_id, boat, inputs):
+        """Hold a client's inputs until the next step, so boats only ever move on the tick."""
+        queued = self.inputs.get(player_id)
+        self.inputs[player_id] = (boat, (queued[1] if queued else []) + list(inputs))
+
+    def _step_boats(self):
+        #in arrival order; RelayBoat.apply skips the inputs batches repeat
+        moved = {}
+        for pid, (boat, inputs) in self.inputs.items():
+            if boat.apply(inputs, lambda b, *args: self.step_boat(b.state, *args)):
+                moved[pid] = (boat.state.x, boat.state.y)
+        self.inputs = {}
+        return moved
+
+    def add_ball(self, row):
+        #from_dict moves it along its path to now, by the fire time the client stamped
+        lag = min(LAG_COMP_MAX, float(row.get("lag", 0.0))) if LAG_COMPENSATION else 0.0
+        self.balls[row["id"]] = (CannonBall.from_dict(row), row["player_id"], lag)
+
+    def remove_player(self, player_id):
+        self.history.forget(player_id)
+        self.inputs.pop(player_id, None)
+        for ball_id in [k for k, (ball, owner, lag) in self.balls.items() if owner == player_id]:
+            del self.balls[ball_id]
+
+    def step(self, now, dt, afloat, rooms=None):
+        """Move the boats by the inputs queued since the last step, then move the shots over
+        the tick ending at now and check each against the boats in afloat ({player_id: (x, y)}),
+        rewound to where its shooter saw them. With rooms ({player_id: room}), shots only hit
+        boats in their shooter's room.
+
+        Returns (hits, expired): hits is [(ball_id, shooter, target)] in shot order,
+        expired the ids of shots that ran out of time. Neither is removed here.
+        """
+        for pid, xy in self._step_boats().items():
+            if pid in afloat:
+                afloat[pid] = xy
+        self.history.record(now, afloat)
+        if not self.balls:
+            return [], []
+
+        ids = list(self.balls)
+        start = np.empty((len(ids), 2))
+        end = np.empty((len(ids), 2))
+        lags = np.empty(len(ids))
+        owner_slots = np.full(len(ids), -1)
+        expired = []
+        for i, ball_id in enumerate(ids):
+            ball, owner, lag = self.balls[ball_id]
+            start[i] = ball.x, ball.y
+            if not ball.update(dt):
+                expired.append(ball_id)
+            end[i] = ball.x, ball.y
+            lags[i] = lag
+            owner_slots[i] = self.history.slots.get(owner, -1)
+
+        centers = self.history.rewind(now - lags)
+        #nobody hits their own boat, and sunk boats are out of the game
+        own = owner_slots >= 0
+        centers[np.flatnonzero(own), owner_slots[own]] = np.nan
+        centers[:, [pid not in afloat for pid in self.history.ids]] = np.nan
+        if rooms:
+            codes = {}
+            shot_rooms = np.array([codes.setdefault(rooms.get(self.balls[i][1]), len(codes)) for i in ids])
+            boat_rooms = np.array([codes.setdefault(rooms.get(pid), len(codes)) for pid in self.history.ids])
+            centers[shot_rooms[:, None] != boat_rooms[None, :]] = np.nan
+
+        hit, along = segment_hits(start, end, centers, HIT_RADIUS)
+        first = np.argmin(np.where(hit, along, np.inf), axis=1)
+        hits = [(ids[i], self.balls[ids[i]][1], self.history.ids[first[i]])
+                for i in np.flatnonzero(hit.any(axis=1))]
+        return hits, expired
+
+
+class GameServer(RelayServer):
+    """Relay that owns the simulation: positions, shots and health."""
+
+    authority = ("movement", "hits")
+
+    def __init__(self, host=RELAY_HOST, port=RELAY_PORT, tick_rate=SERVER_TICK_RATE):
+        super().__init__(host, port, tick_interval=1.0 / tick_rate)
+        self.sim = Simulation(tick_rate)
+        self.health = {}  # player_id -> health left (missing means full)
+        self.recent_hits = deque()  # (last tick to send on, room, message)
+        self.tick_count = 0
+        self.sim_time = None
+
+        #counters
+        self.hits = 0
+        self.skipped_ticks = 0
+
+    def _apply_inputs(self, player_id, inputs, addr, now):
+        """Queue a client's inputs for the next tick (step runs them)."""
+        boat = self._input_boat(player_id, inputs, addr)
+        if boat is not None:
+            self.player_addrs[player_id] = addr
+            self.sim.queue_inputs(player_id, boat, inputs)
+
+    def _add_cannonball(self, row):
+        if row["id"] in self.cannonballs or not self._afloat(row["player_id"]):
+            return  # a resend, or fired by a sunk boat
+        super()._add_cannonball(row)
+        self.sim.add_ball(row)
+
+    def _remove_ball(self, ball_id):
+        self.sim.balls.pop(ball_id, None)
+        self.cannonballs.pop(ball_id, None)
+
+    def _remove_player(self, player_id):
+        super()._remove_player(player_id)
+        self.health.pop(player_id, None)
+        self.sim.remove_player(player_id)
+
+    def _afloat(self, player_id):
+        return self.health.get(player_id, PLAYER_MAX_HEALTH) > 0
+
+    def _afloat_positions(self):
+        return {pid: (float(row["x"]), float(row["y"])) for pid, row in self.players.items()
+                if self._afloat(pid)}
+
+    def _player_rooms(self):
+        """{player_id: room}, or None while everyone is in the same room."""
+        rooms = {pid: self.room_of(pid) for pid in self.players}
+        return rooms if len(set(rooms.values())) > 1 else None
+
+    def tick(self, now):
+        """Run every simulation step that's due, then send snapshots as the relay does."""
+        dt = self.tick_interval
+        if self.sim_time is None:
+            self.sim_time = now
+        steps = 0
+        while self.sim_time + dt <= now:
+            if steps == SERVER_MAX_CATCHUP:
+                #too far behind (the box stalled): drop the backlog rather than spiral
+                self.skipped_ticks += int((now - self.sim_time) / dt)
+                self.sim_time = now
+                break
+            self.step(dt)
+            self.sim_time += dt
+            steps += 1
+
+        for last_tick, room, msg in self.recent_hits:
+            self._broadcast(msg, room)
+        while self.recent_hits and self.recent_hits[0][0] <= self.tick_count:
+            self.recent_hits.popleft()
+
+        super().tick(now)
+
+    def step(self, dt):
+        """One fixed tick of the whole world."""
+        self.tick_count += 1
+        now = self.sim_time + dt
+        hits, expired = self.sim.step(now, dt, self._afloat_positions(), self._player_rooms())
+        #boats the step moved (their owners haven't been sent the new state yet)
+        for pid, boat in self.boats.items():
+            if boat.dirty and pid in self.players:
+                self.players[pid] = boat.row(pid, now)
+        self._apply_hits(hits)
+        for ball_id in expired:
+            self._remove_ball(ball_id)
+
+    def _apply_hits(self, hits):
+        for ball_id, shooter, target in hits:
+            if self._afloat(target):  # not sunk earlier this tick
+                self._hit(ball_id, shooter, target)
+
+    def _hit(self, ball_id, shooter, target):
+        health = max(0, self.health.get(target, PLAYER_MAX_HEALTH) - 1)
+        self.health[target] = health
+        self.hits += 1
+        self._remove_ball(ball_id)
+        msg = {"t": "hit", "ball": ball_id, "shooter": shooter, "target": target,
+               "health": health, "tick": self.tick_count}
+        self.recent_hits.append((self.tick_count + HIT_RESEND_TICKS - 1, self.room_of(target), msg))
+        if health == 0:
+            print(f"💀 {target[:8]} sunk by {shooter[:8]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Boat Man Shooters dedicated server")
+    parser.add_argument("--host", default=RELAY_HOST)
+    parser.add_argument("--port", type=int, default=RELAY_PORT)
+    parser.add_argument("--tick-rate", type=int, default=SERVER_TICK_RATE)
+    args = parser.parse_args()
+
+    server = GameServer(args.host, args.port, args.tick_rate)
+    print(f"⚓ Simulating at {args.tick_rate} ticks/s")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Server stopped")
@@ -0,0 +1,143 @@
+"""Per-player sample history backed by a preallocated NumPy ring buffer.
+
+The network side appends samples into a HistoryBuffer as they arrive (the
+common case, a sample newer than everything held, is O(1) and allocates
+nothing) and publishes a frozen HistoryView for the frame loop. A view reads
+the ring in place: the buffer copies its ring before the next write instead
+(copy on write), so publishing costs nothing until new samples arrive.
+"""
+
+import numpy as np
+from config import MAX_HISTORY
+
+#column layout of a sample row
+X, Y, ROT, TS = range(4)
+
+
+def bisect_rows(ts, t):
+    """np.searchsorted(ts[i], t[i], side="right") for every row i at once.
+
+    Each row of ts must be ascending (pad unused slots with inf). It's a binary
+    search run on all the rows together, one vector step per bit of the width.
+    """
+    n, width = ts.shape
+    rows = np.arange(n)
+    last = width - 1
+    count = np.zeros(n, dtype=np.intp)
+    step = 1 << (width.bit_length() - 1)
+    while step:
+        #at least count + step samples are <= t if the (count + step)th one is
+        count += (ts[rows, np.minimum(count + step - 1, last)] <= t) * step
+        step >>= 1
+    return np.minimum(count, width)
+
+
+class HistoryView:
+    """Read-only samples of one player, read straight out of its buffer's ring."""
+
+    __slots__ = ("_ring", "_start", "_len")
+
+    def __init__(self, ring, start, length):
+        ring.flags.writeable = False
+        self._ring = ring  # (capacity, 4) float64: x, y, rot, ts
+        self._start = start
+        self._len = length
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def newest(self):
+        """The newest sample's (x, y, rot, ts) row."""
+        return self._ring[(self._start + self._len - 1) % len(self._ring)]
+
+    @property
+    def newest_ts(self):
+        return float(self.newest[TS])
+
+    def copy_into(self, out):
+        """Write the samples, oldest first, into out[:len(self)]."""
+        end = self._start + self._len
+        cap = len(self._ring)
+        if end <= cap:
+            out[:self._len] = self._ring[self._start:end]
+        else:
+            split = cap - self._start
+            out[:split] = self._ring[self._start:]
+            out[split:self._len] = self._ring[:end - cap]
+
+
+class HistoryBuffer:
+    """Fixed-capacity ring of samples kept in timestamp order, one sample per timestamp."""
+
+    def __init__(self, capacity=MAX_HISTORY):
+        self._data = np.empty((capacity, 4))
+        self._start = 0
+        self._len = 0
+        self._shared = False  # a published view reads _data, so copy it before writing
+        self.duplicates = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    @property
+    def newest_ts(self):
+        return float(self._data[(self._start + self._len - 1) % self.capacity, TS])
+
+    def append(self, x, y, rot, ts):
+        """Add a sample. Returns False if it was a duplicate (or too old to keep)."""
+        cap = self.capacity
+        if self._len:
+            newest = self.newest_ts
+            if ts == newest:
+                self.duplicates += 1
+                return False
+            if ts < newest:
+                return self._insert(x, y, rot, ts)
+
+        #newer than everything held: write at the tail, overwriting the oldest once full
+        self._own()
+        row = self._data[(self._start + self._len) % cap]
+        row[X], row[Y], row[ROT], row[TS] = x, y, rot, ts
+        if self._len < cap:
+            self._len += 1
+        else:
+            self._start = (self._start + 1) % cap
+        return True
+
+    def _insert(self, x, y, rot, ts):
+        #out of order (rare): rebuild in place around the new sample
+        ordered = self.ordered()
+        i = int(np.searchsorted(ordered[:, TS], ts))
+        if i < len(ordered) and ordered[i, TS] == ts:
+            self.duplicates += 1
+            return False
+        if i == 0 and self._len == self.capacity:
+            return False  # older than anything we'd keep
+        merged = np.insert(ordered, i, (x, y, rot, ts), axis=0)[-self.capacity:]
+        self._own()
+        self._data[:len(merged)] = merged
+        self._start = 0
+        self._len = len(merged)
+        return True
+
+    def ordered(self):
+        """Copy of the samples, oldest first."""
+        end = self._start + self._len
+        if end <= self.capacity:
+            return self._data[self._start:end].copy()
+        return np.concatenate((self._data[self._start:], self._data[:end - self.capacity]))
+
+    def _own(self):
+        if self._shared:
+            self._data = self._data.copy()
+            self._shared = False
+
+    def view(self):
+        """A frozen view of the samples as they are now (no copy: the next write copies the ring instead)."""
+        self._shared = True
+        return HistoryView(self._data, self._start, self._len)
@@ -2,6 +2,10 @@ import pygame
 import math
 import os
 import sys
+from config import WORLD_WIDTH, WORLD_HEIGHT
+
+#the rock layout below was placed on a 15x15 world, other sizes stretch it to fit
+LAYOUT_SIZE = 15.0
 
 #file path initialization
 if sys.platform == 'darwin' and 'Contents/MacOS' in sys.argv[0]:
@@ -35,12 +39,14 @@ class Item:
 
 
 class ItemManager:
-    def __init__(self, num_items=15):
+    def __init__(self, num_items=15, load_images=True):
         self.items = []
         self.images = {}
         self.num_items = num_items
         self.textures = {}  # Will store ModernGL textures
-        self._load_item_images()
+        #the dedicated server only needs the rocks for collisions
+        if load_images:
+            self._load_item_images()
         xvalues = [3, 14, 7, 11, 2, 9, 13, 5, 12, 6, 8, 1, 13, 4, 10, 7, 3, 15, 9, 12, 5, 11]
         yvalues = [8, 2, 14, 6, 11, 3, 10, 7, 10, 4, 13, 5, 9, 1, 12, 8, 14, 6, 11, 3, 14.2]
         item_types =   [1, 6, 3, 4, 7, 1, 2, 3, 4, 5, 7, 2, 3, 4, 5, 1, 2, 3, 6, 5, 7, 6]
@@ -83,8 +89,8 @@ class ItemManager:
         for _ in range(self.num_items):
 
             # Set position within world bounds
-            x = xvalues.pop(0)
-            y = yvalues.pop(0)
+            x = xvalues.pop(0) * WORLD_WIDTH / LAYOUT_SIZE
+            y = yvalues.pop(0) * WORLD_HEIGHT / LAYOUT_SIZE
 
             #set type
             item_type = item_types.pop(0)
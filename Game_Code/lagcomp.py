@@ -0,0 +1,105 @@
+"""Lag compensation: judge shots against boats where the shooter saw them.
+
+A client draws other boats its interpolation delay in the past, so a shot that
+visibly hits on the shooter's screen would miss the boats' current positions.
+The server keeps a short history of every boat (one frame per tick) and tests
+each shot's movement this tick against the boats rewound by that shooter's
+delay. Everything is NumPy over all shots x all boats at once.
+"""
+
+import math
+import numpy as np
+from config import LAG_COMP_MAX, SERVER_TICK_RATE
+
+
+class BoatHistory:
+    """Ring of per-tick boat positions, one column ("slot") per boat."""
+
+    def __init__(self, window=LAG_COMP_MAX, tick_rate=SERVER_TICK_RATE, slots=16):
+        frames = int(math.ceil(window * tick_rate)) + 2
+        self.times = np.full(frames, -np.inf)
+        self.positions = np.full((frames, slots, 2), np.nan)
+        self.head = 0  # next frame to write
+        self.count = 0
+        self.slots = {}  # player_id -> slot
+        self.ids = [None] * slots  # slot -> player_id
+        self._free = list(range(slots - 1, -1, -1))
+
+    def _slot(self, pid):
+        slot = self.slots.get(pid)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self.slots[pid] = slot
+            self.ids[slot] = pid
+            self.positions[:, slot] = np.nan  # no history from whoever had it before
+        return slot
+
+    def _grow(self):
+        old = self.positions.shape[1]
+        extra = np.full((len(self.times), old, 2), np.nan)
+        self.positions = np.concatenate((self.positions, extra), axis=1)
+        self.ids.extend([None] * old)
+        self._free.extend(range(2 * old - 1, old - 1, -1))
+
+    def forget(self, pid):
+        slot = self.slots.pop(pid, None)
+        if slot is not None:
+            self.ids[slot] = None
+            self._free.append(slot)
+
+    def record(self, t, boats):
+        """Add the frame for time t from {player_id: (x, y)}."""
+        slots = [self._slot(pid) for pid in boats]  # may grow positions
+        frame = self.positions[self.head]
+        frame[:] = np.nan
+        if slots:
+            frame[slots] = list(boats.values())
+        self.times[self.head] = t
+        self.head = (self.head + 1) % len(self.times)
+        self.count = min(self.count + 1, len(self.times))
+
+    def rewind(self, times):
+        """Positions of every slot at each of times, shape (len(times), slots, 2).
+
+        Linear between the two frames around each time, clamped to the oldest
+        and newest frame; NaN where the boat wasn't around.
+        """
+        n = len(self.times)
+        order = (self.head - self.count + np.arange(self.count)) % n  # oldest first
+        ts = self.times[order]
+        frames = self.positions[order]
+
+        i1 = np.clip(np.searchsorted(ts, times, side="right"), 1, max(1, self.count - 1))
+        i0 = i1 - 1
+        if self.count == 1:
+            i0 = i1 = np.zeros(len(times), dtype=np.intp)
+        span = np.maximum(1e-9, ts[i1] - ts[i0])
+        f = np.clip((np.asarray(times) - ts[i0]) / span, 0.0, 1.0)[:, None, None]
+        a = frames[i0]
+        b = frames[i1]
+        #a boat that just joined (or left) has only one side: use that one
+        a = np.where(np.isnan(a), b, a)
+        b = np.where(np.isnan(b), a, b)
+        return a + (b - a) * f
+
+
+def segment_hits(start, end, centers, radius):
+    """Which circles each segment passes through, and how far along.
+
+    start, end: (n, 2) shot positions at the start/end of the tick.
+    centers: (n, m, 2) boat positions to test each shot against (NaN = skip).
+    Returns (hit (n, m) bool, t (n, m) fraction along the segment of the closest approach).
+    """
+    d = end - start
+    length2 = np.einsum("ij,ij->i", d, d)[:, None]
+    rel = centers - start[:, None, :]
+    t = np.einsum("imj,ij->im", rel, d) / np.where(length2 > 0.0, length2, 1.0)
+    t = np.clip(t, 0.0, 1.0)
+    closest = start[:, None, :] + t[:, :, None] * d[:, None, :]
+    gap = centers - closest
+    dist2 = np.einsum("imj,imj->im", gap, gap)
+    with np.errstate(invalid="ignore"):
+        hit = dist2 <= radius * radius
+    return hit, t
@@ -0,0 +1,367 @@
+"""LOCAL STAND-IN FOR THE SUPABASE REST API (POSTGREST) AND REALTIME
+
+Serves the part of the Supabase API the game and cannonball_test.py use, from
+in-memory players, cannonballs and chat tables, so every network code path can
+be run, load-tested and profiled without the hosted project:
+
+    python local_supabase.py --latency 0.04 --jitter 0.02
+
+and start the game with BMS_SUPABASE_URL=http://127.0.0.1:54321.
+
+    /rest/v1/<table>           GET (select), POST (insert / upsert), PATCH, DELETE
+                               filters: eq neq gt gte lt lte in is (and not.<op>),
+                               select, order, limit, offset, on_conflict
+    /rest/v1/rpc/server_time   the clock, like the SQL function
+    /rest/v1/rpc/world_snapshot
+    /realtime/v1/websocket     Realtime postgres_changes (BMS_SUBSCRIBE=1)
+
+Numbers and ISO timestamps compare by value, as they would in Postgres.
+Every REST request is held for the configured latency (plus up to the jitter)
+before it's answered.
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Lock
+from urllib.parse import urlsplit, parse_qsl
+from config import *
+import changefeed
+import websock
+
+#query parameters that aren't column filters
+RESERVED = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+#columns Postgres fills in when an insert leaves them out
+DEFAULTS = {
+    "cannonballs": {"id": lambda: str(uuid.uuid4()), "created_at": lambda: _iso(time.time())},
+    "chat": {"id": lambda: str(uuid.uuid4()), "created_at": lambda: _iso(time.time())},
+}
+
+
+class ApiError(Exception):
+    """An error answered as PostgREST's JSON body."""
+
+    def __init__(self, status, code, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.body = {"code": code, "message": message, "details": details, "hint": None}
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _key(value):
+    """Sort/compare key: numbers and timestamps by value, anything else as text."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return (0, float(value))
+    text = str(value)
+    try:
+        return (0, float(text))
+    except ValueError:
+        pass
+    try:
+        return (0, datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return (1, text)
+
+
+def _parse_filter(column, spec):
+    """"gt.5" -> a test for one row (PostgREST's column=op.value)."""
+    negate = spec.startswith("not.")
+    if negate:
+        spec = spec[4:]
+    op, _, raw = spec.partition(".")
+    if op == "in":
+        if not (raw.startswith("(") and raw.endswith(")")):
+            raise ApiError(400, "PGRST100", f'failed to parse filter ({spec})')
+        wanted = {_key(v.strip().strip('"')) for v in raw[1:-1].split(",") if v.strip()}
+        test = lambda value: _key(value) in wanted
+    elif op == "is":
+        if raw not in ("null", "true", "false"):
+            raise ApiError(400, "PGRST100", f'failed to parse filter ({spec})')
+        wanted = {"null": None, "true": True, "false": False}[raw]
+        test = lambda value: value is wanted
+    elif op in ("eq", "neq", "gt", "gte", "lt", "lte"):
+        target = _key(raw)
+        compare = {
+            "eq": lambda a: a == target,
+            "neq": lambda a: a != target,
+            "gt": lambda a: a > target,
+            "gte": lambda a: a >= target,
+            "lt": lambda a: a < target,
+            "lte": lambda a: a <= target,
+        }[op]
+
+        def test(value):
+            #like SQL, a null never matches a comparison
+            value = _key(value)
+            return value is not None and compare(value)
+    else:
+        raise ApiError(400, "PGRST100", f'failed to parse filter ({spec})')
+    if negate:
+        return lambda row: not test(row.get(column))
+    return lambda row: test(row.get(column))
+
+
+def _order(rows, spec):
+    #"col.desc,other.asc": sort by the last column first so the first one wins
+    for part in reversed([p for p in spec.split(",") if p]):
+        column, *flags = part.split(".")
+        desc = "desc" in flags
+        nulls_first = "nullsfirst" in flags or ("nullslast" not in flags and desc)
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: _key(row[column]), reverse=desc)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+def _prefer(header):
+    """"return=representation, count=exact" -> {"return": "representation", "count": "exact"}."""
+    prefs = {}
+    for part in (header or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            prefs[name] = value
+    return prefs
+
+
+class LocalSupabase:
+    """In-memory tables behind a PostgREST-style HTTP API, with Realtime on the same port."""
+
+    def __init__(self, host="127.0.0.1", port=LOCAL_SUPABASE_PORT,
+                 latency=LOCAL_SUPABASE_LATENCY, jitter=LOCAL_SUPABASE_JITTER):
+        self.latency = latency
+        self.jitter = jitter
+        self.feed = changefeed.ChangeFeedServer(port=None)  # holds the tables and pushes changes
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+        address = self.httpd.server_address
+        self.url = f"http://{address[0]}:{address[1]}"
+        self._write_lock = Lock()  # multi-row inserts are all or nothing
+
+        #counters
+        self.requests = 0
+
+    def start(self):
+        """Serve on a background thread (handy for local tests and benchmarks)."""
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.feed.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def serve_forever(self):
+        print(f"📡 Local Supabase listening on {self.url} "
+              f"(latency {self.latency * 1000:.0f}ms ± {self.jitter * 1000:.0f}ms)")
+        self.httpd.serve_forever()
+
+    def delay(self):
+        return self.latency + random.uniform(0.0, self.jitter)
+
+    #REST
+
+    def handle(self, method, path, query, body, prefer):
+        """One REST request -> (status, response body or None, extra headers)."""
+        parts = path.strip("/").split("/")
+        if parts[:2] != ["rest", "v1"] or len(parts) < 3:
+            raise ApiError(404, "PGRST125", f"Invalid path specified in request URL: {path}")
+        if parts[2] == "rpc" and len(parts) == 4:
+            if method not in ("GET", "POST"):
+                raise ApiError(405, "PGRST101", "Only GET and POST are allowed for functions")
+            params = dict(parse_qsl(query)) if method == "GET" else (body or {})
+            return 200, self.rpc(parts[3], params), {}
+        table = parts[2]
+        if table not in changefeed.KEYS:
+            raise ApiError(404, "42P01", f'relation "public.{table}" does not exist')
+
+        params = parse_qsl(query, keep_blank_values=True)
+        options = {name: value for name, value in params if name in RESERVED}
+        tests = [_parse_filter(name, value) for name, value in params if name not in RESERVED]
+        match = lambda row: all(test(row) for test in tests)
+
+        if method in ("GET", "HEAD"):
+            return self._select(table, match, options, prefer)
+        if method == "POST":
+            rows = self._insert(table, body, options, prefer)
+            status = 201
+        elif method == "PATCH":
+            rows = self._update(table, match, body)
+            status = 200
+        elif method == "DELETE":
+            rows = [change.record for change in self.feed.write(table, "DELETE", match=match)]
+            status = 200
+        else:
+            raise ApiError(405, "PGRST117", f"Unsupported HTTP method: {method}")
+        if prefer.get("return") != "representation":
+            return 204 if status == 200 else status, None, {}
+        return status, rows, {}
+
+    def _select(self, table, match, options, prefer):
+        rows = _order([row for row in self.feed.rows(table) if match(row)], options.get("order", ""))
+        total = len(rows)
+        offset = int(options.get("offset", 0))
+        rows = rows[offset:]
+        if "limit" in options:
+            rows = rows[:int(options["limit"])]
+
+        columns = [c.strip() for c in options.get("select", "*").split(",") if c.strip()]
+        if columns == ["count"]:
+            rows = [{"count": total}]
+        elif "*" not in columns:
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+
+        shown = f"{offset}-{offset + len(rows) - 1}" if rows else "*"
+        headers = {"Content-Range": f"{shown}/{total if prefer.get('count') else '*'}"}
+        return 200, rows, headers
+
+    def _insert(self, table, body, options, prefer):
+        key = changefeed.KEYS[table]
+        records = body if isinstance(body, list) else [body]
+        if not all(isinstance(record, dict) for record in records):
+            raise ApiError(400, "PGRST102", "All object keys must match")
+        upsert = prefer.get("resolution") == "merge-duplicates"
+        if upsert and options.get("on_conflict", key) != key:
+            raise ApiError(400, "42P10", "there is no unique or exclusion constraint matching the ON CONFLICT specification")
+
+        filled = []
+        for record in records:
+            record = dict(record)
+            for column, default in DEFAULTS.get(table, {}).items():
+                if record.get(column) is None:
+                    record[column] = default()
+            if record.get(key) is None:
+                raise ApiError(400, "23502", f'null value in column "{key}" of relation "{table}" violates not-null constraint')
+            filled.append(record)
+
+        with self._write_lock:
+            if not upsert:
+                existing = {row[key] for row in self.feed.rows(table)}
+                seen = set()
+                for record in filled:
+                    if record[key] in existing or record[key] in seen:
+                        raise ApiError(409, "23505", f'duplicate key value violates unique constraint "{table}_pkey"',
+                                       f"Key ({key})=({record[key]}) already exists.")
+                    seen.add(record[key])
+            rows = []
+            for record in filled:
+                changes = self.feed.write(table, "UPSERT" if upsert else "INSERT", record)
+                rows.extend(change.record for change in changes)
+        return rows
+
+    def _update(self, table, match, body):
+        if not isinstance(body, dict):
+            raise ApiError(400, "PGRST102", "Empty or invalid json")
+        key = changefeed.KEYS[table]
+        rows = []
+        with self._write_lock:
+            for row in self.feed.rows(table):
+                if match(row):
+                    update = dict(body, **{key: row[key]})
+                    rows.extend(change.record for change in self.feed.write(table, "UPSERT", update))
+        return rows
+
+    #functions
+
+    def rpc(self, name, params):
+        if name == "server_time":
+            return time.time()
+        if name == "world_snapshot":
+            return self._world_snapshot(params)
+        raise ApiError(404, "PGRST202", f"Could not find the function public.{name} in the schema cache")
+
+    def _world_snapshot(self, params):
+        """Same result as the world_snapshot SQL function in the ReadME."""
+        room = params.get("room")
+        bounds = [params.get(name) for name in ("min_x", "min_y", "max_x", "max_y")]
+        player_since = _key(params.get("player_since"))
+        cannonball_since = _key(params.get("cannonball_since"))
+        exclude = params.get("exclude_player_id")
+
+        players = [row for row in self.feed.rows("players")
+                   if (player_since is None or (_key(row.get("updated_at")) or (0, -math.inf)) > player_since)
+                   and (bounds[0] is None or (bounds[0] <= float(row["x"]) <= bounds[2]
+                                              and bounds[1] <= float(row["y"]) <= bounds[3]))
+                   and (room is None or row.get("room") == room)]
+        cannonballs = [row for row in self.feed.rows("cannonballs")
+                       if (cannonball_since is None or (_key(row.get("created_at")) or (0, -math.inf)) >= cannonball_since)
+                       and (exclude is None or row.get("player_id") != exclude)
+                       and (room is None or row.get("room") == room)]
+        return {
+            "tick": math.floor(time.time() * SERVER_TICK_RATE),
+            "players": _order(players, "updated_at"),
+            "cannonballs": _order(cannonballs, "created_at"),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the hosted API
+
+    def log_message(self, format, *args):
+        pass  # a request per frame per client would drown the console
+
+    def _request(self):
+        app = self.server.app
+        app.requests += 1
+        parts = urlsplit(self.path)
+
+        if parts.path.startswith("/realtime/") and self.headers.get("Upgrade", "").lower() == "websocket":
+            ws = websock.upgrade(self.connection, self.headers.get("Sec-WebSocket-Key", ""))
+            app.feed.serve(ws)
+            self.close_connection = True
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                raise ApiError(400, "PGRST102", "Empty or invalid json")
+            status, payload, headers = app.handle(self.command, parts.path, parts.query, body,
+                                                  _prefer(self.headers.get("Prefer")))
+        except ApiError as e:
+            status, payload, headers = e.status, e.body, {}
+        except (ValueError, KeyError, TypeError) as e:
+            status, payload, headers = 400, {"code": "PGRST100", "message": str(e), "details": None, "hint": None}, {}
+
+        time.sleep(app.delay())
+        data = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = _request
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Boat Man Shooters local Supabase (PostgREST + Realtime stand-in)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=LOCAL_SUPABASE_PORT)
+    parser.add_argument("--latency", type=float, default=LOCAL_SUPABASE_LATENCY, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=LOCAL_SUPABASE_JITTER, help="up to this many more seconds, at random")
+    args = parser.parse_args()
+
+    server = LocalSupabase(args.host, args.port, args.latency, args.jitter)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Local Supabase stopped")
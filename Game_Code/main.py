@@ -12,6 +12,7 @@ import random
 import numpy as np
 import os
 import sys
+import time
 
 #file path initialization
 if sys.platform == 'darwin' and 'Contents/MacOS' in sys.argv[0]:
@@ -24,10 +25,13 @@ from config import *
 from renderer import Renderer
 from player import Player
 from network import NetworkManager
+from connection import ConnectionManager
 from prediction import PredictionManager
 from items import ItemManager
 from cannonball import CannonBall
 from buttons import ButtonSubmit
+import movement
+import telemetry
 
 pygame.init()
 
@@ -72,6 +76,8 @@ game_state = "SPLASH" #(loading)
 
 player = None
 network = None
+#connects in the background while the splash screen and menus are up, so joining doesn't wait on it
+connections = ConnectionManager()
 prediction = None
 item_manager = None
 menu_buttons = []
@@ -79,6 +85,7 @@ death_buttons = []
 
 # cannon vars
 cannon_balls = []
+remote_spawned = set()  # server ids of remote shots we've made a CannonBall for (so a landed one isn't respawned)
 L_Can_fire = True
 R_Can_fire = True
 cooldown = 1.0
@@ -90,6 +97,10 @@ lt_rest = None
 rt_rest = None
 inescape_menu = False
 escape_was_pressed = False
+#F3 network stats overlay
+show_net_stats = False
+net_stats_lines = []
+net_stats_refresh = 0.0
 
 # timing
 splash_start_time = pygame.time.get_ticks() / 1000.0
@@ -103,13 +114,15 @@ def open_settings_action():
 
 async def main():
     global game_state, player, network, prediction, item_manager
-    global L_Can_fire, R_Can_fire, lt_rest, rt_rest, cannon_balls, L_cooldown_end, R_cooldown_end
+    global L_Can_fire, R_Can_fire, lt_rest, rt_rest, cannon_balls, remote_spawned, L_cooldown_end, R_cooldown_end
     global inescape_menu, escape_was_pressed, menu_buttons, death_buttons
     global splash_start_time, load_start_time
+    global show_net_stats, net_stats_lines, net_stats_refresh
 
     running = True
     start_ticks = pygame.time.get_ticks()
     loading_game = False
+    connections.warm()
 
     def set_loading_game(value):
         global load_start_time
@@ -119,6 +132,7 @@ async def main():
             load_start_time = pygame.time.get_ticks() / 1000.0
 
     while running:
+        frame_start = time.perf_counter()
         cancel_button = renderer.cancel_button
         menu_boolean = renderer.menu_boolean
         if menu_boolean is True:
@@ -210,6 +224,10 @@ async def main():
                         inescape_menu = not inescape_menu
                         escape_was_pressed = True
 
+                    if event.key == pygame.K_F3:
+                        show_net_stats = not show_net_stats
+                        net_stats_refresh = 0.0
+
                 if event.type == pygame.KEYUP and event.key == pygame.K_ESCAPE:
                     escape_was_pressed = False
 
@@ -241,15 +259,16 @@ async def main():
                     fallback_x, fallback_y = 2.0, 2.0
                     player = Player(fallback_x, fallback_y)
                     for _ in range(50):
-                        rx = random.randint(1, WORLD_WIDTH - 1)
-                        ry = random.randint(1, WORLD_HEIGHT - 1)
+                        rx = random.uniform(1.0, WORLD_WIDTH - 1.0)
+                        ry = random.uniform(1.0, WORLD_HEIGHT - 1.0)
                         if not item_manager.check_collision(rx, ry, player_radius=0.5):
                             player = Player(rx, ry)
                             break
 
-                    network = NetworkManager(player)
+                    network = NetworkManager(player, session=connections.take())
                     prediction = PredictionManager()
                     cannon_balls = []
+                    remote_spawned = set()
                     print(f"{network.PLAYER_NAME} joined game")
                     game_state = "GAME"
                     loading_game = False
@@ -266,32 +285,52 @@ async def main():
                 renderer.render_menu(current_time, menu_buttons)
         elif game_state == "GAME":
             keys = pygame.key.get_pressed()
-            player.update(dt, keys, controller_joystick)
+            if network:
+                network.record_frame(clock.get_time() / 1000.0)
+                #correct our boat to the backend's state before predicting this frame on top of it
+                network.reconcile_player(item_manager)
+            #the boat moves by the same clamped dt the input log (and the backend's replay of it) uses
+            move_dt = min(dt, INPUT_MAX_DT)
+            inputs = player.update(move_dt, keys, controller_joystick)
+            if network and inputs:
+                network.record_input(move_dt, *inputs)
+
+            # a dedicated server decides hits: take the damage it reports and drop the balls that landed
+            server_hits = network is not None and network.owns_hits
+            hit_balls = set()
+            if server_hits:
+                for hit in network.take_hits():
+                    hit_balls.add(hit["ball"])
+                    if hit["target"] == network.PLAYER_ID:
+                        player.take_damage(player.health - hit["health"])
 
             # update cannonballs and check collisions with player
             updated_balls = []
             for b in cannon_balls:
                 alive = b.update(dt)
-                if not alive:
+                if not alive or (b.server_id is not None and b.server_id in hit_balls):
                     continue
-                # collision check (world units)
-                dx = b.x - player.x
-                dy = b.y - player.y
-                # expand hit radius a bit to better match visual boat size
-                if (dx * dx + dy * dy) <= (0.18 * 0.18):
-                    # hit: remove one health per cannonball hit
-                    player.take_damage(1)
-                    continue  # do not keep this ball
+                if not server_hits:
+                    # collision check (world units)
+                    dx = b.x - player.x
+                    dy = b.y - player.y
+                    # expand hit radius a bit to better match visual boat size
+                    if (dx * dx + dy * dy) <= (HIT_RADIUS * HIT_RADIUS):
+                        # hit: remove one health per cannonball hit
+                        player.take_damage(1)
+                        continue  # do not keep this ball
                 updated_balls.append(b)
             cannon_balls = updated_balls
 
             if network:
-                remote_balls = network.get_remote_cannonballs()
-                for ball in remote_balls:
-                    ball.update(dt)
-                for remote_ball in remote_balls:
-                    if remote_ball.server_id not in [cb.server_id for cb in cannon_balls if hasattr(cb, 'server_id')]:
-                        cannon_balls.append(remote_ball)
+                #the snapshot only has rows: our CannonBalls are made from them here and moved by the loop above
+                live_ids = set()
+                for row in network.get_remote_cannonballs():
+                    live_ids.add(row["id"])
+                    if row["id"] not in remote_spawned:
+                        remote_spawned.add(row["id"])
+                        cannon_balls.append(CannonBall.from_dict(row))
+                remote_spawned &= live_ids
 
             # death check and transition
             if hasattr(player, 'dead') and player.dead:
@@ -306,6 +345,8 @@ async def main():
                     except Exception:
                         pass
                     network = None
+                # get the next session ready while the death menu is up
+                connections.warm()
                 # create death menu buttons
                 def try_again_action():
                     global load_start_time
@@ -346,14 +387,16 @@ async def main():
                                  scale=0.32, action=main_menu_action)
                 ]
 
-            collision = item_manager.check_collision(player.x, player.y, player_radius=0.15)
-            if collision:
-                item_manager.resolve_collision(player, collision)
+            movement.collide(player, item_manager)
+
+            #pick up the latest world the network side published (one read, no copying)
+            world = network.snapshot if network else None
 
             #safely update predictions only when network is available
-            if prediction and network:
+            if prediction and world:
                 try:
-                    prediction.update_predictions(dt, getattr(network, 'other_players', {}))
+                    prediction.update_predictions(dt, world.players)
+                    network.view_delay = prediction.view_delay()
                 except Exception as e:
                     print(f"Prediction update error: {e}")
 
@@ -362,12 +405,19 @@ async def main():
 
             try:
                 names = {'local': getattr(network, 'PLAYER_NAME', 'You')}
-                for pid, data in network.other_players.items():
-                    names[pid] = data.get('name', '???')
+                for pid, remote in (world.players if world else {}).items():
+                    names[pid] = remote.name or '???'
                 renderer.draw_player_nametags(player, prediction.other_players_display, names=names, y_offset=90)
                 renderer.draw_minimap(player, prediction.other_players_display)
                 renderer.draw_sprint_bar(player)
 
+                if show_net_stats and network:
+                    #stats() walks every history; a couple of refreshes a second is plenty to read
+                    if current_time >= net_stats_refresh:
+                        net_stats_lines = telemetry.overlay_lines(network.stats())
+                        net_stats_refresh = current_time + TELEMETRY_OVERLAY_REFRESH
+                    renderer.draw_network_stats(net_stats_lines)
+
                 if inescape_menu:
                     renderer.escape_menu(player)
 
@@ -408,18 +458,19 @@ async def main():
                     player = Player(fallback_x, fallback_y)
                 #try to find a free spawn
                 for _ in range(50):
-                    rx = random.randint(1, WORLD_WIDTH - 1)
-                    ry = random.randint(1, WORLD_HEIGHT - 1)
+                    rx = random.uniform(1.0, WORLD_WIDTH - 1.0)
+                    ry = random.uniform(1.0, WORLD_HEIGHT - 1.0)
                     if not item_manager.check_collision(rx, ry, player_radius=0.5):
                         player.reset(rx, ry)
                         break
                 else:
                     player.reset(fallback_x, fallback_y)
 
-                #restart network connection
-                network = NetworkManager(player)
+                #restart network connection (warmed up while the death menu was showing)
+                network = NetworkManager(player, session=connections.take())
                 prediction = PredictionManager()
                 cannon_balls = []
+                remote_spawned = set()
                 print("Restarting game after death")
                 game_state = "GAME"
                 load_start_time = None
@@ -428,11 +479,17 @@ async def main():
                 renderer.render_loading_screen(current_time, progress)
 
         pygame.display.flip()
-        clock.tick(TARGET_FPS)
-        await asyncio.sleep(0)
+        if NETWORK_ENGINE == "asyncio":
+            #sleep off the rest of the frame on the event loop so the network tasks get it
+            await asyncio.sleep(max(0.0, frame_start + 1.0 / TARGET_FPS - time.perf_counter()))
+            clock.tick()
+        else:
+            clock.tick(TARGET_FPS)
+            await asyncio.sleep(0)
 
     if network:
         network.stop()
+    connections.stop()
     pygame.quit()
 
 
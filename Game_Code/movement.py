@@ -0,0 +1,90 @@
+"""Boat movement without pygame: the one place a boat's inputs turn into motion.
+
+Player.update runs it every frame, the client replays logged inputs through it
+when the relay corrects our position, and the relay/server runs it to own
+positions. Anything with the BoatState attributes (Player included) can be
+stepped.
+"""
+
+import math
+from collections import namedtuple
+from utils import lerp_angle
+from config import SPRINT, WORLD_WIDTH, WORLD_HEIGHT, BOAT_COLLISION_RADIUS
+
+SPEED = 1.0
+BACKWARD_SPEED = 0.25
+ROTATION_SPEED = 3.8
+ROTATION_SMOOTHING = 0.15
+ACCELERATION = 4.0
+DECELERATION = 5.0
+
+#one frame of input: move is -3 (reverse) .. 1 (ahead), turn is positive to port
+BoatInput = namedtuple("BoatInput", ["seq", "dt", "move", "turn", "sprint"])
+
+#the fields that make up a boat's simulated state
+STATE_FIELDS = ("x", "y", "rotation", "target_rotation", "current_velocity", "sprint")
+
+
+class BoatState:
+    """Headless stand-in for Player (servers, bots)."""
+
+    def __init__(self, x, y, rotation=-math.pi / 2):
+        self.x = x
+        self.y = y
+        self.rotation = rotation
+        self.target_rotation = rotation
+        self.current_velocity = 0.0
+        self.velocity_x = 0.0
+        self.velocity_y = 0.0
+        self.sprint = SPRINT
+        self.sprinting = False
+
+
+def get_state(boat):
+    return {name: float(getattr(boat, name)) for name in STATE_FIELDS}
+
+
+def set_state(boat, state):
+    for name in STATE_FIELDS:
+        setattr(boat, name, state[name])
+
+
+def step(boat, move_input, turn_input, sprint_pressed, dt):
+    """Advance boat by dt seconds of input."""
+    #apply the sprint
+    if sprint_pressed and move_input > 0 and boat.sprint > 0:
+        boat.sprinting = True
+        boat.sprint = max(0, boat.sprint - dt * 35)
+        move_input = 2.0
+    else:
+        boat.sprinting = False
+        if boat.sprint < SPRINT:
+            boat.sprint += dt * 12  # regen
+
+    # rotation
+    boat.target_rotation += turn_input * ROTATION_SPEED * dt
+    boat.rotation = lerp_angle(boat.rotation, boat.target_rotation, ROTATION_SMOOTHING)
+    boat.rotation %= (2 * math.pi)
+    boat.target_rotation %= (2 * math.pi)
+
+    #movement smoothing
+    if move_input > boat.current_velocity:
+        boat.current_velocity = min(boat.current_velocity + ACCELERATION * dt, move_input)
+    else:
+        boat.current_velocity = max(boat.current_velocity - DECELERATION * dt, move_input)
+
+    speed_multiplier = SPEED if boat.current_velocity >= 0 else BACKWARD_SPEED
+    boat.x += math.cos(boat.rotation) * speed_multiplier * boat.current_velocity * dt
+    boat.y += math.sin(boat.rotation) * speed_multiplier * boat.current_velocity * dt
+
+    #clamp to world
+    boat.x = max(0.5, min(WORLD_WIDTH - 0.5, boat.x))
+    boat.y = max(0.5, min(WORLD_HEIGHT - 0.5, boat.y))
+    return boat
+
+
+def collide(boat, items):
+    """Push boat out of any rock in items (an ItemManager). Runs after every step."""
+    collision = items.check_collision(boat.x, boat.y, player_radius=BOAT_COLLISION_RADIUS)
+    if collision:
+        items.resolve_collision(boat, collision)
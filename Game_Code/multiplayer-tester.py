@@ -1,16 +1,29 @@
-""""ALLOWS YOU TO RUN TWO GAMES AT ONCE FOR INDIVIDUAL TESTING"""""
+""""ALLOWS YOU TO RUN SEVERAL GAMES AT ONCE FOR INDIVIDUAL TESTING"""""
 
+import argparse
+import os
 import subprocess
 import sys
 
 script_to_run = "main.py"
 
-#launch the first one
-process1 = subprocess.Popen([sys.executable, script_to_run])
+parser = argparse.ArgumentParser(description="Run several copies of the game on this machine")
+parser.add_argument("-n", "--instances", type=int, default=2, help="how many games to launch (default 2)")
+parser.add_argument("--transport", choices=["supabase", "udp", "feed", "shm"],
+                    help="backend for all of them; shm swaps updates through shared memory, with no network at all")
+parser.add_argument("--room", help="room to put them all in")
+args = parser.parse_args()
 
-#launch the second one
-process2 = subprocess.Popen([sys.executable, script_to_run])
+#every copy gets the same backend and room through the environment
+env = dict(os.environ)
+if args.transport:
+    env["BMS_TRANSPORT"] = args.transport
+if args.room:
+    env["BMS_ROOM"] = args.room
 
-#wait for both processes to complete
-process1.wait()
-process2.wait()
\ No newline at end of file
+#launch them all
+processes = [subprocess.Popen([sys.executable, script_to_run], env=env) for _ in range(args.instances)]
+
+#wait for all processes to complete
+for process in processes:
+    process.wait()
@@ -0,0 +1,425 @@
+"""NETWORK CONDITION SIMULATOR: DELAY, JITTER, LOSS, DUPLICATION AND REORDERING
+
+SimulatedTransport wraps any transport and puts a simulated link in front
+of it in both directions. Whatever the game sends reaches the real transport
+late, out of order, twice or not at all, and so does whatever it receives.
+Set BMS_NETSIM to a profile name (see PROFILES) to play through one, or run the
+harness to measure how far the smoothing's picture of a remote boat is from
+where that boat really is under each profile:
+
+    python netsim.py --profiles lan wifi mobile congested --duration 20
+
+Streams (websockets, HTTP) can't lose or reorder anything, so for those a lost
+packet turns into a retransmission delay that holds up everything behind it.
+Datagrams (the relay) really are dropped, duplicated and reordered.
+"""
+
+import argparse
+import bisect
+import heapq
+import itertools
+import math
+import random
+import time
+from collections import namedtuple
+from threading import Thread, Condition, Lock
+from config import *
+from transport import WorldDelta
+
+#one direction of a link: one-way delay plus up to `jitter` more (seconds), and the
+#chance of each packet being lost, duplicated or held back behind later ones
+LinkProfile = namedtuple("LinkProfile", ["delay", "jitter", "loss", "duplicate", "reorder"])
+
+PROFILES = {
+    "perfect": LinkProfile(0.0, 0.0, 0.0, 0.0, 0.0),
+    "lan": LinkProfile(0.002, 0.001, 0.0, 0.0, 0.0),
+    "broadband": LinkProfile(0.020, 0.005, 0.002, 0.0, 0.001),
+    "wifi": LinkProfile(0.030, 0.020, 0.01, 0.002, 0.01),
+    "mobile": LinkProfile(0.060, 0.040, 0.03, 0.005, 0.02),
+    "congested": LinkProfile(0.120, 0.080, 0.08, 0.01, 0.05),
+}
+
+#a stream resends a lost packet after this long at the least (TCP's minimum RTO)
+MIN_RETRANSMIT = 0.2
+
+
+class Link:
+    """One direction of a simulated connection: what goes in comes out later, or not at all."""
+
+    def __init__(self, profile, rng, stream):
+        self.profile = profile
+        self.rng = rng
+        self.stream = stream  # in order and lossless, late instead
+        self._queue = []  # heap of (due, n, item)
+        self._order = itertools.count()
+        self._last_due = 0.0
+        self._lock = Lock()
+
+        #counters
+        self.packets = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.reordered = 0
+        self.retransmitted = 0
+
+    def put(self, item, now):
+        p, rng = self.profile, self.rng
+        with self._lock:
+            self.packets += 1
+            due = now + p.delay + rng.uniform(0.0, p.jitter)
+            if self.stream:
+                #every loss costs a retransmission, and nothing overtakes a late packet
+                while rng.random() < p.loss:
+                    self.retransmitted += 1
+                    due += max(MIN_RETRANSMIT, 2.0 * (p.delay + p.jitter))
+                due = max(due, self._last_due)
+                self._last_due = due
+                heapq.heappush(self._queue, (due, next(self._order), item))
+                return
+            if rng.random() < p.loss:
+                self.dropped += 1
+                return
+            copies = 1
+            if rng.random() < p.duplicate:
+                self.duplicated += 1
+                copies = 2
+            for _ in range(copies):
+                if rng.random() < p.reorder:
+                    self.reordered += 1
+                    due += rng.uniform(0.0, p.delay + p.jitter + 0.05)
+                heapq.heappush(self._queue, (due, next(self._order), item))
+                due = now + p.delay + rng.uniform(0.0, p.jitter)
+
+    def take(self, now):
+        """Everything due by now, in the order it arrives."""
+        items = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                items.append(heapq.heappop(self._queue)[2])
+        return items
+
+    def next_due(self):
+        with self._lock:
+            return self._queue[0][0] if self._queue else None
+
+    def stats(self):
+        return {
+            "packets": self.packets,
+            "dropped": self.dropped,
+            "duplicated": self.duplicated,
+            "reordered": self.reordered,
+            "retransmitted": self.retransmitted,
+            "in_flight": len(self._queue),
+        }
+
+
+class SimulatedTransport:
+    """A transport seen through a simulated link (up: what we send, down: what we receive).
+
+    Sends go out on a background thread once the up link delivers them, so
+    they never block the caller. Each fetch passes only the rows that are new
+    to us down the link (one packet per fetch), and hands back whatever the
+    link has delivered by then. Everything else goes straight to the real transport.
+    """
+
+    def __init__(self, inner, up=PROFILES["perfect"], down=None, seed=None):
+        self.inner = inner
+        rng = random.Random(seed)
+        stream = not inner.datagrams
+        self.up = Link(up, rng, stream)
+        self.down = Link(down or up, rng, stream)
+        self._ready = {"players": [], "cannonballs": [], "removed": [], "state": [], "hits": []}
+        self._ready_lock = Lock()
+        self._newest = {}  # player id -> newest updated_at passed down
+        self._seen_balls = {}  # cannonball id -> when it was passed down
+        self._tick = None
+        self._wakeup = Condition()
+        self.running = True
+        self.errors = 0
+        Thread(target=self._deliver_sends, daemon=True).start()
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    @property
+    def name(self):
+        return f"{self.inner.name} (simulated link)"
+
+    def close(self):
+        self.running = False
+        with self._wakeup:
+            self._wakeup.notify()
+        self.inner.close()
+
+    def stats(self):
+        return {"up": self.up.stats(), "down": self.down.stats(), "errors": self.errors}
+
+    #up
+
+    def _send(self, method, *args):
+        with self._wakeup:
+            self.up.put((method, args), time.time())
+            self._wakeup.notify()
+
+    def _deliver_sends(self):
+        while self.running:
+            for method, args in self.up.take(time.time()):
+                try:
+                    getattr(self.inner, method)(*args)
+                except Exception as e:
+                    if not self.errors:
+                        print(f"❌ Simulated send failed: {e}")
+                    self.errors += 1
+            with self._wakeup:
+                due = self.up.next_due()
+                self._wakeup.wait(0.05 if due is None else max(0.0, due - time.time()))
+
+    def upsert_player(self, data):
+        self._send("upsert_player", dict(data))
+
+    def send_inputs(self, player_id, inputs):
+        self._send("send_inputs", player_id, list(inputs))
+
+    def insert_cannonball(self, data):
+        self._send("insert_cannonball", dict(data))
+        return data
+
+    def insert_cannonballs(self, rows):
+        rows = [dict(row) for row in rows]
+        self._send("insert_cannonballs", rows)
+        return rows
+
+    #down
+
+    def _new_players(self, rows):
+        fresh = []
+        for row in rows:
+            ts = float(row.get("updated_at") or 0.0)
+            if ts > self._newest.get(row.get("player_id"), -math.inf):
+                self._newest[row.get("player_id")] = ts
+                fresh.append(row)
+        return fresh
+
+    def _new_cannonballs(self, rows, now):
+        fresh = [row for row in rows if row.get("id") not in self._seen_balls]
+        for row in fresh:
+            self._seen_balls[row.get("id")] = now
+        if len(self._seen_balls) > 4096:
+            cutoff = now - 2 * CANNONBALL_SYNC_WINDOW
+            self._seen_balls = {k: t for k, t in self._seen_balls.items() if t > cutoff}
+        return fresh
+
+    def _receive(self, now, **received):
+        """Pass one fetch's new data down the link and sort out what's arrived."""
+        packet = {kind: items for kind, items in received.items() if items}
+        if packet:
+            self.down.put(packet, now)
+        with self._ready_lock:
+            for delivered in self.down.take(now):
+                for kind, items in delivered.items():
+                    self._ready[kind].extend(items)
+
+    def _take(self, kind):
+        with self._ready_lock:
+            items, self._ready[kind] = self._ready[kind], []
+        return items
+
+    def fetch_world(self, player_since, cannonball_since, bounds=None, exclude_player_id=None):
+        world = self.inner.fetch_world(player_since, cannonball_since, bounds, exclude_player_id)
+        now = time.time()
+        self._receive(now, players=self._new_players(world.players),
+                      cannonballs=self._new_cannonballs(world.cannonballs, now), removed=list(world.removed))
+        if world.tick is not None:
+            self._tick = world.tick
+        return WorldDelta(self._tick, self._take("players"), self._take("cannonballs"), self._take("removed"))
+
+    def fetch_players(self, since, bounds=None):
+        self._receive(time.time(), players=self._new_players(self.inner.fetch_players(since, bounds)))
+        return self._take("players")
+
+    def fetch_cannonballs(self, since, exclude_player_id=None):
+        now = time.time()
+        self._receive(now, cannonballs=self._new_cannonballs(self.inner.fetch_cannonballs(since, exclude_player_id), now))
+        return self._take("cannonballs")
+
+    def fetch_authoritative_state(self):
+        state = self.inner.fetch_authoritative_state()
+        self._receive(time.time(), state=[state] if state else [])
+        states = self._take("state")
+        return max(states, key=lambda s: s[0]) if states else None
+
+    def fetch_hits(self):
+        self._receive(time.time(), hits=list(self.inner.fetch_hits()))
+        return self._take("hits")
+
+    def probe_clock(self):
+        #the probe itself crosses the real link; add the simulated trip to each side of it
+        sample = self.inner.probe_clock()
+        if sample is None:
+            return None
+        up, down = self.up.profile, self.down.profile
+        if not self.up.stream and (self.up.rng.random() < up.loss or self.down.rng.random() < down.loss):
+            return None
+        t0, t1, t2, t3 = sample
+        return (t0 - up.delay - self.up.rng.uniform(0.0, up.jitter), t1, t2,
+                t3 + down.delay + self.down.rng.uniform(0.0, down.jitter))
+
+    async def wait_for_data(self, timeout):
+        due = self.down.next_due()
+        if due is not None:
+            timeout = min(timeout, max(0.0, due - time.time()))
+        return await self.inner.wait_for_data(timeout) or (due is not None and due <= time.time())
+
+
+def wrap(transport, profile=NETSIM_PROFILE, seed=None):
+    """transport behind the named profile ("" leaves it as it is)."""
+    if not profile:
+        return transport
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown network profile '{profile}' (expected one of: {', '.join(PROFILES)})")
+    print(f"🐢 Simulating a {profile} link")
+    return SimulatedTransport(transport, PROFILES[profile], seed=seed)
+
+
+class _Truth:
+    """Where a boat really was, frame by frame, to compare the drawn position against."""
+
+    def __init__(self):
+        self.times = []
+        self.positions = []
+
+    def add(self, t, x, y):
+        self.times.append(t)
+        self.positions.append((x, y))
+
+    def at(self, t):
+        i = bisect.bisect_right(self.times, t)
+        if i == 0:
+            return self.positions[0]
+        if i == len(self.times):
+            return self.positions[-1]
+        t0, t1 = self.times[i - 1], self.times[i]
+        (x0, y0), (x1, y1) = self.positions[i - 1], self.positions[i]
+        a = (t - t0) / max(t1 - t0, 1e-9)
+        return x0 + (x1 - x0) * a, y0 + (y1 - y0) * a
+
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+def measure(profile_name, duration, make_transport, seed=0, fps=TARGET_FPS):
+    """Sail one scripted boat and watch it from a second client, both behind the profile.
+
+    make_transport() builds a fresh connection to the backend for each client. Returns how far the observer's drawn boat was from where it really was
+    (now, and at the moment the observer means to be showing), in world units.
+    """
+    from movement import BoatState
+    import movement
+    from network import NetworkManager
+    from prediction import PredictionManager
+
+    profile = PROFILES[profile_name]
+    rng = random.Random(seed)
+    boat = BoatState(WORLD_WIDTH / 2, WORLD_HEIGHT / 2)
+    sailor_link = SimulatedTransport(make_transport(), profile, seed=seed)
+    watcher_link = SimulatedTransport(make_transport(), profile, seed=seed + 1)
+    sailor = NetworkManager(boat, transport=sailor_link, engine="threads")
+    watcher_boat = BoatState(WORLD_WIDTH / 2, WORLD_HEIGHT / 2)
+    watcher = NetworkManager(watcher_boat, transport=watcher_link, engine="threads")
+    prediction = PredictionManager()
+    truth = _Truth()
+
+    error_now, error_view = [], []
+    move = turn = 0.0
+    next_input = 0.0
+    dt = 1.0 / fps
+    start = last = time.time()
+    try:
+        while time.time() - start < duration:
+            now = time.time()
+            frame_dt = now - last
+            last = now
+            if now >= next_input:
+                move = rng.choice((1.0, 1.0, 0.5, 0.0))
+                turn = rng.choice((-1.0, 0.0, 0.0, 1.0))
+                next_input = now + rng.uniform(*BOT_INPUT_HOLD)
+            sailor.reconcile_player()
+            move_dt = min(frame_dt, INPUT_MAX_DT)  # as main.py: the dt the input log replays with
+            movement.step(boat, move, turn, False, move_dt)
+            sailor.record_input(move_dt, move, turn, False)
+            truth.add(now, boat.x, boat.y)
+
+            prediction.update_predictions(frame_dt, watcher.snapshot.players)
+            drawn = prediction.other_players_display
+            if sailor.PLAYER_ID in drawn and now - start > 2.0:  # let the jitter buffer settle first
+                entry = drawn[sailor.PLAYER_ID]
+                error_now.append(math.hypot(entry["x"] - boat.x, entry["y"] - boat.y))
+                vx, vy = truth.at(now - prediction.view_delay())
+                error_view.append(math.hypot(entry["x"] - vx, entry["y"] - vy))
+            time.sleep(max(0.0, now + dt - time.time()))
+    finally:
+        stats = prediction.stats()
+        links = {"sailor": sailor_link.stats(), "watcher": watcher_link.stats()}
+        sailor.stop()
+        watcher.stop()
+
+    return {
+        "profile": profile_name,
+        "frames": len(error_now),
+        "error_now": {p: _percentile(error_now, p) for p in (50, 95, 99)},
+        "error_view": {p: _percentile(error_view, p) for p in (50, 95, 99)},
+        "error_view_max": max(error_view, default=0.0),
+        "view_delay": stats["delay_mean"],
+        "extrapolation_rate": stats["extrapolation_rate"],
+        "skip_extrapolation_rate": stats["skip_extrapolation_rate"],
+        "links": links,
+    }
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import json
+
+    parser = argparse.ArgumentParser(description="Measure remote boat smoothing error under simulated network conditions")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("-d", "--duration", type=float, default=15.0, help="seconds per profile")
+    parser.add_argument("--transport", default="feed", choices=["supabase", "udp", "feed", "shm"],
+                        help="backend to measure through; with feed (default) a change feed is started here")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    server = None
+    if args.transport == "feed":
+        import changefeed
+        from transport import FeedTransport
+        server = changefeed.ChangeFeedServer(port=0).start()
+        make_transport = lambda: FeedTransport(server.url)
+    else:
+        from transport import TRANSPORTS
+        make_transport = lambda: TRANSPORTS[args.transport]()
+
+    results = []
+    print(f"{'profile':>10} {'now p50':>8} {'now p95':>8} {'view p50':>9} {'view p95':>9} {'view max':>9} "
+          f"{'delay':>7} {'extrap':>7} {'skipped':>8}")
+    for name in args.profiles:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = measure(name, args.duration, make_transport, args.seed)
+        results.append(result)
+        print(f"{name:>10} {result['error_now'][50]:8.3f} {result['error_now'][95]:8.3f} "
+              f"{result['error_view'][50]:9.3f} {result['error_view'][95]:9.3f} {result['error_view_max']:9.3f} "
+              f"{result['view_delay'] * 1000:5.0f}ms {result['extrapolation_rate'] * 100:6.1f}% "
+              f"{result['skip_extrapolation_rate'] * 100:7.1f}%")
+    print("   now: drawn vs true position this frame; view: drawn vs true position at the moment being shown")
+    print("   extrap: frames drawn past a late sample; skipped: frames extrapolated while the sender skipped updates")
+    if server:
+        server.stop()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"✅ Wrote results to {args.json}")
@@ -1,79 +1,422 @@
+import asyncio
+import math
 import time
 import uuid
-from threading import Thread
-from supabase import create_client, Client
+from collections import deque, namedtuple
+from threading import Thread, Lock
+from types import MappingProxyType
 from config import *
-from queue import Queue, Empty
+from transport import create_transport
+from history import HistoryBuffer
+from clock import ClockSync
+from prediction import extrapolate
+from reconcile import Reconciler
+from telemetry import Telemetry, MeteredTransport, TelemetryDump
+import aoi
+
+
+# What the frame loop sees of the network. A new WorldSnapshot is published
+# (one attribute assignment) whenever something changes; nothing in it is
+# mutated afterwards, so the render side can read it without locks or copies.
+RemotePlayer = namedtuple("RemotePlayer", ["name", "history"])  # history: history.HistoryView
+WorldSnapshot = namedtuple("WorldSnapshot", ["version", "time", "players", "cannonballs", "tick"])  # tick: backend's, if it has one
+# (cannonballs are read-only rows, created_at in local time: the frame loop makes its own CannonBalls from them)
+EMPTY_WORLD = WorldSnapshot(0, 0.0, MappingProxyType({}), (), None)
+
+
+class CannonballSendPipeline:
+    """Bounded queue of outgoing shots, flushed as one bulk insert per pass.
+
+    Shots fired while the link is down wait here (oldest are dropped once the
+    queue is full) and are retried with exponential backoff. Each shot is
+    stamped with the time it was fired so a late insert still lands at the
+    right point along its path on other screens.
+    """
+
+    def __init__(self, transport, max_pending=CANNONBALL_QUEUE_SIZE, clock=None):
+        self.transport = transport
+        self.clock = clock
+        self.max_pending = max_pending
+        self._pending = deque()  # (queued_at, row)
+        self._lock = Lock()
+
+        self.failures = 0
+        self.next_attempt = 0.0
+
+        #counters
+        self.queued = 0
+        self.sent = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped_full = 0
+        self.dropped_expired = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._latency_total = 0.0
+
+    def put(self, row, now=None):
+        now = time.time() if now is None else now
+        row.setdefault("created_at", now)
+        with self._lock:
+            self._pending.append((now, row))
+            self.queued += 1
+            while len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.dropped_full += 1
+
+    def reset_backoff(self):
+        """Called after a reconnect so anything waiting goes out straight away."""
+        self.failures = 0
+        self.next_attempt = 0.0
+
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self, now=None):
+        """Send everything queued in one request. Returns how many shots went out."""
+        now = time.time() if now is None else now
+        if now < self.next_attempt:
+            return 0
+
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+
+        #no point delivering a shot that has already sunk
+        live = [(queued_at, row) for queued_at, row in batch if now - row["created_at"] < CANNONBALL_LIFETIME]
+        self.dropped_expired += len(batch) - len(live)
+        if not live:
+            return 0
+
+        rows = [row for _, row in live]
+        if self.clock:
+            #created_at is local until it goes on the wire
+            rows = [dict(row, created_at=self.clock.to_server(row["created_at"])) for row in rows]
+        try:
+            self.transport.insert_cannonballs(rows)
+        except Exception as e:
+            with self._lock:
+                #put the batch back in front of anything fired meanwhile
+                self._pending.extendleft(reversed(live))
+                while len(self._pending) > self.max_pending:
+                    self._pending.popleft()
+                    self.dropped_full += 1
+            self.failures += 1
+            self.retries += 1
+            delay = min(CANNONBALL_RETRY_MAX, CANNONBALL_RETRY_BASE * (2 ** (self.failures - 1)))
+            self.next_attempt = now + delay
+            print(f"❌ Error sending {len(live)} cannonball(s): {e}")
+            print(f"   Retrying in {delay:.2f}s")
+            return 0
+
+        done = time.time()
+        for queued_at, _ in live:
+            latency = done - queued_at
+            self._latency_total += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.last_latency = latency
+        self.failures = 0
+        self.sent += len(live)
+        self.batches += 1
+        print(f"✅ Sent {len(live)} cannonball(s) in one request")
+        return len(live)
+
+    def stats(self):
+        return {
+            "queued": self.queued,
+            "sent": self.sent,
+            "batches": self.batches,
+            "pending": self.pending(),
+            "retries": self.retries,
+            "dropped_full": self.dropped_full,
+            "dropped_expired": self.dropped_expired,
+            "avg_latency": self._latency_total / self.sent if self.sent else 0.0,
+            "last_latency": self.last_latency,
+            "max_latency": self.max_latency,
+        }
+
+
+class SyncCursor:
+    """Watermark for incremental fetches of one table.
+
+    Each fetch asks only for rows newer than the newest timestamp seen so far,
+    less SYNC_OVERLAP so rows inserted late (or stamped by a client whose clock
+    runs a little behind) are still picked up. Rows repeated inside the overlap
+    are filtered out by key, so callers only ever see each change once.
+
+    With per_key, each key is a writer stamping its rows with its own clock,
+    so the watermark is the oldest of the writers heard from lately: a writer
+    running behind the rest keeps its own rows in the fetch. Writers nobody
+    has heard from yet (they joined, or came into view) are found by a fetch
+    of the whole window every SYNC_DISCOVERY_INTERVAL.
+    """
+
+    def __init__(self, window, overlap=SYNC_OVERLAP, per_key=False):
+        self.window = window
+        self.overlap = overlap
+        self.per_key = per_key
+        self.watermark = None
+        self._seen = {}  # key -> newest timestamp handed out
+        self._heard = {}  # key -> local time it last advanced (per_key)
+        self._next_discovery = 0.0  # local time of the next whole-window fetch (per_key)
+
+    def since(self, now):
+        floor = now - self.window
+        if self.watermark is None:
+            return floor
+        if not self.per_key:
+            return max(floor, self.watermark - self.overlap)
+
+        local = time.time()
+        #a heartbeat is due from every writer still in view at least every SEND_HEARTBEAT
+        live = [self._seen[k] for k, heard in self._heard.items() if local - heard <= SEND_HEARTBEAT + self.overlap]
+        if not live or local >= self._next_discovery:
+            self._next_discovery = local + SYNC_DISCOVERY_INTERVAL
+            return floor
+        return max(floor, min(live) - self.overlap)
+
+    def accept(self, key, ts):
+        """Advance the watermark; True if (key, ts) is newer than anything seen for that key."""
+        if self.watermark is None or ts > self.watermark:
+            self.watermark = ts
+        if self._seen.get(key, float("-inf")) >= ts:
+            return False
+        self._seen[key] = ts
+        if self.per_key:
+            self._heard[key] = time.time()
+        return True
+
+    def prune(self, since):
+        #anything older than the fetch cutoff can't be returned again
+        for key in [k for k, ts in self._seen.items() if ts < since]:
+            del self._seen[key]
+            self._heard.pop(key, None)
+
+
+class AdaptiveSender:
+    """Decides when the local boat needs to be sent.
+
+    Keeps the last two samples actually sent and runs the same extrapolation
+    remote clients run on them. While that guess stays within the thresholds
+    there's nothing new to tell anyone, so the update is skipped until it
+    drifts or the heartbeat is due.
+    """
+
+    def __init__(self, position_threshold=SEND_POSITION_THRESHOLD,
+                 rotation_threshold=SEND_ROTATION_THRESHOLD, heartbeat=SEND_HEARTBEAT):
+        self.position_threshold = position_threshold
+        self.rotation_threshold = rotation_threshold
+        self.heartbeat = heartbeat
+        self.prev = None
+        self.last = None
+
+        #counters
+        self.sent = 0
+        self.skipped = 0
+        self.heartbeats = 0
+
+    def should_send(self, x, y, rot, now):
+        if self.last is None:
+            return True
+        if now - self.last["ts"] >= self.heartbeat:
+            self.heartbeats += 1
+            return True
+
+        px, py, prot, _, _, _ = extrapolate(self.prev, self.last, now)
+        rot_error = abs((rot - prot + math.pi) % (2 * math.pi) - math.pi)
+        if math.hypot(x - px, y - py) > self.position_threshold or rot_error > self.rotation_threshold:
+            return True
+
+        self.skipped += 1
+        return False
+
+    def mark_sent(self, x, y, rot, now):
+        self.prev = self.last
+        self.last = {"x": x, "y": y, "rot": rot, "ts": now}
+        self.sent += 1
+
+    def reset(self):
+        """Forget what was sent so the next check sends straight away (e.g. after a reconnect)."""
+        self.prev = None
+        self.last = None
+
+    def stats(self):
+        checked = self.sent + self.skipped
+        return {
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "heartbeats": self.heartbeats,
+            "send_ratio": self.sent / checked if checked else 0.0,
+        }
 
 
 class NetworkManager:
-    def __init__(self, player):
+    """Keeps the local boat and shots in sync with the backend.
+
+    With the "threads" engine the work runs on two daemon threads. With
+    "asyncio" it runs as tasks on the event loop main() is already running
+    under: one sending updates, one fetching players and one fetching
+    cannonballs, each sleeping until its next deadline or until there's
+    something to do, instead of polling.
+    """
+
+    def __init__(self, player, transport=None, engine=None, room=ROOM, session=None):
         self.player = player
         self.PLAYER_ID = str(uuid.uuid4())
         self.PLAYER_NAME = f"Player_{self.PLAYER_ID[:8]}"
-        self.other_players = {}
-        self.remote_cannonballs = {}  # Track remote cannonballs by ID
+        self._player_history = {}  # pid -> {"name", "history": HistoryBuffer}, network side only
+        self.remote_cannonballs = {}  # id -> read-only row (created_at in local time), network side only
+        self.snapshot = EMPTY_WORLD  # latest published view for the frame loop
+        self._publish_lock = Lock()  # serializes writers; readers never take it
         self.running = True
+        self._online = None  # asyncio engine: set while connected
+        self._outgoing = None  # asyncio engine: set when there's something to send
+        self._tasks = []
         self.connected = False
         self.last_connection_attempt = 0
         self.connection_retry_interval = 2.0
         self.max_retry_interval = 30.0
         self.consecutive_failures = 0
 
-        self.supabase = None
-        # Queue for non-blocking cannonball sends
-        self._cannonball_send_queue: Queue = Queue()
-        self._attempt_connection()
-        Thread(target=self._network_loop, daemon=True).start()
-        Thread(target=self._cannonball_loop, daemon=True).start()
-        print(f"🎮 NetworkManager initialized")
+        # Counters and histograms for everything the transport does (stats())
+        self.metrics = Telemetry()
+        self._ever_connected = False
+        if session is not None:
+            # Already connected in the background (connection.ConnectionManager), clock included
+            transport = session.transport
+        self.transport = MeteredTransport(transport or create_transport(room=room), self.metrics)
+        # Backend clock estimate: timestamps go out in backend time and come back to local time
+        self.clock = session.clock if session is not None else ClockSync()
+        self.transport.clock = self.clock
+        self.clock_probes = 0
+        self.next_clock_probe = 0.0
+        # Bounded, batched queue for non-blocking cannonball sends
+        self.cannonball_sender = CannonballSendPipeline(self.transport, clock=self.clock)
+        # Periodic JSON-lines dump of stats(), for lining up hitches with the network afterwards
+        self.telemetry_dump = TelemetryDump(self.stats) if TELEMETRY_FILE else None
+        # Only upsert the local boat when other clients' extrapolation would be off
+        self.player_sender = AdaptiveSender()
+        # Backends that run movement get our inputs instead, and we reconcile against their state
+        self.reconciler = Reconciler() if CLIENT_RECONCILIATION and self.transport.authoritative else None
+        # Hits a dedicated server decided, for the frame loop (and which balls they removed)
+        self.hits = deque()
+        self._seen_hits = deque(maxlen=64)
+        # How far in the past the frame loop draws other boats (kept up to date by main), sent with shots for lag compensation
+        self.view_delay = INTERP_DELAY
+        # Incremental sync: only rows changed since the last fetch come back
+        self.player_cursor = SyncCursor(PLAYER_SYNC_WINDOW, per_key=True)  # every boat stamps its own rows
+        self.cannonball_cursor = SyncCursor(CANNONBALL_SYNC_WINDOW)
+        self.engine = engine or NETWORK_ENGINE
+        if self.engine == "asyncio":
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                print("⚠️  No running event loop, using network threads")
+                self.engine = "threads"
+        if self.engine == "asyncio":
+            self._online = asyncio.Event()
+            self._outgoing = asyncio.Event()
+        # No connecting here on the caller's (frame) thread: a prewarmed session already is,
+        # anything else is connected by the network thread or tasks as they start
+        if session is not None:
+            self._connection_succeeded()
+            self.clock_probes = len(self.clock.samples)  # the burst is (partly) done already
+        if self.engine == "asyncio":
+            self._tasks = [
+                loop.create_task(self._clock_task()),
+                loop.create_task(self._send_task()),
+                loop.create_task(self._player_fetch_task()),
+            ]
+            if not WORLD_FETCH:
+                self._tasks.append(loop.create_task(self._cannonball_fetch_task()))
+        else:
+            Thread(target=self._network_loop, daemon=True).start()
+            Thread(target=self._cannonball_loop, daemon=True).start()
+        print(f"🎮 NetworkManager initialized ({self.engine})")
         print(f"   Player ID: {self.PLAYER_ID}")
         print(f"   Player Name: {self.PLAYER_NAME}")
+        print(f"   Room: {self.transport.room}")
         self.seen_uuids = []
 
+    @property
+    def connected(self):
+        return self._connected
+
+    @connected.setter
+    def connected(self, value):
+        self._connected = value
+        if self._online is not None:
+            if value:
+                self._online.set()
+            else:
+                self._online.clear()
+
     def _attempt_connection(self):
-        """Attempt to establish connection to Supabase"""
+        """Attempt to establish connection to the backend"""
         try:
             current_time = time.time()
             if current_time - self.last_connection_attempt >= self.connection_retry_interval:
                 self.last_connection_attempt = current_time
 
-                if not self.supabase:
-                    print(f"🔗 Connecting to Supabase...")
-                    self.supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-                # Test connection
-                test = self.supabase.table("players").select("count", count="exact").limit(1).execute()
+                self.transport.connect()
 
-                self.connected = True
-                self.consecutive_failures = 0
-                self.connection_retry_interval = 2.0
-                print("✅ Connected to Supabase")
+                self._connection_succeeded()
                 return True
 
         except Exception as e:
-            self.connected = False
-            self.consecutive_failures += 1
-            self.connection_retry_interval = min(
-                self.max_retry_interval,
-                2.0 * (1.5 ** min(self.consecutive_failures, 8))
-            )
-            print(f"❌ Connection failed: {e}")
-            print(f"   Will retry in {self.connection_retry_interval:.1f}s")
+            self._connection_failed(e)
 
         return False
 
+    async def _attempt_connection_async(self):
+        """Same as _attempt_connection, but waits out the retry interval and connects off the event loop"""
+        wait = self.connection_retry_interval - (time.time() - self.last_connection_attempt)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self.last_connection_attempt = time.time()
+        try:
+            await asyncio.to_thread(self.transport.connect)
+        except Exception as e:
+            self._connection_failed(e)
+            return False
+        self._connection_succeeded()
+        return True
+
+    def _connection_succeeded(self):
+        if self._ever_connected:
+            self.metrics.count("reconnects")
+        self._ever_connected = True
+        self.connected = True
+        self.consecutive_failures = 0
+        self.connection_retry_interval = 2.0
+        self.cannonball_sender.reset_backoff()
+        self.player_sender.reset()
+        self.clock_probes = 0
+        self.next_clock_probe = 0.0
+        print(f"✅ Connected ({self.transport.name})")
+
+    def _connection_failed(self, e):
+        self.metrics.count("connection_failures")
+        self.connected = False
+        self.consecutive_failures += 1
+        self.connection_retry_interval = min(
+            self.max_retry_interval,
+            2.0 * (1.5 ** min(self.consecutive_failures, 8))
+        )
+        print(f"❌ Connection failed: {e}")
+        print(f"   Will retry in {self.connection_retry_interval:.1f}s")
+
     # Chat methods (unchanged)
     def new_chat(self, item_data: dict):
         try:
             new_uuid = str(uuid.uuid4())
             item_data["id"] = new_uuid
-            response = self.supabase.from_("chat").insert(item_data).execute()
-            if response.data:
+            data = self.transport.insert_chat(item_data)
+            if data:
                 print(f"✅ Chat added: {new_uuid}")
-                return response.data
+                return data
             else:
-                print(f"Chat error: {response.error}")
+                print(f"Chat error: no data returned")
                 return None
         except Exception as e:
             print(f"Chat exception: {e}")
@@ -81,10 +424,10 @@ class NetworkManager:
 
     def get_chats(self):
         try:
-            response = self.supabase.table("chat").select("*").execute()
+            rows = self.transport.fetch_chats()
             indx = 0
-            if response.data:
-                for row in response.data:
+            if rows:
+                for row in rows:
                     uuid = row["id"]
                     msg = row["msg"]
                     if uuid not in self.seen_uuids:
@@ -92,39 +435,37 @@ class NetworkManager:
                         indx += 1
                         print(f"{msg}")
                 print(f"✅ Retrieved {indx} chats")
-            elif response.error:
-                print(f"❌ Chat error: {response.error}")
         except Exception as e:
             print(f"❌ Chat exception: {e}")
 
     def delete_chat_history(self):
         try:
-            response = self.supabase.table("chat").delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
-            if response.data:
-                print(f"✅ Deleted all chats")
-            elif response.error:
-                print(f"❌ Delete error: {response.error}")
+            self.transport.delete_chats()
+            print(f"✅ Deleted all chats")
         except Exception as e:
             print(f"❌ Delete exception: {e}")
 
     def create_cannonball(self, cannonball_data):
         #Queue a cannonball to send in the background to avoid UI stutter.
         try:
-            if not self.connected or not self.supabase:
-                print("❌ Cannot queue cannonball: Not connected")
-                return None
-
             #add player_id to cannonball data
             cannonball_data["player_id"] = self.PLAYER_ID
-
-            #enqueue for background send
-            self._cannonball_send_queue.put_nowait(cannonball_data)
+            if self.transport.owns_hits:
+                #name it ourselves so we can drop our copy when the server says it hit,
+                #and say where we saw everyone so the server can judge it from there
+                cannonball_data.setdefault("id", str(uuid.uuid4()))
+                cannonball_data["lag"] = self.view_delay
+
+            #enqueue for background send (held and retried if we're offline)
+            self.cannonball_sender.put(cannonball_data)
+            if self._outgoing is not None:
+                self._outgoing.set()
             print(
                 f"📤 Queued cannonball from {self.PLAYER_ID[:8]} at "
                 f"({cannonball_data['x']:.2f}, {cannonball_data['y']:.2f}) side={cannonball_data['side']}"
             )
             #return immediately; server_id (if needed) can be resolved later when fetched back
-            return None
+            return cannonball_data.get("id")
 
         except Exception as e:
             print(f"💥 Cannonball queueing error: {e}")
@@ -136,128 +477,191 @@ class NetworkManager:
 
         while self.running:
             try:
-                if not self.connected or not self.supabase:
+                if not self.connected:
                     time.sleep(0.1)
                     continue
 
                 now = time.time()
 
-                #first, flush any queued local cannonballs (non-blocking)
-                flushed = 0
-                while True:
-                    try:
-                        data = self._cannonball_send_queue.get_nowait()
-                    except Empty:
-                        break
-                    try:
-                        resp = self.supabase.table("cannonballs").insert(data).execute()
-                        if hasattr(resp, 'data') and resp.data:
-                            sid = resp.data[0].get('id', '')
-                            print(f"✅ Sent cannonball (ID: {sid[:8]}) to server")
-                        else:
-                            print("❌ Failed to send cannonball (no response data)")
-                    except Exception as e:
-                        print(f"❌ Error sending cannonball: {e}")
-                    finally:
-                        flushed += 1
+                #first, send every queued local cannonball in one request
+                flushed = self.cannonball_sender.flush(now)
                 if flushed:
                     #small yield to avoid hogging in bursty scenarios
                     time.sleep(0.001)
 
-                #fetch new cannonballs every 250ms
-                if now - last_fetch >= 0.25:
-                    try:
-                        # Get cannonballs created in the last 5.5 seconds
-                        cutoff = now - 5.5
-
-                        # Convert to ISO format
-                        from datetime import datetime, timezone
-                        cutoff_iso = datetime.fromtimestamp(cutoff, tz=timezone.utc).isoformat()
-
-                        # Fetch cannonballs from other players
-                        resp = self.supabase.table("cannonballs") \
-                            .select("*") \
-                            .gte("created_at", cutoff_iso) \
-                            .neq("player_id", self.PLAYER_ID) \
-                            .execute()
-
-                        if hasattr(resp, 'data') and resp.data:
-                            new_count = 0
-                            current_ids = set(self.remote_cannonballs.keys())
-                            fetched_ids = set()
-
-                            for cb_data in resp.data:
-                                cb_id = cb_data.get("id")
-                                if not cb_id:
-                                    continue
-
-                                fetched_ids.add(cb_id)
-
-                                if cb_id not in self.remote_cannonballs:
-                                    # Create new remote cannonball
-                                    from cannonball import CannonBall
-                                    try:
-                                        cannonball = CannonBall.from_dict(cb_data)
-                                        self.remote_cannonballs[cb_id] = {
-                                            "cannonball": cannonball,
-                                            "player_id": cb_data.get("player_id"),
-                                            "fetched_at": now
-                                        }
-                                        new_count += 1
-
-                                        if new_count <= 3:  # Limit debug output
-                                            player_id = cb_data.get("player_id", "unknown")[:8]
-                                            print(f"🎯 New remote cannonball from {player_id}")
-                                            print(f"   Position: ({cannonball.x:.2f}, {cannonball.y:.2f})")
-
-                                    except Exception as e:
-                                        print(f"❌ Error creating remote cannonball: {e}")
-                                        continue
-
-                            if new_count > 0:
-                                print(f"✅ Added {new_count} new remote cannonballs")
-
-                            # Remove cannonballs that are no longer in the database
-                            expired_ids = current_ids - fetched_ids
-                            for cb_id in expired_ids:
-                                if cb_id in self.remote_cannonballs:
-                                    del self.remote_cannonballs[cb_id]
-
-                        else:
-                            # No new cannonballs
-                            pass
+                #with world fetches the network loop brings cannonballs in along with players
+                if WORLD_FETCH:
+                    time.sleep(0.01)
+                    continue
 
+                #fetch cannonballs fired since the last fetch every 250ms
+                if now - last_fetch >= (0.0 if self.transport.push else CANNONBALL_FETCH_INTERVAL):
+                    try:
+                        since = self.cannonball_cursor.since(self.clock.to_server(now))
+                        rows = self.transport.fetch_cannonballs(since, exclude_player_id=self.PLAYER_ID)
+                        if self._apply_cannonball_rows(rows, now):
+                            self._publish_cannonballs()
+                        self.cannonball_cursor.prune(since)
                     except Exception as e:
                         print(f"❌ Fetch error: {e}")
 
                     last_fetch = now
 
-                # Cleanup very old cannonballs (7+ seconds)
-                cleanup_time = now - 7.0
-                to_remove = []
-                for cb_id, cb_info in self.remote_cannonballs.items():
-                    if cb_info["fetched_at"] < cleanup_time:
-                        to_remove.append(cb_id)
-
-                if to_remove:
-                    for cb_id in to_remove:
-                        del self.remote_cannonballs[cb_id]
-                    if len(to_remove) > 0:
-                        print(f"🗑️  Cleaned up {len(to_remove)} expired cannonballs")
-
+                self._poll_hits()
+                if self._expire_cannonballs(now):
+                    self._publish_cannonballs()
                 time.sleep(0.01)
 
             except Exception as e:
                 print(f"💥 Cannonball loop error: {e}")
                 time.sleep(1.0)
 
+    def _expire_cannonballs(self, now):
+        """Expire shots locally once they've run their course. Returns how many went (not published yet)."""
+        to_remove = [cb_id for cb_id, row in self.remote_cannonballs.items()
+                     if now - row["created_at"] >= CANNONBALL_LIFETIME]
+        if to_remove:
+            for cb_id in to_remove:
+                del self.remote_cannonballs[cb_id]
+            print(f"🗑️  Cleaned up {len(to_remove)} expired cannonballs")
+        return len(to_remove)
+
+    def _apply_cannonball_rows(self, rows, now):
+        """Add remote cannonballs from an incremental fetch (rows already seen are skipped).
+        Returns how many were new (not published yet)."""
+        if not rows:
+            return 0
+
+        new_count = 0
+        for cb_data in rows:
+            cb_id = cb_data.get("id")
+            if not cb_id or cb_id in self._seen_hits:
+                continue
+            server_created_at = float(cb_data.get("created_at") or self.clock.to_server(now))
+            if not self.cannonball_cursor.accept(cb_id, server_created_at):
+                continue
+            created_at = self.clock.to_local(server_created_at)
+            if now - created_at >= CANNONBALL_LIFETIME:
+                continue
+
+            #by our clock, so the frame loop's CannonBall starts at the right point along its path
+            self.remote_cannonballs[cb_id] = MappingProxyType(dict(cb_data, created_at=created_at))
+            new_count += 1
+
+            if new_count <= 3:  # Limit debug output
+                player_id = (cb_data.get("player_id") or "unknown")[:8]
+                print(f"🎯 New remote cannonball from {player_id}")
+                print(f"   Position: ({float(cb_data['x']):.2f}, {float(cb_data['y']):.2f})")
+
+        if new_count > 0:
+            print(f"✅ Added {new_count} new remote cannonballs")
+        return new_count
+
+    def _poll_hits(self):
+        """Queue the server's hit reports for the frame loop and drop the balls that landed"""
+        if not self.transport.owns_hits:
+            return
+        removed = False
+        for hit in self.transport.fetch_hits():
+            if hit["ball"] in self._seen_hits:
+                continue  # resent
+            self._seen_hits.append(hit["ball"])
+            self.hits.append(hit)
+            if self.remote_cannonballs.pop(hit["ball"], None):
+                removed = True
+        if removed:
+            self._publish_cannonballs()
+
+    @property
+    def owns_hits(self):
+        """True when the backend decides hits (use take_hits instead of checking locally)"""
+        return self.transport.owns_hits
+
+    def take_hits(self):
+        """Hit reports received since the last call (frame loop)"""
+        hits = []
+        while self.hits:
+            hits.append(self.hits.popleft())
+        return hits
+
     def get_remote_cannonballs(self):
-        """Get list of remote cannonball objects"""
-        return [info["cannonball"] for info in self.remote_cannonballs.values()]
+        """Remote cannonball rows from the latest snapshot (read-only; the frame loop makes its own CannonBalls)"""
+        return self.snapshot.cannonballs
+
+    @property
+    def other_players(self):
+        """pid -> RemotePlayer from the latest snapshot"""
+        return self.snapshot.players
+
+    def _publish(self, players=None, cannonballs=None, tick=None):
+        with self._publish_lock:
+            old = self.snapshot
+            self.snapshot = WorldSnapshot(
+                old.version + 1,
+                time.time(),
+                old.players if players is None else MappingProxyType(players),
+                old.cannonballs if cannonballs is None else cannonballs,
+                old.tick if tick is None else tick,
+            )
+
+    def _cannonball_view(self):
+        return tuple(self.remote_cannonballs.values())
+
+    def _publish_cannonballs(self):
+        self._publish(cannonballs=self._cannonball_view())
+
+    def _player_view(self, changed=(), removed=()):
+        """The published players with new history for the ones in changed and without the ones in removed"""
+        players = dict(self.snapshot.players)
+        for pid in changed:
+            entry = self._player_history[pid]
+            players[pid] = RemotePlayer(entry["name"], entry["history"].view())
+        for pid in removed:
+            players.pop(pid, None)
+        return players
+
+    def _publish_players(self, changed=(), removed=()):
+        """Publish new history for the players in changed and drop the ones in removed"""
+        if not changed and not removed:
+            return
+        self._publish(players=self._player_view(changed, removed))
+
+    def _expire_players(self, now):
+        """Forget boats we haven't heard from in a while (they left, or crashed). Returns their ids (not published yet)."""
+        cutoff = now - PLAYER_STALE_TIMEOUT
+        stale = [pid for pid, entry in self._player_history.items() if entry["history"].newest_ts < cutoff]
+        for pid in stale:
+            del self._player_history[pid]
+        return stale
+
+    # Combined world fetch (WORLD_FETCH)
+    def _world_query(self, now):
+        """Arguments for the next transport.fetch_world (cursors are in backend time)"""
+        since, bounds = self._player_query(now)
+        return since, self.cannonball_cursor.since(self.clock.to_server(now)), bounds, self.PLAYER_ID
+
+    def _apply_world(self, world, query, now):
+        """Apply a fetch_world result and publish its players and cannonballs as one snapshot"""
+        player_since, cannonball_since = query[0], query[1]
+        changed = self._apply_player_rows(world.players)
+        self.player_cursor.prune(player_since)
+        stale = self._expire_players(now)
+
+        shots = self._apply_cannonball_rows(world.cannonballs, now)
+        self.cannonball_cursor.prune(cannonball_since)
+        #shots the backend dropped (they hit something, or their owner left)
+        gone = [cb_id for cb_id in world.removed if self.remote_cannonballs.pop(cb_id, None)]
+        expired = self._expire_cannonballs(now)
+
+        players = self._player_view(changed, stale) if changed or stale else None
+        cannonballs = self._cannonball_view() if shots or gone or expired else None
+        if players is not None or cannonballs is not None:
+            self._publish(players, cannonballs, world.tick)
 
     def _network_loop(self):
         last_send = 0.0
         last_fetch = 0.0
+        last_input_send = 0.0
 
         while self.running:
             now = time.time()
@@ -269,58 +673,34 @@ class NetworkManager:
                 continue
 
             try:
-                # Send player update
-                if now - last_send >= SEND_INTERVAL:
-                    data = {
-                        "player_id": self.PLAYER_ID,
-                        "player_name": self.PLAYER_NAME,
-                        "x": float(self.player.x),
-                        "y": float(self.player.y),
-                        "rotation": float(self.player.rotation),
-                        "updated_at": now
-                    }
-                    if self.supabase:
-                        self.supabase.table("players").upsert(data, on_conflict="player_id").execute()
-                        last_send = now
-
-                # Fetch other players
-                if now - last_fetch >= FETCH_INTERVAL:
-                    cutoff = now - 10.0
-                    resp = self.supabase.table("players").select("*").gt("updated_at", cutoff).execute()
-                    rows = getattr(resp, "data", None) or resp
-
-                    for player_data in rows:
-                        try:
-                            pid = player_data.get("player_id")
-                            if not pid or pid == self.PLAYER_ID:
-                                continue
-
-                            px = float(player_data.get("x", 0.0))
-                            py = float(player_data.get("y", 0.0))
-                            prot = float(player_data.get("rotation", 0.0))
-                            ts = float(player_data.get("updated_at", time.time()))
-                            pname = player_data.get("player_name", "Unknown")
-
-                            dx = px - self.player.x
-                            dy = py - self.player.y
-                            dist = (dx * dx + dy * dy) ** 0.5
-
-                            if dist <= VISIBLE_RADIUS:
-                                if pid not in self.other_players:
-                                    self.other_players[pid] = {
-                                        "name": pname,
-                                        "state": {"x": px, "y": py, "rot": prot, "vx": 0.0, "vy": 0.0, "vrot": 0.0},
-                                        "target": {"x": px, "y": py, "rot": prot, "vx": 0.0, "vy": 0.0, "vrot": 0.0},
-                                        "history": []
-                                    }
-
-                                hist = self.other_players[pid]["history"]
-                                hist.append({"x": px, "y": py, "rot": prot, "ts": ts})
-                                hist.sort(key=lambda s: s["ts"])
-                                if len(hist) > MAX_HISTORY:
-                                    hist[:] = hist[-MAX_HISTORY:]
-                        except Exception:
-                            continue
+                if now >= self.next_clock_probe:
+                    self._clock_probed(self.transport.probe_clock(), now)
+
+                # Send player update if the others' extrapolation has drifted (or a heartbeat is due)
+                if self.reconciler:
+                    if now - last_input_send >= INPUT_SEND_INTERVAL:
+                        self._send_inputs(now)
+                        last_input_send = now
+                elif now - last_send >= SEND_INTERVAL:
+                    data = self._player_update(now)
+                    if data:
+                        self.transport.upsert_player(data)
+                        self._player_update_sent(data, now)
+                    last_send = now
+
+                # Fetch players that moved since the last fetch (and cannonballs with them, with WORLD_FETCH).
+                # Push backends already hold them locally, so those are read every pass
+                if now - last_fetch >= (0.0 if self.transport.push else FETCH_INTERVAL):
+                    if WORLD_FETCH:
+                        query = self._world_query(now)
+                        self._apply_world(self.transport.fetch_world(*query), query, now)
+                        self._poll_hits()
+                    else:
+                        since, bounds = self._player_query(now)
+                        changed = self._apply_player_rows(self.transport.fetch_players(since, bounds))
+                        self.player_cursor.prune(since)
+                        self._publish_players(changed, self._expire_players(now))
+                    self._poll_authority()
                     last_fetch = now
 
                 self.connected = True
@@ -331,14 +711,241 @@ class NetworkManager:
                 self.connected = False
                 time.sleep(0.5)
 
+    def _clock_probed(self, sample, now):
+        """Feed a clock probe result in and schedule the next probe"""
+        if sample and self.clock.add_sample(*sample) and self.clock_probes == 0:
+            print(f"🕒 Clock offset {self.clock.offset * 1000:+.1f}ms (rtt {self.clock.rtt * 1000:.1f}ms)")
+        self.clock_probes += 1
+        burst = self.clock_probes < CLOCK_SYNC_BURST
+        self.next_clock_probe = now + (CLOCK_SYNC_BURST_INTERVAL if burst else CLOCK_SYNC_INTERVAL)
+
+    def _player_update(self, now):
+        """The row to upsert for the local boat, or None if nobody needs it yet"""
+        if not self.player_sender.should_send(float(self.player.x), float(self.player.y),
+                                              float(self.player.rotation), now):
+            return None
+        return self._player_row(now)
+
+    def _player_row(self, now):
+        return {
+            "player_id": self.PLAYER_ID,
+            "player_name": self.PLAYER_NAME,
+            "x": float(self.player.x),
+            "y": float(self.player.y),
+            "rotation": float(self.player.rotation),
+            "updated_at": self.clock.to_server(now)
+        }
+
+    # Client-side prediction (backends that own movement)
+    def record_input(self, dt, move, turn, sprint):
+        """Log the input the local boat just moved by (frame loop)"""
+        if self.reconciler:
+            self.reconciler.record(dt, move, turn, sprint)
+
+    def reconcile_player(self, items=None):
+        """Snap the local boat to the backend's latest state and replay newer inputs (frame loop).
+        Returns how far that moved it."""
+        if self.reconciler:
+            return self.reconciler.apply(self.player, items)
+        return 0.0
+
+    def _send_inputs(self, now):
+        inputs = self.reconciler.unacked()
+        if not inputs:
+            return
+        if now - self.reconciler.last_received > SEND_HEARTBEAT:
+            #the backend hasn't answered lately (we just joined, or it restarted): tell it where we are first
+            self.transport.upsert_player(self._player_row(now))
+        self.transport.send_inputs(self.PLAYER_ID, inputs)
+
+    def _poll_authority(self):
+        if self.reconciler:
+            state = self.transport.fetch_authoritative_state()
+            if state:
+                self.reconciler.receive(*state)
+
+    def _player_update_sent(self, data, now):
+        self.player_sender.mark_sent(data["x"], data["y"], data["rotation"], now)
+
+    def _player_query(self, now):
+        """(since, bounds) for the next incremental player fetch (since is in backend time)"""
+        since = self.player_cursor.since(self.clock.to_server(now))
+        return since, aoi.bounds_around(float(self.player.x), float(self.player.y))
+
+    def _apply_player_rows(self, rows):
+        """Append new samples from an incremental fetch to each visible player's history.
+        Returns the ids of the players that changed (not published yet)."""
+        changed = set()
+        for player_data in rows:
+            try:
+                pid = player_data.get("player_id")
+                if not pid or pid == self.PLAYER_ID:
+                    continue
+
+                px = float(player_data.get("x", 0.0))
+                py = float(player_data.get("y", 0.0))
+                prot = float(player_data.get("rotation", 0.0))
+                server_ts = float(player_data.get("updated_at", self.clock.server_time()))
+                pname = player_data.get("player_name", "Unknown")
+
+                # Same sample as last fetch (sender hasn't upserted since)
+                if not self.player_cursor.accept(pid, server_ts):
+                    continue
+                ts = self.clock.to_local(server_ts)
+
+                dx = px - self.player.x
+                dy = py - self.player.y
+                dist = (dx * dx + dy * dy) ** 0.5
+
+                if dist <= VISIBLE_RADIUS:
+                    if pid not in self._player_history:
+                        self._player_history[pid] = {"name": pname, "history": HistoryBuffer()}
+
+                    if self._player_history[pid]["history"].append(px, py, prot, ts):
+                        changed.add(pid)
+            except Exception:
+                continue
+        return changed
+
+    #asyncio engine
+    async def _send_task(self):
+        """Sends the local boat every SEND_INTERVAL (if it needs it), or its inputs every INPUT_SEND_INTERVAL, and shots as soon as they're queued"""
+        next_send = 0.0
+        while self.running:
+            if not self.connected:
+                await self._attempt_connection_async()
+                continue
+
+            now = time.time()
+            try:
+                if self.cannonball_sender.pending():
+                    await self.transport.call(self.cannonball_sender.flush, now)
+
+                if now >= next_send:
+                    if self.reconciler:
+                        await self.transport.call(self._send_inputs, now)
+                        next_send = now + INPUT_SEND_INTERVAL
+                    else:
+                        data = self._player_update(now)
+                        if data:
+                            await self.transport.call(self.transport.upsert_player, data)
+                            self._player_update_sent(data, now)
+                        next_send = now + SEND_INTERVAL
+            except Exception as e:
+                print(f"❌ Network error: {e}")
+                self.connected = False
+                continue
+
+            #sleep until the next update is due, or a shot (or its retry) needs sending
+            wake = next_send
+            if self.cannonball_sender.pending():
+                wake = min(wake, self.cannonball_sender.next_attempt)
+            self._outgoing.clear()
+            try:
+                await asyncio.wait_for(self._outgoing.wait(), max(0.0, wake - time.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _clock_task(self):
+        while self.running:
+            await self._online.wait()
+            now = time.time()
+            if now < self.next_clock_probe:
+                await asyncio.sleep(self.next_clock_probe - now)
+                continue
+            try:
+                #probes wait on the answer, so always keep them off the event loop
+                sample = await asyncio.to_thread(self.transport.probe_clock)
+            except Exception as e:
+                print(f"❌ Clock probe error: {e}")
+                sample = None
+            self._clock_probed(sample, now)
+
+    async def _player_fetch_task(self):
+        while self.running:
+            await self._online.wait()
+            now = time.time()
+            try:
+                if WORLD_FETCH:
+                    query = self._world_query(now)
+                    world = await self.transport.call(self.transport.fetch_world, *query)
+                    self._apply_world(world, query, now)
+                    if self.transport.owns_hits:
+                        await self.transport.call(self._poll_hits)
+                else:
+                    since, bounds = self._player_query(now)
+                    rows = await self.transport.call(self.transport.fetch_players, since, bounds)
+                    changed = self._apply_player_rows(rows)
+                    self.player_cursor.prune(since)
+                    self._publish_players(changed, self._expire_players(now))
+                if self.reconciler:
+                    await self.transport.call(self._poll_authority)
+            except Exception as e:
+                print(f"❌ Network error: {e}")
+                self.connected = False
+                continue
+            #push transports wake this as soon as an update lands
+            await self.transport.wait_for_data(max(0.0, now + FETCH_INTERVAL - time.time()))
+
+    async def _cannonball_fetch_task(self):
+        while self.running:
+            await self._online.wait()
+            now = time.time()
+            try:
+                since = self.cannonball_cursor.since(self.clock.to_server(now))
+                rows = await self.transport.call(self.transport.fetch_cannonballs, since, self.PLAYER_ID)
+                if self._apply_cannonball_rows(rows, now):
+                    self._publish_cannonballs()
+                self.cannonball_cursor.prune(since)
+                if self.transport.owns_hits:
+                    await self.transport.call(self._poll_hits)
+            except Exception as e:
+                print(f"❌ Fetch error: {e}")
+            if self._expire_cannonballs(now):
+                self._publish_cannonballs()
+            await self.transport.wait_for_data(max(0.0, now + CANNONBALL_FETCH_INTERVAL - time.time()))
+
+    # Telemetry
+    def record_frame(self, dt):
+        """Note how long a frame took (frame loop), so stalls can be matched against the network"""
+        self.metrics.observe("frame_time", dt)
+
+    def stats(self, window=False):
+        """Network health: per-endpoint round trips, rows and bytes in, send queues, reconnects,
+        how old each visible boat's newest sample is, and the component counters.
+        window=True covers just the time since the last window=True call (and starts a new one)."""
+        now = time.time()  # histories hold local time (to_local on arrival)
+        data = self.metrics.roll(now) if window else self.metrics.snapshot(now)
+        data.update({
+            "time": now,
+            "transport": self.transport.name,
+            "room": self.transport.room,
+            "connected": self.connected,
+            "bytes_received": self.transport.bytes_in,
+            "send_queue": {
+                "cannonballs": self.cannonball_sender.pending(),
+                "inputs": self.reconciler.next_seq - 1 - self.reconciler.acked_seq if self.reconciler else 0,
+            },
+            "sample_age": {pid: now - remote.history.newest_ts for pid, remote in self.snapshot.players.items()
+                           if len(remote.history)},
+            "clock": self.clock.stats(),
+            "cannonball_sends": self.cannonball_sender.stats(),
+            "player_sends": self.player_sender.stats(),
+        })
+        return data
+
     def stop(self):
         self.running = False
-        if self.supabase:
+        if self.telemetry_dump:
+            self.telemetry_dump.stop()
+        for task in self._tasks:
+            task.cancel()
+        if self.connected:
             try:
-                self.supabase.table("players").delete().eq("player_id", self.PLAYER_ID).execute()
-                self.supabase.table("cannonballs").delete().eq("player_id", self.PLAYER_ID).execute()
+                self.transport.delete_player(self.PLAYER_ID)
                 print("✅ Cleaned up player data")
             except Exception as e:
                 print(f"❌ Cleanup error: {e}")
+        self.transport.close()
 
 
@@ -1,7 +1,8 @@
 import math
 import pygame
-from utils import lerp_angle, smoothstep
-from config import SPRINT, WORLD_WIDTH, WORLD_HEIGHT
+from utils import smoothstep
+from config import SPRINT, PLAYER_MAX_HEALTH
+import movement
 import os
 import sys
 
@@ -20,15 +21,8 @@ class Player:
         self.rotation = -math.pi / 2
         self.target_rotation = -math.pi / 2
 
-        self.speed = 1.0
-        self.backward_speed = 0.25
-        self.rotation_speed = 3.8
-        self.rotation_smoothing = 0.15
-
+        #speeds and turning live in movement.py
         self.current_velocity = 0.0
-        self.target_velocity = 0.0
-        self.acceleration = 4.0
-        self.deceleration = 5.0
         self.velocity_x = 0.0
         self.velocity_y = 0.0
         self.wake_fade = 0.0
@@ -59,14 +53,14 @@ class Player:
         self.engine_fade_ms = 120
 
         #gameplay: health
-        self.max_health = 4
+        self.max_health = PLAYER_MAX_HEALTH
         self.health = self.max_health
         self.dead = False
 
     def update(self, dt, keys, controller=None):
         if self.dead:
             #when dead, no updates to movement
-            return
+            return None
         #input collection vars
         move_input = 0.0
         turn_input = 0.0
@@ -109,36 +103,18 @@ class Player:
                 r3 = controller.get_button(pygame.CONTROLLER_BUTTON_RIGHTSTICK)
                 if l3 or r3:
                     sprint_this_frame = True
-        #apply the sprint
-        if sprint_this_frame and move_input > 0 and self.sprint > 0:
-            self.sprinting = True
-            self.sprint = max(0, self.sprint - dt * 35)
-            move_input = 2.0
-        else:
-            self.sprinting = False
-            if self.sprint < SPRINT:
-                self.sprint += dt * 12  # regen
-        
+
+        #movement is shared with input replay and the server
+        last_x, last_y = self.x, self.y
+        movement.step(self, move_input, turn_input, sprint_this_frame, dt)
+
         # Smoothly animate display_sprint towards actual sprint value
         sprint_smoothing = 0.15
         self.display_sprint += (self.sprint - self.display_sprint) * sprint_smoothing
 
-        # rotation
-        self.target_rotation += turn_input * self.rotation_speed * dt
-        self.rotation = lerp_angle(self.rotation, self.target_rotation, self.rotation_smoothing)
-        self.rotation %= (2 * math.pi)
-        self.target_rotation %= (2 * math.pi)
-
-        #movement smoothing
-        self.target_velocity = move_input
-        if self.target_velocity > self.current_velocity:
-            self.current_velocity = min(self.current_velocity + self.acceleration * dt, self.target_velocity)
-        else:
-            self.current_velocity = max(self.current_velocity - self.deceleration * dt, self.target_velocity)
-
         #engine sounds fade in/out
         moving = abs(self.current_velocity) > 0.01
-        was_moving = abs((self.x - self.previous_x) / dt) > 0.01 if dt > 0 else False
+        was_moving = abs((last_x - self.previous_x) / dt) > 0.01 if dt > 0 else False
         if moving and not was_moving:
             if not self.engine_channel:
                 self.engine_channel = self.engine_sound.play(loops=-1, fade_ms=self.engine_fade_ms)
@@ -146,15 +122,7 @@ class Player:
             self.engine_channel.fadeout(self.engine_fade_ms)
             self.engine_channel = None
 
-        self.previous_x, self.previous_y = self.x, self.y
-
-        speed_multiplier = self.speed if self.current_velocity >= 0 else self.backward_speed
-        self.x += math.cos(self.rotation) * speed_multiplier * self.current_velocity * dt
-        self.y += math.sin(self.rotation) * speed_multiplier * self.current_velocity * dt
-
-        #clamp to world
-        self.x = max(0.5, min(WORLD_WIDTH - 0.5, self.x))
-        self.y = max(0.5, min(WORLD_HEIGHT - 0.5, self.y))
+        self.previous_x, self.previous_y = last_x, last_y
 
         #cam follow
         self.camera_x += (self.x - self.camera_x) * self.camera_smoothing
@@ -163,6 +131,9 @@ class Player:
         target_wake = smoothstep(0.0, 0.25, abs(self.current_velocity))
         self.wake_fade += (target_wake - self.wake_fade) * 6.0 * dt
 
+        #what this frame's input was, for the network input log
+        return move_input, turn_input, sprint_this_frame
+
     def stop(self):
         if self.motor_sound: self.motor_sound.stop()
         if self.engine_channel: self.engine_channel.stop()
@@ -184,7 +155,6 @@ class Player:
         self.rotation = -math.pi / 2
         self.target_rotation = -math.pi / 2
         self.current_velocity = 0.0
-        self.target_velocity = 0.0
         self.velocity_x = 0.0
         self.velocity_y = 0.0
         self.wake_fade = 0.0
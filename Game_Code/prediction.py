@@ -1,125 +1,381 @@
 import time
 import math
+from collections.abc import Mapping
+import numpy as np
 from config import *
-from utils import lerp, lerp_angle, small_hash_to_phase_amp
+from history import X, Y, ROT, TS, bisect_rows
+from utils import small_hash_to_phase_amp
+
+TWO_PI = 2 * math.pi
+
+#columns of PredictionManager's per-boat state rows
+VX, VY, VROT = 3, 4, 5
+
+#extrapolated frames a boat can have waiting to be classified (a heartbeat gap and then some)
+PENDING_FRAMES = int(2 * SEND_HEARTBEAT * TARGET_FPS)
+
+
+def extrapolate(prev, last, t):
+    """Project a boat past its newest sample the way remote clients do.
+
+    Velocity comes from the last two samples, and the projection is clamped to
+    0.4 s and damped so a lost update doesn't send the boat sailing off.
+    Returns (x, y, rot, vx, vy, vrot).
+    """
+    if prev:
+        dt_net = max(1e-6, last["ts"] - prev["ts"])
+        vx = (last["x"] - prev["x"]) / dt_net
+        vy = (last["y"] - prev["y"]) / dt_net
+        rot_diff = (last["rot"] - prev["rot"]) % (2 * math.pi)
+        if rot_diff > math.pi:
+            rot_diff -= 2 * math.pi
+        vrot = rot_diff / dt_net
+    else:
+        vx = vy = vrot = 0.0
+
+    extra = t - last["ts"]
+    extra_clamped = max(0.0, min(0.4, extra))
+    damping = max(0.3, 1.0 - (extra_clamped / 0.4) * 0.6)
+
+    x = last["x"] + vx * extra_clamped * damping
+    y = last["y"] + vy * extra_clamped * damping
+    rot = (last["rot"] + vrot * extra_clamped * damping) % (2 * math.pi)
+    return x, y, rot, vx, vy, vrot
+
+
+def _wrap_angle(diff):
+    """Shortest signed angle for each element, in (-pi, pi]."""
+    diff = np.mod(diff, TWO_PI)
+    return np.where(diff > math.pi, diff - TWO_PI, diff)
+
+
+class BoatDisplay(Mapping):
+    """Where to draw each remote boat this frame.
+
+    The arrays (one row per boat, float32) can be written straight into the
+    renderer's uniforms; looking a boat up by pid gives the same values as a
+    {"x", "y", "rot", "speed", "sway_phase", "sway_amp"} dict for the per-boat
+    overlays.
+    """
+
+    def __init__(self, ids, positions, rotations, speeds, sway):
+        self.ids = ids
+        self.positions = positions  # (n, 2)
+        self.rotations = rotations  # (n,)
+        self.speeds = speeds  # (n,)
+        self.sway = sway  # (n, 2): phase, amp
+        self._index = None
+
+    def _entry(self, i):
+        return {
+            "x": float(self.positions[i, 0]),
+            "y": float(self.positions[i, 1]),
+            "rot": float(self.rotations[i]),
+            "speed": float(self.speeds[i]),
+            "sway_phase": float(self.sway[i, 0]),
+            "sway_amp": float(self.sway[i, 1]),
+        }
+
+    def __getitem__(self, pid):
+        if self._index is None:
+            self._index = {p: i for i, p in enumerate(self.ids)}
+        return self._entry(self._index[pid])
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def items(self):
+        return [(pid, self._entry(i)) for i, pid in enumerate(self.ids)]
+
+    def values(self):
+        return [self._entry(i) for i in range(len(self.ids))]
+
+
+EMPTY_DISPLAY = BoatDisplay((), np.zeros((0, 2), "f4"), np.zeros(0, "f4"), np.zeros(0, "f4"), np.zeros((0, 2), "f4"))
+
+
+class JitterBuffer:
+    """Picks how far behind real time to draw each remote boat.
+
+    Every time a boat's newest sample is replaced, the old newest sample's age
+    is exactly the delay that would have been needed to never run past it.
+    Its running mean and variance give a per-boat delay of mean +
+    JITTER_SAFETY * std, which is eased towards at JITTER_SLEW seconds per
+    second so playback speed never visibly jumps.
+
+    Frames drawn past a boat's newest sample are only counted once the next
+    sample shows when they were. If the sender skipped updates on purpose
+    (the gap is longer than two SEND_INTERVALs) the frames drawn before the
+    new sample's time were meant to be extrapolated and count as skipped;
+    the rest waited on a late sample and count as extrapolated.
+    """
+
+    def __init__(self, capacity):
+        self.delay = np.full(capacity, INTERP_DELAY)
+        self._mean = np.full(capacity, INTERP_DELAY)
+        self._var = np.zeros(capacity)
+        self._pending = np.zeros((capacity, PENDING_FRAMES))  # render times of unclassified frames
+        self._pending_n = np.zeros(capacity, dtype=np.intp)  # may pass PENDING_FRAMES: the rest are late
+        self._frames = np.zeros(capacity, dtype=np.intp)  # frames drawn since the newest sample arrived
+
+        #extrapolation counters (boat-frames)
+        self.frames = 0
+        self.extrapolated = 0
+        self.skipped = 0
+        self.recent_rate = 0.0
+
+    def _arrays(self):
+        return (("delay", INTERP_DELAY), ("_mean", INTERP_DELAY), ("_var", 0.0),
+                ("_pending", 0.0), ("_pending_n", 0), ("_frames", 0))
+
+    def resize(self, capacity):
+        for name, fill in self._arrays():
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:min(len(old), capacity)] = old[:capacity]
+            setattr(self, name, new)
+
+    def reset(self, slot):
+        for name, fill in self._arrays():
+            getattr(self, name)[slot] = fill
+
+    def move(self, src, dst):
+        for name, _ in self._arrays():
+            arr = getattr(self, name)
+            arr[dst] = arr[src]
+
+    def arrival(self, slot, needed):
+        """A new newest sample arrived; the previous one was `needed` seconds old by then."""
+        diff = needed - self._mean[slot]
+        self._mean[slot] += JITTER_SMOOTHING * diff
+        self._var[slot] = (1.0 - JITTER_SMOOTHING) * (self._var[slot] + JITTER_SMOOTHING * diff * diff)
+
+    def update(self, n, dt):
+        """Ease every boat's delay towards its target and return them."""
+        if not ADAPTIVE_INTERP_DELAY:
+            return self.delay[:n]
+        target = np.clip(self._mean[:n] + JITTER_SAFETY * np.sqrt(self._var[:n]), JITTER_MIN_DELAY, JITTER_MAX_DELAY)
+        step = JITTER_SLEW * dt
+        self.delay[:n] += np.clip(target - self.delay[:n], -step, step)
+        return self.delay[:n]
+
+    def record(self, extrapolating, render_time):
+        """One frame: which boats were drawn past their newest sample, and the time each was drawn at."""
+        n = len(extrapolating)
+        self.frames += n
+        self._frames[:n] += 1
+        slots = np.flatnonzero(extrapolating)
+        if len(slots):
+            held = self._pending_n[slots]
+            room = held < PENDING_FRAMES
+            self._pending[slots[room], held[room]] = render_time[slots[room]]
+            self._pending_n[slots] += 1
+
+    def resolve(self, slot, prev_ts, newest_ts):
+        """Classify the boat's waiting frames now that a sample newer than prev_ts arrived."""
+        n = int(self._pending_n[slot])
+        if n:
+            if newest_ts - prev_ts <= 2 * SEND_INTERVAL:
+                late = n
+            else:
+                held = self._pending[slot, :min(n, PENDING_FRAMES)]
+                late = int(np.count_nonzero(held > newest_ts)) + max(0, n - PENDING_FRAMES)
+            self.extrapolated += late
+            self.skipped += n - late
+            self.recent_rate += 0.05 * (late / self._frames[slot] - self.recent_rate)
+        elif self._frames[slot]:
+            self.recent_rate -= 0.05 * self.recent_rate
+        self._pending_n[slot] = 0
+        self._frames[slot] = 0
+
+    def stats(self, n):
+        delay = self.delay[:n]
+        return {
+            "delay_mean": float(delay.mean()) if n else INTERP_DELAY,
+            "delay_min": float(delay.min()) if n else INTERP_DELAY,
+            "delay_max": float(delay.max()) if n else INTERP_DELAY,
+            "extrapolation_rate": self.extrapolated / self.frames if self.frames else 0.0,
+            "skip_extrapolation_rate": self.skipped / self.frames if self.frames else 0.0,
+            "recent_extrapolation_rate": self.recent_rate,
+        }
 
 
 class PredictionManager:
-    def __init__(self):
-        self.other_players_display = {}
+    """Smooths every remote boat at once.
+
+    Per-boat state lives in structure-of-arrays form: one row per boat in
+    _state (x, y, rot, vx, vy, vrot) and its padded sample history in _hist,
+    so each frame is a handful of NumPy operations over all boats instead of a
+    Python loop per boat.
+    """
+
+    def __init__(self, capacity=16):
+        self.other_players_display = EMPTY_DISPLAY
+        self._ids = []  # slot -> pid
+        self._slots = {}  # pid -> slot
+        self._views = []  # slot -> HistoryView last copied into _hist
+        self._state = np.zeros((capacity, 6))
+        self._hist = np.full((capacity, MAX_HISTORY, 4), np.inf)
+        self._len = np.zeros(capacity, dtype=np.intp)
+        self._sway = np.zeros((capacity, 2))
+        self.jitter = JitterBuffer(capacity)
+
+    def _grow(self):
+        capacity = len(self._state) * 2
+        state = np.zeros((capacity, 6))
+        state[:len(self._state)] = self._state
+        hist = np.full((capacity, MAX_HISTORY, 4), np.inf)
+        hist[:len(self._hist)] = self._hist
+        length = np.zeros(capacity, dtype=np.intp)
+        length[:len(self._len)] = self._len
+        sway = np.zeros((capacity, 2))
+        sway[:len(self._sway)] = self._sway
+        self._state, self._hist, self._len, self._sway = state, hist, length, sway
+        self.jitter.resize(capacity)
+
+    def _add(self, pid, history):
+        if len(self._ids) == len(self._state):
+            self._grow()
+        slot = len(self._ids)
+        self._ids.append(pid)
+        self._views.append(None)
+        self._slots[pid] = slot
+        x, y, rot, _ = history.newest
+        self._state[slot] = (x, y, rot, 0.0, 0.0, 0.0)
+        self._sway[slot] = small_hash_to_phase_amp(pid)
+        self.jitter.reset(slot)
+        return slot
+
+    def _remove(self, pid):
+        #keep slots dense: move the last boat into the freed slot
+        slot = self._slots.pop(pid)
+        last = len(self._ids) - 1
+        if slot != last:
+            moved = self._ids[last]
+            self._ids[slot] = moved
+            self._views[slot] = self._views[last]
+            self._slots[moved] = slot
+            for arr in (self._state, self._hist, self._len, self._sway):
+                arr[slot] = arr[last]
+            self.jitter.move(last, slot)
+        self._ids.pop()
+        self._views.pop()
+
+    def _sync(self, other_players, now):
+        for pid in [p for p in self._ids if p not in other_players]:
+            self._remove(pid)
+        for pid, remote in other_players.items():
+            history = remote.history
+            if not len(history):
+                continue
+            slot = self._slots.get(pid)
+            if slot is None:
+                slot = self._add(pid, history)
+            if self._views[slot] is not history:
+                #how stale our newest sample had got by the time a newer one showed up.
+                #longer gaps are the sender skipping updates on purpose because our
+                #extrapolation was already right, so they don't count towards the delay
+                k = self._len[slot]
+                if k:
+                    prev_ts = self._hist[slot, k - 1, TS]
+                    newest_ts = history.newest_ts
+                    if newest_ts > prev_ts:
+                        self.jitter.resolve(slot, prev_ts, newest_ts)
+                        if newest_ts - prev_ts <= 2 * SEND_INTERVAL:
+                            self.jitter.arrival(slot, now - prev_ts)
+
+                #new samples arrived: copy the (small) history into this boat's row
+                k = len(history)
+                history.copy_into(self._hist[slot])
+                self._hist[slot, k:] = np.inf
+                self._len[slot] = k
+                self._views[slot] = history
 
     def update_predictions(self, dt, other_players):
+        """other_players is the read-only pid -> RemotePlayer map from NetworkManager.snapshot."""
         now = time.time()
-        render_time = now - INTERP_DELAY
-        display = {}
+        self._sync(other_players, now)
+        n = len(self._ids)
+        if not n:
+            self.other_players_display = EMPTY_DISPLAY
+            return
 
-        for pid, data in list(other_players.items()):
-            hist = data.get("history", [])
-            if not hist:
-                continue
+        #each boat is drawn as far in the past as its own jitter needs
+        render_time = now - self.jitter.update(n, dt)
+        hist = self._hist[:n]
+        length = self._len[:n]
+        rows = np.arange(n)
 
-            state = data["state"]
-            target = data["target"]
-
-            s0, s1 = None, None
-            for i in range(len(hist) - 1):
-                a = hist[i]
-                b = hist[i + 1]
-                if a["ts"] <= render_time <= b["ts"]:
-                    s0, s1 = a, b
-                    break
-
-            if s0 and s1:
-                dt_net = max(1e-6, s1["ts"] - s0["ts"])
-                alpha = (render_time - s0["ts"]) / dt_net
-                alpha = max(0.0, min(1.0, alpha))
-
-                target["x"] = lerp(s0["x"], s1["x"], alpha)
-                target["y"] = lerp(s0["y"], s1["y"], alpha)
-                target["rot"] = lerp_angle(s0["rot"], s1["rot"], alpha)
-
-                target["vx"] = (s1["x"] - s0["x"]) / dt_net
-                target["vy"] = (s1["y"] - s0["y"]) / dt_net
-                rot_diff = (s1["rot"] - s0["rot"]) % (2 * math.pi)
-                if rot_diff > math.pi:
-                    rot_diff -= 2 * math.pi
-                target["vrot"] = rot_diff / dt_net
-
-            elif render_time <= hist[0]["ts"]:
-                s = hist[0]
-                target["x"] = s["x"]
-                target["y"] = s["y"]
-                target["rot"] = s["rot"]
-                target["vx"] = 0.0
-                target["vy"] = 0.0
-                target["vrot"] = 0.0
+        #pick the pair of samples to work from: the two around render_time,
+        #the last two to extrapolate past the newest, or the first one if we're before it
+        #(binary search on each row: unused slots hold inf, so every row is in time order)
+        idx = bisect_rows(hist[:, :, TS], render_time) - 1
+        last = length - 1
+        before = idx < 0
+        interp = ~before & (idx < last)
+        extrap = ~before & ~interp
+        self.jitter.record(extrap, render_time)
+        i1 = np.where(interp, idx + 1, np.where(before, 0, last))
+        i0 = np.where(interp, idx, np.where(extrap & (length >= 2), last - 1, i1))
+        a = hist[rows, i0]
+        b = hist[rows, i1]
 
-            else:
-                last = hist[-1]
-                prev = hist[-2] if len(hist) >= 2 else None
-
-                if prev:
-                    dt_net = max(1e-6, last["ts"] - prev["ts"])
-                    target["vx"] = (last["x"] - prev["x"]) / dt_net
-                    target["vy"] = (last["y"] - prev["y"]) / dt_net
-                    rot_diff = (last["rot"] - prev["rot"]) % (2 * math.pi)
-                    if rot_diff > math.pi:
-                        rot_diff -= 2 * math.pi
-                    target["vrot"] = rot_diff / dt_net
-                else:
-                    target["vx"] = 0.0
-                    target["vy"] = 0.0
-                    target["vrot"] = 0.0
-
-                extra = render_time - last["ts"]
-                extra_clamped = max(0.0, min(0.4, extra))
-                damping = max(0.3, 1.0 - (extra_clamped / 0.4) * 0.6)
-
-                target["x"] = last["x"] + target["vx"] * extra_clamped * damping
-                target["y"] = last["y"] + target["vy"] * extra_clamped * damping
-                target["rot"] = (last["rot"] + target["vrot"] * extra_clamped * damping) % (2 * math.pi)
-
-            state["x"] += state["vx"] * dt
-            state["y"] += state["vy"] * dt
-            state["rot"] = (state["rot"] + state["vrot"] * dt) % (2 * math.pi)
-
-            state["vx"] = lerp(state["vx"], target["vx"], VELOCITY_CORRECTION_SPEED)
-            state["vy"] = lerp(state["vy"], target["vy"], VELOCITY_CORRECTION_SPEED)
-            state["vrot"] = lerp(state["vrot"], target["vrot"], VELOCITY_CORRECTION_SPEED)
-
-            pos_error_x = target["x"] - state["x"]
-            pos_error_y = target["y"] - state["y"]
-            pos_error_dist = math.hypot(pos_error_x, pos_error_y)
-
-            if pos_error_dist > 0.001:
-                correction_strength = POSITION_CORRECTION_SPEED
-                if pos_error_dist > MAX_POSITION_ERROR:
-                    correction_strength = lerp(POSITION_CORRECTION_SPEED, 0.3,
-                                               min(1.0, (pos_error_dist - MAX_POSITION_ERROR) / MAX_POSITION_ERROR))
-
-                state["x"] = lerp(state["x"], target["x"], correction_strength)
-                state["y"] = lerp(state["y"], target["y"], correction_strength)
-
-            state["rot"] = lerp_angle(state["rot"], target["rot"], ROTATION_CORRECTION_SPEED)
-
-            speed = math.hypot(state["vx"], state["vy"])
-            phase, amp = small_hash_to_phase_amp(pid)
-
-            display[pid] = {
-                "x": state["x"],
-                "y": state["y"],
-                "rot": state["rot"],
-                "speed": speed,
-                "sway_phase": phase,
-                "sway_amp": amp
-            }
-
-        stale_cutoff = now - 12.0
-        to_delete = []
-        for pid, data in list(other_players.items()):
-            if data.get("history") and data["history"][-1]["ts"] < stale_cutoff:
-                to_delete.append(pid)
-        for pid in to_delete:
-            other_players.pop(pid, None)
-
-        self.other_players_display = display
\ No newline at end of file
+        dt_net = np.maximum(1e-6, b[:, TS] - a[:, TS])
+        dx = b[:, X] - a[:, X]
+        dy = b[:, Y] - a[:, Y]
+        drot = _wrap_angle(b[:, ROT] - a[:, ROT])
+        target_vx = dx / dt_net
+        target_vy = dy / dt_net
+        target_vrot = drot / dt_net
+
+        alpha = np.clip((render_time - a[:, TS]) / dt_net, 0.0, 1.0)
+        extra = np.clip(render_time - b[:, TS], 0.0, 0.4)
+        damping = np.maximum(0.3, 1.0 - (extra / 0.4) * 0.6)
+        target_x = np.where(interp, a[:, X] + dx * alpha, b[:, X] + target_vx * extra * damping)
+        target_y = np.where(interp, a[:, Y] + dy * alpha, b[:, Y] + target_vy * extra * damping)
+        target_rot = np.where(interp, a[:, ROT] + drot * alpha,
+                              np.mod(b[:, ROT] + target_vrot * extra * damping, TWO_PI))
+
+        #integrate, then ease velocity, position and rotation towards the target
+        state = self._state[:n]
+        state[:, X] += state[:, VX] * dt
+        state[:, Y] += state[:, VY] * dt
+        state[:, ROT] = np.mod(state[:, ROT] + state[:, VROT] * dt, TWO_PI)
+
+        state[:, VX] += (target_vx - state[:, VX]) * VELOCITY_CORRECTION_SPEED
+        state[:, VY] += (target_vy - state[:, VY]) * VELOCITY_CORRECTION_SPEED
+        state[:, VROT] += (target_vrot - state[:, VROT]) * VELOCITY_CORRECTION_SPEED
+
+        error_x = target_x - state[:, X]
+        error_y = target_y - state[:, Y]
+        error = np.hypot(error_x, error_y)
+        strength = np.where(
+            error > MAX_POSITION_ERROR,
+            POSITION_CORRECTION_SPEED + (0.3 - POSITION_CORRECTION_SPEED)
+            * np.minimum(1.0, (error - MAX_POSITION_ERROR) / MAX_POSITION_ERROR),
+            POSITION_CORRECTION_SPEED,
+        )
+        strength = np.where(error > 0.001, strength, 0.0)
+        state[:, X] += error_x * strength
+        state[:, Y] += error_y * strength
+        state[:, ROT] += _wrap_angle(target_rot - state[:, ROT]) * ROTATION_CORRECTION_SPEED
+
+        self.other_players_display = BoatDisplay(
+            tuple(self._ids),
+            state[:, X:ROT].astype("f4"),
+            state[:, ROT].astype("f4"),
+            np.hypot(state[:, VX], state[:, VY]).astype("f4"),
+            self._sway[:n].astype("f4"),
+        )
+
+    def view_delay(self):
+        """How far in the past remote boats are drawn, on average (what a shot fired now was aimed at)."""
+        n = len(self._ids)
+        return float(self.jitter.delay[:n].mean()) if n else INTERP_DELAY
+
+    def stats(self):
+        """Current interpolation delays and how often boats had to be extrapolated."""
+        return self.jitter.stats(len(self._ids))
@@ -0,0 +1,112 @@
+"""Client-side prediction for the local boat against a backend that owns movement.
+
+Every frame's input is numbered and kept in a bounded log. The boat moves
+straight away (prediction); when the backend's state for input N arrives, the
+boat is put back there and inputs after N are replayed through the same
+movement.step, so a correct prediction ends up exactly where it already was
+and a wrong one is corrected without throwing away what was pressed since.
+"""
+
+import math
+import time
+from collections import deque
+from threading import Lock
+from config import INPUT_LOG_SIZE, INPUT_BATCH_MAX, INPUT_MAX_DT, RECONCILE_EPSILON
+import movement
+
+
+class Reconciler:
+    """Input log plus the latest authoritative state.
+
+    record() and apply() run on the frame loop, unacked() and receive() on
+    the network side.
+    """
+
+    def __init__(self, size=INPUT_LOG_SIZE):
+        self.inputs = deque(maxlen=size)  # movement.BoatInput, oldest first
+        self._lock = Lock()
+        self.next_seq = 1
+        self.acked_seq = 0
+        self._authority = None  # (seq, state) waiting for the frame loop
+        self.last_received = 0.0
+
+        #counters
+        self.recorded = 0
+        self.overflowed = 0
+        self.reconciles = 0
+        self.corrections = 0
+        self.replayed = 0
+        self.last_error = 0.0
+        self.max_error = 0.0
+
+    def record(self, dt, move, turn, sprint):
+        """Log one frame of input (the same one Player.update just moved by) and return it."""
+        entry = movement.BoatInput(self.next_seq, min(float(dt), INPUT_MAX_DT),
+                                   float(move), float(turn), bool(sprint))
+        self.next_seq += 1
+        with self._lock:
+            if len(self.inputs) == self.inputs.maxlen:
+                self.overflowed += 1
+            self.inputs.append(entry)
+        self.recorded += 1
+        return entry
+
+    def unacked(self, limit=INPUT_BATCH_MAX):
+        """The newest inputs the backend hasn't confirmed, oldest first."""
+        acked = self.acked_seq
+        with self._lock:
+            pending = [entry for entry in self.inputs if entry.seq > acked]
+        return pending[-limit:]
+
+    def receive(self, seq, state):
+        """Hand over an authoritative state (from the network side)."""
+        current = self._authority
+        if current is None or seq > current[0]:
+            self._authority = (seq, state)
+        self.last_received = time.time()
+
+    def apply(self, boat, items=None):
+        """Rewind boat to the newest authoritative state and replay what came after it.
+
+        items, if given, is the ItemManager the frame loop collides with after each step.
+
+        Returns the distance the boat moved because of it (0.0 if nothing new arrived).
+        """
+        authority = self._authority
+        if authority is None or authority[0] <= self.acked_seq:
+            return 0.0
+        seq, state = authority
+        with self._lock:
+            while self.inputs and self.inputs[0].seq <= seq:
+                self.inputs.popleft()
+            pending = list(self.inputs)
+        self.acked_seq = seq
+
+        x, y = boat.x, boat.y
+        movement.set_state(boat, state)
+        for entry in pending:
+            movement.step(boat, entry.move, entry.turn, entry.sprint, entry.dt)
+            if items is not None:
+                movement.collide(boat, items)
+
+        error = math.hypot(boat.x - x, boat.y - y)
+        self.reconciles += 1
+        self.replayed += len(pending)
+        self.last_error = error
+        self.max_error = max(self.max_error, error)
+        if error > RECONCILE_EPSILON:
+            self.corrections += 1
+        return error
+
+    def stats(self):
+        return {
+            "pending": len(self.inputs),
+            "acked_seq": self.acked_seq,
+            "recorded": self.recorded,
+            "overflowed": self.overflowed,
+            "reconciles": self.reconciles,
+            "corrections": self.corrections,
+            "replayed": self.replayed,
+            "last_error": self.last_error,
+            "max_error": self.max_error,
+        }
@@ -0,0 +1,338 @@
+"""LOCAL UDP RELAY THAT PUSHES WORLD UPDATES TO CONNECTED CLIENTS
+
+Run it with `python relay_server.py` and start the game with BMS_TRANSPORT=udp.
+Clients that send their inputs (instead of positions) get their boat simulated
+here, and the relay's state is sent back to them for reconciliation.
+"""
+
+import argparse
+import json
+import socket
+import time
+from threading import Thread
+from config import *
+import aoi
+import codec
+import movement
+import rooms
+from items import ItemManager
+
+
+class RelayClient:
+    def __init__(self, addr, now, room=ROOM):
+        self.addr = addr
+        self.joined = now  # a hello starts a new snapshot stream, so this tells streams apart
+        self.last_seen = now
+        self.room = room
+        self.encoder = codec.SnapshotEncoder()
+
+
+def encode_snapshots(clients, players, rooms_of, owners, cannonballs, now):
+    """A snapshot for each of clients [(addr, room, encoder)]: everyone near its boat in its room
+    (players {player_id: row}, rooms_of {player_id: room}), minus its own boat and shots
+    (owners {player_id: addr}), delta-encoded against what it last acked. Returns [(addr, packet)]."""
+    grids = {}  # room -> aoi.GridIndex of its players
+    for pid, row in players.items():
+        room = rooms_of.get(pid, ROOM)
+        if room not in grids:
+            grids[room] = aoi.GridIndex()
+        grids[room].add(row)
+    shots = {}  # room -> live cannonballs fired in it
+    for row in cannonballs:
+        shots.setdefault(rooms_of.get(row["player_id"], ROOM), []).append(row)
+    own = {}  # addr -> the row of the boat it drives
+    for pid, addr in owners.items():
+        if pid in players:
+            own[addr] = players[pid]
+
+    packets = []
+    for addr, room, encoder in clients:
+        grid = grids.get(room)
+        me = own.get(addr)
+        if grid is None:
+            nearby = ()
+        elif me is None:
+            #not driving a boat yet, so there's no area to trim to
+            nearby = grid.rows()
+        else:
+            nearby = grid.query(aoi.bounds_around(float(me["x"]), float(me["y"])))
+        visible = [row for row in nearby if owners.get(row["player_id"]) != addr]
+        flying = [row for row in shots.get(room, ()) if owners.get(row["player_id"]) != addr]
+        packets.append((addr, encoder.encode(visible, flying, now)))
+    return packets
+
+
+class RelayBoat:
+    """A boat whose movement the relay owns."""
+
+    def __init__(self, row, seq):
+        self.state = movement.BoatState(float(row["x"]), float(row["y"]), float(row["rotation"]))
+        self.name = row.get("player_name", "")
+        self.seq = seq  # last input applied
+        self.dirty = True  # owner hasn't been sent the current state
+
+    def apply(self, inputs, step):
+        """Run inputs we haven't seen (batches repeat them) through step(boat, move, turn, sprint, dt)."""
+        applied = False
+        for seq, dt, move, turn, sprint in inputs:
+            if seq <= self.seq:
+                continue
+            step(self, move, turn, sprint, min(dt, INPUT_MAX_DT))
+            self.seq = seq
+            applied = True
+        if applied:
+            self.dirty = True
+        return applied
+
+    def row(self, player_id, now):
+        return {
+            "player_id": player_id,
+            "player_name": self.name,
+            "x": self.state.x,
+            "y": self.state.y,
+            "rotation": self.state.rotation,
+            "updated_at": now,
+        }
+
+
+class RelayServer:
+    #what the relay decides for clients (sent in the welcome)
+    authority = ("movement",)
+
+    def __init__(self, host=RELAY_HOST, port=RELAY_PORT, tick_interval=RELAY_TICK_INTERVAL):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self.tick_interval = tick_interval
+        self.running = False
+
+        self.clients = {}  # addr -> RelayClient
+        self.players = {}  # player_id -> latest row
+        self.player_addrs = {}  # player_id -> addr that owns it
+        self.boats = {}  # player_id -> RelayBoat, for clients that send inputs
+        self.cannonballs = {}  # id -> row
+        self.chats = {}  # id -> row
+        #the rocks, so boats the relay moves collide the same way they do on the client
+        self.items = ItemManager(load_images=False)
+
+        #counters for benchmarking
+        self.packets_in = 0
+        self.packets_out = 0
+        self.bytes_out = 0
+
+    def start(self):
+        """Serve on a background thread (handy for local tests and benchmarks)."""
+        self.running = True
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def serve_forever(self):
+        self.running = True
+        print(f"🛰️  Relay listening on {self.address[0]}:{self.address[1]}")
+        last_prune = time.time()
+        next_tick = time.time() + self.tick_interval
+        while self.running:
+            #wait for datagrams until the next snapshot is due
+            self.sock.settimeout(max(0.001, next_tick - time.time()))
+            try:
+                data, addr = self.sock.recvfrom(RELAY_MAX_DATAGRAM)
+                self.packets_in += 1
+                self.handle(data, addr)
+            except (socket.timeout, BlockingIOError):
+                pass
+            except (ValueError, KeyError, codec.CodecError) as e:
+                print(f"❌ Bad datagram: {e}")
+            except OSError as e:
+                if self.running:
+                    print(f"❌ Relay socket error: {e}")
+
+            now = time.time()
+            if now >= next_tick:
+                self.tick(now)
+                next_tick = max(next_tick + self.tick_interval, now)
+            if now - last_prune >= 1.0:
+                self._prune(now)
+                last_prune = now
+        self.sock.close()
+
+    def handle(self, data, addr):
+        now = time.time()
+        client = self.clients.get(addr)
+        if client:
+            client.last_seen = now
+
+        kind = codec.packet_type(data)
+        if kind == codec.PLAYER_UPDATE:
+            row = codec.decode_player_update(data)
+            if row["player_id"] in self.boats:
+                return  # we own this boat's position now
+            self.players[row["player_id"]] = row
+            self.player_addrs[row["player_id"]] = addr
+            return
+        if kind == codec.INPUTS:
+            self._apply_inputs(*codec.decode_inputs(data), addr, now)
+            return
+        if kind == codec.CANNONBALL:
+            self._add_cannonball(codec.decode_cannonball(data))
+            return
+        if kind == codec.ACK:
+            if client:
+                self._ack(client, codec.decode_ack(data))
+            return
+
+        msg = json.loads(data)
+        kind = msg.get("t")
+
+        if kind == "hello":
+            #fresh encoder so the first snapshot is a full one
+            self.clients[addr] = RelayClient(addr, now, rooms.clean_room(msg.get("room")))
+            for row in self.chats.values():
+                self._send({"t": "chat", "row": row}, addr)
+            self._send({"t": "welcome", "time": now, "authority": list(self.authority)}, addr)
+
+        elif kind == "ping":
+            #clock probe: echo the client's send time with ours
+            self._send({"t": "pong", "t0": msg.get("t0"), "t1": now, "t2": time.time()}, addr)
+
+        elif kind == "rooms":
+            #room directory query: anyone may ask, no hello needed
+            self._send({"t": "rooms", "rooms": self.room_counts()}, addr)
+
+        elif kind == "leave":
+            self._remove_player(msg["player_id"])
+
+        elif kind == "chat":
+            row = msg["row"]
+            self.chats[row["id"]] = row
+            self._broadcast(msg)
+
+        elif kind == "chat_clear":
+            self.chats.clear()
+            self._broadcast(msg)
+
+        elif kind == "bye":
+            self.clients.pop(addr, None)
+
+    def _input_boat(self, player_id, inputs, addr):
+        """The boat a client's inputs drive, spawned where it last said it was (None until it has)."""
+        boat = self.boats.get(player_id)
+        if boat is None:
+            row = self.players.get(player_id)
+            if row is None or not inputs:
+                return None  # no spawn position yet, the client keeps sending it until we answer
+            #the client sends its position right before the batch, so that already includes these inputs
+            boat = self.boats[player_id] = RelayBoat(row, inputs[-1][0])
+            self.player_addrs[player_id] = addr
+        return boat
+
+    def _apply_inputs(self, player_id, inputs, addr, now):
+        """Run a client's inputs through the shared movement code (batches repeat inputs, so skip seen ones)."""
+        boat = self._input_boat(player_id, inputs, addr)
+        if boat is not None and boat.apply(inputs, self._step_boat):
+            self.player_addrs[player_id] = addr
+            self.players[player_id] = boat.row(player_id, now)
+
+    def _step_boat(self, boat, move, turn, sprint, dt):
+        movement.step(boat.state, move, turn, sprint, dt)
+        movement.collide(boat.state, self.items)
+
+    def _add_cannonball(self, row):
+        self.cannonballs[row["id"]] = row
+
+    def room_of(self, player_id):
+        """The room of the client driving player_id."""
+        client = self.clients.get(self.player_addrs.get(player_id))
+        return client.room if client else ROOM
+
+    def room_counts(self):
+        counts = {}
+        for pid in self.players:
+            room = self.room_of(pid)
+            counts[room] = counts.get(room, 0) + 1
+        return counts
+
+    def tick(self, now):
+        #owners of simulated boats get their state back first
+        self._send_states(now)
+        self._send_snapshots(now)
+
+    def _send_states(self, now):
+        for pid, boat in self.boats.items():
+            addr = self.player_addrs.get(pid)
+            if boat.dirty and addr is not None:
+                self._send_raw(codec.encode_state(pid, boat.seq, movement.get_state(boat.state), now), addr)
+                boat.dirty = False
+
+    def _ack(self, client, seq):
+        client.encoder.ack(seq)
+
+    def _snapshot_inputs(self, now):
+        """(players, rooms_of, owners, live cannonballs) for encode_snapshots."""
+        cutoff = now - CANNONBALL_RETENTION
+        cannonballs = [row for row in self.cannonballs.values() if row["created_at"] >= cutoff]
+        rooms_of = {pid: self.room_of(pid) for pid in self.players}
+        for row in cannonballs:
+            if row["player_id"] not in rooms_of:
+                rooms_of[row["player_id"]] = self.room_of(row["player_id"])
+        return self.players, rooms_of, self.player_addrs, cannonballs
+
+    def _send_snapshots(self, now):
+        """Send every client a snapshot of everyone near its boat in its room, delta-encoded against what it last acked."""
+        clients = [(client.addr, client.room, client.encoder) for client in list(self.clients.values())]
+        for addr, packet in encode_snapshots(clients, *self._snapshot_inputs(now), now):
+            self._send_raw(packet, addr)
+
+    def _send_raw(self, data, addr):
+        try:
+            self.sock.sendto(data, addr)
+        except OSError as e:
+            print(f"❌ Send to {addr} failed: {e}")
+            return
+        self.packets_out += 1
+        self.bytes_out += len(data)
+
+    def _send(self, msg, addr):
+        self._send_raw(json.dumps(msg, separators=(",", ":")).encode(), addr)
+
+    def _broadcast(self, msg, room=None):
+        """Send msg to every client, or only to those in room."""
+        data = json.dumps(msg, separators=(",", ":")).encode()
+        for addr, client in list(self.clients.items()):
+            if room is None or client.room == room:
+                self._send_raw(data, addr)
+
+    def _remove_player(self, player_id):
+        self.players.pop(player_id, None)
+        self.player_addrs.pop(player_id, None)
+        self.boats.pop(player_id, None)
+        for cb_id in [k for k, v in self.cannonballs.items() if v.get("player_id") == player_id]:
+            del self.cannonballs[cb_id]
+
+    def _prune(self, now):
+        #drop clients that went quiet, and the boats they were driving
+        for addr in [a for a, c in self.clients.items() if now - c.last_seen > RELAY_CLIENT_TIMEOUT]:
+            del self.clients[addr]
+            for pid in [p for p, a in self.player_addrs.items() if a == addr]:
+                print(f"👋 {pid[:8]} timed out")
+                self._remove_player(pid)
+
+        cutoff = now - CANNONBALL_RETENTION
+        for cb_id in [k for k, v in self.cannonballs.items() if v["created_at"] < cutoff]:
+            del self.cannonballs[cb_id]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Boat Man Shooters UDP relay")
+    parser.add_argument("--host", default=RELAY_HOST)
+    parser.add_argument("--port", type=int, default=RELAY_PORT)
+    args = parser.parse_args()
+
+    relay = RelayServer(args.host, args.port)
+    try:
+        relay.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Relay stopped")
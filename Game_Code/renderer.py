@@ -296,23 +296,31 @@ class Renderer:
         self.program['viewportSize'].value = (float(self.viewport_width), float(self.viewport_height))
         self.program['worldSize'].value = (float(WORLD_WIDTH), float(WORLD_HEIGHT))
 
-        display_list = list(other_players_display.values())[:10]
-        num_other = len(display_list)
-        self.program['numOtherPlayers'].value = num_other
-
         pos_array = np.zeros(20, dtype='f4')
         rot_array = np.zeros(10, dtype='f4')
         speed_array = np.zeros(10, dtype='f4')
         sway_phase_array = np.zeros(10, dtype='f4')
         sway_amp_array = np.zeros(10, dtype='f4')
 
-        for idx, e in enumerate(display_list):
-            pos_array[idx * 2 + 0] = float(e['x'])
-            pos_array[idx * 2 + 1] = float(e['y'])
-            rot_array[idx] = float(e['rot'])
-            speed_array[idx] = float(max(0.0, min(2.5, e.get('speed', 0.0))))
-            sway_phase_array[idx] = float(e.get('sway_phase', 0.0))
-            sway_amp_array[idx] = float(e.get('sway_amp', 1.0))
+        if hasattr(other_players_display, 'positions'):
+            #PredictionManager already hands us per-boat arrays; copy them in whole
+            num_other = min(len(other_players_display), 10)
+            pos_array[:num_other * 2] = other_players_display.positions[:num_other].ravel()
+            rot_array[:num_other] = other_players_display.rotations[:num_other]
+            speed_array[:num_other] = np.clip(other_players_display.speeds[:num_other], 0.0, 2.5)
+            sway_phase_array[:num_other] = other_players_display.sway[:num_other, 0]
+            sway_amp_array[:num_other] = other_players_display.sway[:num_other, 1]
+        else:
+            display_list = list(other_players_display.values())[:10]
+            num_other = len(display_list)
+            for idx, e in enumerate(display_list):
+                pos_array[idx * 2 + 0] = float(e['x'])
+                pos_array[idx * 2 + 1] = float(e['y'])
+                rot_array[idx] = float(e['rot'])
+                speed_array[idx] = float(max(0.0, min(2.5, e.get('speed', 0.0))))
+                sway_phase_array[idx] = float(e.get('sway_phase', 0.0))
+                sway_amp_array[idx] = float(e.get('sway_amp', 1.0))
+        self.program['numOtherPlayers'].value = num_other
 
         try:
             self.program.get("otherBoatPositions").write(pos_array.tobytes())
@@ -373,11 +381,7 @@ class Renderer:
             self.draw_cannon_balls(cannon_balls, player)
 
     def draw_minimap(self, player, other_players_display):
-        try:
-            from config import WIDTH, HEIGHT, WORLD_WIDTH, WORLD_HEIGHT
-        except Exception:
-            WIDTH, HEIGHT = 1280, 720
-            WORLD_WIDTH, WORLD_HEIGHT = 15, 15
+        from config import WIDTH, HEIGHT, WORLD_WIDTH, WORLD_HEIGHT
 
         surf = self._get_overlay_surface()
 
@@ -535,6 +539,51 @@ class Renderer:
         except Exception:
             return
 
+    def draw_network_stats(self, lines):
+        #F3 panel, under the minimap
+        font = getattr(self, 'nametag_font', None)
+        if not lines or not font or not getattr(self, 'overlay_vao', None):
+            return
+
+        surf = self._get_overlay_surface()
+
+        x, y = 20, 240
+        line_height = 20
+        try:
+            rendered = [font.render(line, (230, 230, 230))[0] for line in lines]
+        except Exception:
+            return
+        panel_width = max(s.get_width() for s in rendered) + 16
+        pygame.draw.rect(surf, (0, 0, 0, 160), (x, y, panel_width, line_height * len(rendered) + 12))
+        for i, line_surf in enumerate(rendered):
+            surf.blit(line_surf, (x + 8, y + 8 + i * line_height))
+
+        data = pygame.image.tobytes(surf, 'RGBA', True)
+        w, h = surf.get_size()
+
+        try:
+            if self.overlay_texture is None:
+                self.overlay_texture = self.ctx.texture((w, h), 4, data)
+                self.overlay_texture.filter = (moderngl.LINEAR, moderngl.LINEAR)
+            else:
+                try:
+                    self.overlay_texture.write(data)
+                except Exception:
+                    self.overlay_texture.release()
+                    self.overlay_texture = self.ctx.texture((w, h), 4, data)
+                    self.overlay_texture.filter = (moderngl.LINEAR, moderngl.LINEAR)
+
+            self.overlay_texture.use(location=2)
+            try:
+                self.overlay_program['overlayTexture'].value = 2
+            except Exception:
+                pass
+
+            self.ctx.enable(moderngl.BLEND)
+            self.overlay_vao.render(mode=moderngl.TRIANGLE_STRIP)
+        except Exception:
+            return
+
     def draw_player_nametags(self, player, other_players_display, names=None, y_offset=75):
         try:
             from config import WIDTH, HEIGHT
@@ -0,0 +1,93 @@
+"""Rooms: which relay hosts a room, and which rooms have people in them.
+
+Players only see (and fetch) others in their own room. With several relays
+(ROOM_RELAYS), every room lives on exactly one of them, picked by rendezvous
+hashing on the room id. Every client works out the same relay for a room
+without asking anyone, and adding or removing a relay only moves the rooms
+that hashed to it.
+"""
+
+import hashlib
+import json
+import socket
+import time
+from config import *
+
+
+def parse_relays(spec):
+    """"host:port,host:port" -> [(host, port)]."""
+    relays = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        host, _, port = part.rpartition(":")
+        relays.append((host or RELAY_HOST, int(port)))
+    return relays
+
+
+def clean_room(room):
+    """Room ids are short free text; anything empty is the default room."""
+    room = str(room or "").strip()[:ROOM_NAME_MAX]
+    return room or ROOM
+
+
+class RoomDirectory:
+    """Maps rooms to relays and lists the rooms that are in use."""
+
+    def __init__(self, relays=None, pinned=None):
+        self.relays = list(relays or parse_relays(ROOM_RELAYS) or [(RELAY_HOST, RELAY_PORT)])
+        self.pinned = dict(pinned or {})  # room -> (host, port), for rooms placed by hand
+
+    def relay_for(self, room):
+        """The (host, port) of the relay hosting room."""
+        room = clean_room(room)
+        if room in self.pinned:
+            return self.pinned[room]
+        return max(self.relays, key=lambda relay: self._weight(room, relay))
+
+    @staticmethod
+    def _weight(room, relay):
+        key = f"{room}|{relay[0]}:{relay[1]}".encode()
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+
+    def list_rooms(self, timeout=ROOM_QUERY_TIMEOUT):
+        """{room: players} over every relay that answers within timeout.
+
+        Each relay gets one datagram and sends back one; silent relays are skipped.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rooms = {}
+        try:
+            waiting = set()
+            for relay in self.relays:
+                try:
+                    sock.sendto(b'{"t":"rooms"}', relay)
+                    waiting.add(relay)
+                except OSError as e:
+                    print(f"❌ Couldn't ask {relay[0]}:{relay[1]} for rooms: {e}")
+            deadline = time.time() + timeout
+            while waiting and time.time() < deadline:
+                sock.settimeout(max(0.001, deadline - time.time()))
+                try:
+                    data, addr = sock.recvfrom(RELAY_MAX_DATAGRAM)
+                    msg = json.loads(data)
+                except (socket.timeout, ValueError):
+                    continue
+                except OSError:
+                    continue  # a relay that isn't running (ICMP port unreachable)
+                if msg.get("t") != "rooms":
+                    continue
+                waiting.discard(addr)
+                for room, count in msg.get("rooms", {}).items():
+                    rooms[room] = rooms.get(room, 0) + count
+        finally:
+            sock.close()
+        return rooms
+
+
+if __name__ == "__main__":
+    directory = RoomDirectory()
+    for room, count in sorted(directory.list_rooms().items()):
+        host, port = directory.relay_for(room)
+        print(f"⚓ {room}: {count} player(s) on {host}:{port}")
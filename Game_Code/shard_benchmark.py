@@ -0,0 +1,117 @@
+"""MEASURES WHAT SHARDING BUYS: SERVER TICK TIME BY WORKER COUNT, PART BY PART
+
+Run with `python shard_benchmark.py [--boats 100] [--workers 0 1 2 4]` (0 is the
+single-process game_server.py). Every boat sends one input a tick and a
+quarter of them have a shot in the air. Each tick
+is timed in three parts:
+
+    inputs     routing the tick's input datagrams (gateway; pickled to a worker when sharded)
+    step       the simulation tick (sharded: the workers in parallel, plus the merge)
+    snapshots  AOI queries and per-client delta encoding (sharded: split over the workers),
+               then the sends (always the gateway)
+
+Snapshots are most of the tick: every client gets its own delta of everyone
+near it, so they grow with clients x boats in view. Workers only make a tick
+faster with a free core each. On fewer cores, pickling the world to them
+makes it slower.
+"""
+
+import os
+#no window or audio device needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import math
+import random
+import time
+import uuid
+from config import *
+from game_server import GameServer
+from sharded_server import ShardedServer
+from relay_server import RelayClient
+
+
+def make_server(workers, tick_rate):
+    if workers == 0:
+        return GameServer(port=0, tick_rate=tick_rate)
+    return ShardedServer(port=0, tick_rate=tick_rate, workers=workers)
+
+
+def run(workers, boats, ticks, tick_rate, seed=1):
+    """Mean milliseconds per tick for (inputs, step, snapshots)."""
+    rng = random.Random(seed)
+    server = make_server(workers, tick_rate)
+    dt = 1.0 / tick_rate
+    now = time.time()
+    server.sim_time = now
+
+    #clients at closed local ports: sendto still does the work, nobody reads it
+    pids = []
+    for i in range(boats):
+        pid = str(uuid.uuid4())
+        addr = ("127.0.0.1", 20000 + i)
+        server.clients[addr] = RelayClient(addr, now)
+        server.players[pid] = {"player_id": pid, "player_name": f"Bot_{pid[:8]}",
+                               "x": rng.uniform(1.0, WORLD_WIDTH - 1.0), "y": rng.uniform(1.0, WORLD_HEIGHT - 1.0),
+                               "rotation": rng.uniform(0, 2 * math.pi), "updated_at": now}
+        server.player_addrs[pid] = addr
+        pids.append((pid, addr))
+
+    timings = [0.0, 0.0, 0.0]
+    seq = 0
+    try:
+        for tick in range(ticks):
+            now += dt
+            seq += 1
+
+            t0 = time.perf_counter()
+            for pid, addr in pids:
+                server._apply_inputs(pid, [(seq, dt, 1.0, rng.choice((-1.0, 0.0, 1.0)), False)], addr, now)
+            #keep about a quarter of the boats with a shot in the air (shots live CANNONBALL_LIFETIME)
+            for pid, addr in rng.sample(pids, max(1, int(boats / 4 / (CANNONBALL_LIFETIME * tick_rate)))):
+                row = server.players[pid]
+                angle = rng.uniform(0, 2 * math.pi)
+                server._add_cannonball({"id": str(uuid.uuid4()), "player_id": pid, "x": row["x"], "y": row["y"],
+                                        "rotation": row["rotation"], "velocity_x": math.cos(angle) * 1.2,
+                                        "velocity_y": math.sin(angle) * 1.2, "side": "left", "created_at": now})
+            t1 = time.perf_counter()
+            server.step(dt)
+            server.sim_time += dt
+            t2 = time.perf_counter()
+            server._send_states(now)
+            server._send_snapshots(now)
+            t3 = time.perf_counter()
+
+            if tick >= ticks // 5:  # skip the warm-up
+                timings[0] += t1 - t0
+                timings[1] += t2 - t1
+                timings[2] += t3 - t2
+    finally:
+        if workers:
+            server._stop_workers()
+        server.sock.close()
+    measured = ticks - ticks // 5
+    return [t / measured * 1000 for t in timings]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Boat Man Shooters sharded server benchmark")
+    parser.add_argument("--boats", type=int, default=100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4],
+                        help="worker counts to try (0: single-process game_server)")
+    parser.add_argument("--ticks", type=int, default=90)
+    parser.add_argument("--tick-rate", type=int, default=SERVER_TICK_RATE)
+    args = parser.parse_args()
+
+    budget = 1000.0 / args.tick_rate
+    print(f"📊 {args.boats} boats at {args.tick_rate} ticks/s ({budget:.1f}ms a tick), {os.cpu_count()} CPU(s)")
+    print(f"{'server':>10} {'inputs':>9} {'step':>9} {'snapshots':>10} {'total':>9}  speedup")
+    baseline = None
+    for workers in args.workers:
+        inputs, step, snapshots = run(workers, args.boats, args.ticks, args.tick_rate)
+        total = inputs + step + snapshots
+        baseline = baseline or total
+        label = "single" if workers == 0 else f"{workers} worker" + ("s" if workers > 1 else "")
+        print(f"{label:>10} {inputs:8.2f}ms {step:8.2f}ms {snapshots:9.2f}ms {total:8.2f}ms  {baseline / total:5.2f}x"
+              + ("" if total <= budget else "  (over the tick budget)"))
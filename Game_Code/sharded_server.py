@@ -0,0 +1,319 @@
+"""MULTI-PROCESS DEDICATED SERVER, ONE WORLD REGION PER CPU CORE
+
+The world is cut into vertical strips, each simulated by its own worker
+process (so by its own interpreter and GIL). The parent process is the
+gateway. It owns the UDP socket and health, and it forwards each client's
+inputs and shots to the worker whose strip they're in. Every tick it steps all
+workers at once over pipes and merges what they report back. Boats and shots
+that cross into another strip are handed to that strip's worker. Boats near a
+border are also sent to the neighbouring workers, so shots can hit across it.
+
+Snapshots are the biggest cost of a tick (one delta per client, of everyone
+near it), so they're encoded by the workers too. Each client's stream belongs
+to one worker, which gets the merged world every tick and hands back finished
+packets. What stays in the gateway is every datagram in and out, routing
+inputs and acks, and pickling the world to the workers: that's the ceiling
+once the workers have a core each. shard_benchmark.py measures all of it:
+
+    python sharded_server.py --workers 4 --port 7777
+
+Clients connect to it exactly as to game_server.py (BMS_TRANSPORT=udp).
+"""
+
+import argparse
+import multiprocessing
+import time
+from config import *
+from game_server import GameServer, Simulation
+from relay_server import RelayBoat, encode_snapshots
+import codec
+import movement
+
+#boats this close to a strip are mirrored into it: anything a shot there could hit,
+#including how far a sprinting boat moves in the longest lag-compensation rewind
+GHOST_MARGIN = HIT_RADIUS + 2.0 * LAG_COMP_MAX
+
+
+def strip_of(x, workers, width=WORLD_WIDTH):
+    """Index of the strip that owns world x (shots past the edges belong to the edge strips)."""
+    return max(0, min(workers - 1, int(x * workers / width)))
+
+
+class RegionWorker:
+    """The simulation of one strip, run inside a worker process."""
+
+    def __init__(self, index, workers, tick_rate):
+        self.index = index
+        self.workers = workers
+        self.sim = Simulation(tick_rate)
+        self.boats = {}  # player_id -> RelayBoat owned here
+        self.sunk = set()
+        self.encoders = {}  # (addr, joined) -> SnapshotEncoder, for the clients whose snapshots this worker encodes
+
+    def handle(self, msg):
+        """Apply one message from the gateway; returns the reply for "tick", else None."""
+        kind = msg[0]
+        if kind == "inputs":
+            _, pid, inputs = msg
+            boat = self.boats.get(pid)
+            if boat is not None:
+                self.sim.queue_inputs(pid, boat, inputs)
+        elif kind == "spawn":
+            _, pid, row, seq = msg
+            self.boats[pid] = RelayBoat(row, seq)
+        elif kind == "adopt":
+            _, pid, boat = msg
+            self.boats[pid] = boat
+        elif kind == "ball":
+            self.sim.add_ball(msg[1])
+        elif kind == "adopt_ball":
+            _, ball_id, entry = msg
+            self.sim.balls[ball_id] = entry
+        elif kind == "remove_ball":
+            self.sim.balls.pop(msg[1], None)
+        elif kind == "sunk":
+            self.sunk.add(msg[1])
+        elif kind == "leave":
+            self.boats.pop(msg[1], None)
+            self.sunk.discard(msg[1])
+            self.sim.remove_player(msg[1])
+        elif kind == "ack":
+            _, stream, seq = msg
+            encoder = self.encoders.get(stream)
+            if encoder is not None:
+                encoder.ack(seq)
+        elif kind == "tick":
+            _, now, dt, ghosts, rooms = msg
+            return self.step(now, dt, ghosts, rooms)
+        elif kind == "snapshots":
+            return self.snapshots(*msg[1:])
+        return None
+
+    def step(self, now, dt, ghosts, rooms):
+        afloat = dict(ghosts)
+        for pid, boat in self.boats.items():
+            if pid not in self.sunk:
+                afloat[pid] = (boat.state.x, boat.state.y)
+        #hit balls stay until the gateway accepts the hit (it sends "remove_ball"): it drops
+        #hits on boats already sunk this tick, and those balls fly on
+        hits, expired = self.sim.step(now, dt, afloat, rooms)
+        for ball_id in expired:
+            self.sim.balls.pop(ball_id, None)
+
+        #what moved here since the last tick, and the state its owner reconciles against
+        moved = {}
+        for pid, boat in self.boats.items():
+            if boat.dirty:
+                moved[pid] = (boat.seq, movement.get_state(boat.state))
+                boat.dirty = False
+
+        #hand over whatever left the strip
+        boat_handoffs = [(pid, boat) for pid, boat in self.boats.items()
+                         if strip_of(boat.state.x, self.workers) != self.index]
+        for pid, boat in boat_handoffs:
+            del self.boats[pid]
+        hit_balls = {ball_id for ball_id, shooter, target in hits}
+        ball_handoffs = [(ball_id, entry) for ball_id, entry in self.sim.balls.items()
+                         if ball_id not in hit_balls and strip_of(entry[0].x, self.workers) != self.index]
+        for ball_id, entry in ball_handoffs:
+            del self.sim.balls[ball_id]
+
+        return ("tock", moved, hits, expired, boat_handoffs, ball_handoffs)
+
+
+    def snapshots(self, now, clients, players, rooms_of, owners, cannonballs):
+        """Encode this worker's share of the snapshots: clients is [(addr, joined, room)].
+        Streams that aren't listed any more (gone, or restarted by a hello) are forgotten."""
+        encoders = {}
+        for addr, joined, room in clients:
+            encoders[(addr, joined)] = self.encoders.get((addr, joined)) or codec.SnapshotEncoder()
+        self.encoders = encoders
+        share = [(addr, room, encoders[(addr, joined)]) for addr, joined, room in clients]
+        return ("packets", encode_snapshots(share, players, rooms_of, owners, cannonballs, now))
+
+
+def run_worker(conn, index, workers, tick_rate):
+    """Worker process main loop: one message in, at most one reply out."""
+    worker = RegionWorker(index, workers, tick_rate)
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg[0] == "stop":
+            break
+        reply = worker.handle(msg)
+        if reply is not None:
+            conn.send(reply)
+    conn.close()
+
+
+class ShardedServer(GameServer):
+    """GameServer whose simulation is spread over worker processes by world strip."""
+
+    def __init__(self, host=RELAY_HOST, port=RELAY_PORT, tick_rate=SERVER_TICK_RATE, workers=SHARD_WORKERS):
+        super().__init__(host, port, tick_rate)
+        self.sim = None  # the workers simulate
+        self.workers = workers
+        self.conns = []
+        self.processes = []
+        for index in range(workers):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=run_worker, args=(child, index, workers, tick_rate), daemon=True)
+            process.start()
+            child.close()
+            self.conns.append(parent)
+            self.processes.append(process)
+        self._states = []  # (player_id, seq, state) to send owners this tick
+        self._hit_workers = {}  # ball_id -> index of the worker that reported its hit, this tick
+
+        #counters
+        self.boat_handoffs = 0
+        self.ball_handoffs = 0
+        self.step_time = 0.0
+
+    def serve_forever(self):
+        try:
+            super().serve_forever()
+        finally:
+            self._stop_workers()
+
+    def _stop_workers(self):
+        for conn in self.conns:
+            try:
+                conn.send(("stop",))
+            except (OSError, BrokenPipeError):
+                pass
+        for process in self.processes:
+            process.join(timeout=2.0)
+        self.conns = []
+        self.processes = []
+
+    #routing (boats here maps player_id -> index of the worker simulating it)
+    def _apply_inputs(self, player_id, inputs, addr, now):
+        owner = self.boats.get(player_id)
+        if owner is None:
+            row = self.players.get(player_id)
+            if row is None or not inputs:
+                return  # no spawn position yet, the client keeps sending it until we answer
+            #the client sends its position right before the batch, so that already includes these inputs
+            owner = self.boats[player_id] = strip_of(float(row["x"]), self.workers)
+            self.conns[owner].send(("spawn", player_id, row, inputs[-1][0]))
+        else:
+            self.conns[owner].send(("inputs", player_id, inputs))
+        self.player_addrs[player_id] = addr
+
+    def _add_cannonball(self, row):
+        if row["id"] in self.cannonballs or not self._afloat(row["player_id"]):
+            return  # a resend, or fired by a sunk boat
+        self.cannonballs[row["id"]] = row
+        self.conns[strip_of(float(row["x"]), self.workers)].send(("ball", row))
+
+    def _remove_ball(self, ball_id):
+        self.cannonballs.pop(ball_id, None)
+
+    def _remove_player(self, player_id):
+        super(GameServer, self)._remove_player(player_id)
+        self.health.pop(player_id, None)
+        for conn in self.conns:
+            conn.send(("leave", player_id))
+
+    def _hit(self, ball_id, shooter, target):
+        super()._hit(ball_id, shooter, target)
+        self.conns[self._hit_workers[ball_id]].send(("remove_ball", ball_id))
+        owner = self.boats.get(target)
+        if self.health[target] == 0 and owner is not None:
+            self.conns[owner].send(("sunk", target))
+
+    def step(self, dt):
+        """One tick: every worker steps its strip in parallel, then their reports are merged."""
+        started = time.perf_counter()
+        self.tick_count += 1
+        now = self.sim_time + dt
+        afloat = self._afloat_positions()
+        rooms = self._player_rooms()
+
+        strip_width = WORLD_WIDTH / self.workers
+        for index, conn in enumerate(self.conns):
+            low = index * strip_width - GHOST_MARGIN
+            high = (index + 1) * strip_width + GHOST_MARGIN
+            ghosts = {pid: xy for pid, xy in afloat.items()
+                      if self.boats.get(pid) != index and low <= xy[0] <= high}
+            conn.send(("tick", now, dt, ghosts, rooms))
+
+        hits = []
+        boat_handoffs = []
+        ball_handoffs = []
+        self._hit_workers = {}
+        for index, conn in enumerate(self.conns):
+            _, moved, strip_hits, expired, boats, balls = conn.recv()
+            for pid, (seq, state) in moved.items():
+                row = self.players.get(pid)
+                if row is None:
+                    continue  # left while the worker was stepping
+                self.players[pid] = dict(row, x=state["x"], y=state["y"], rotation=state["rotation"], updated_at=now)
+                self._states.append((pid, seq, state))
+            hits.extend(strip_hits)
+            for ball_id, shooter, target in strip_hits:
+                self._hit_workers[ball_id] = index
+            for ball_id in expired:
+                self._remove_ball(ball_id)
+            boat_handoffs.extend(boats)
+            ball_handoffs.extend(balls)
+
+        self._apply_hits(hits)
+        for pid, boat in boat_handoffs:
+            if pid not in self.boats:
+                continue  # left
+            owner = self.boats[pid] = strip_of(boat.state.x, self.workers)
+            self.conns[owner].send(("adopt", pid, boat))
+            self.boat_handoffs += 1
+        for ball_id, entry in ball_handoffs:
+            if ball_id not in self.cannonballs:
+                continue  # hit or removed with its owner
+            self.conns[strip_of(entry[0].x, self.workers)].send(("adopt_ball", ball_id, entry))
+            self.ball_handoffs += 1
+        self.step_time = time.perf_counter() - started
+
+    #snapshots: each client's stream is encoded by one worker, picked by its address
+    def _snapshot_worker(self, addr):
+        return hash(addr) % self.workers
+
+    def _ack(self, client, seq):
+        self.conns[self._snapshot_worker(client.addr)].send(("ack", (client.addr, client.joined), seq))
+
+    def _send_snapshots(self, now):
+        """The workers encode the snapshots (AOI queries and deltas) in parallel; the gateway sends them."""
+        players, rooms_of, owners, cannonballs = self._snapshot_inputs(now)
+        shares = [[] for _ in self.conns]
+        for client in list(self.clients.values()):
+            shares[self._snapshot_worker(client.addr)].append((client.addr, client.joined, client.room))
+        for conn, share in zip(self.conns, shares):
+            conn.send(("snapshots", now, share, players, rooms_of, owners, cannonballs))
+        for conn in self.conns:
+            _, packets = conn.recv()
+            for addr, packet in packets:
+                self._send_raw(packet, addr)
+
+    def _send_states(self, now):
+        for pid, seq, state in self._states:
+            addr = self.player_addrs.get(pid)
+            if addr is not None:
+                self._send_raw(codec.encode_state(pid, seq, state, now), addr)
+        self._states = []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Boat Man Shooters sharded dedicated server")
+    parser.add_argument("--host", default=RELAY_HOST)
+    parser.add_argument("--port", type=int, default=RELAY_PORT)
+    parser.add_argument("--tick-rate", type=int, default=SERVER_TICK_RATE)
+    parser.add_argument("--workers", type=int, default=SHARD_WORKERS)
+    args = parser.parse_args()
+
+    server = ShardedServer(args.host, args.port, args.tick_rate, args.workers)
+    print(f"⚓ Simulating {WORLD_WIDTH:g}x{WORLD_HEIGHT:g} in {args.workers} strips at {args.tick_rate} ticks/s")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Server stopped")
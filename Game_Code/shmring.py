@@ -0,0 +1,124 @@
+"""Memory-mapped ring files: how clients on one machine swap updates without sockets.
+
+Every client owns one ring file and is its only writer; everyone else maps
+it read-only and follows along. Nobody has to lock anything. A record is
+stamped with its sequence number only after its bytes are in place, and a
+reader that sees the stamp change while it copies (the writer lapped it)
+drops that record.
+
+    header: magic, version, slots, slot size, records written, last write time
+    slot:   stamp (sequence number + 1, 0 while empty or being written), length, bytes
+"""
+
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b"BMSR"
+VERSION = 1
+_HEADER = struct.Struct("<4sIIIQd")
+_HEAD_OFFSET = 16  # records written (u64) inside the header
+_SLOT = struct.Struct("<QH")
+
+
+class RingError(Exception):
+    pass
+
+
+class Ring:
+    """One ring file, mapped for writing (create) or reading (open)."""
+
+    def __init__(self, path, mm, slots, slot_size, writable):
+        self.path = path
+        self.mm = mm
+        self.slots = slots
+        self.slot_size = slot_size
+        self.writable = writable
+        self.next = 0  # reader: next record to read / writer: next record to write
+
+        #counters
+        self.records = 0
+        self.dropped = 0  # reader fell more than a whole ring behind
+
+    @classmethod
+    def create(cls, path, slots, slot_size):
+        size = _HEADER.size + slots * slot_size
+        with open(path, "wb") as f:
+            f.truncate(size)
+        with open(path, "r+b") as f:
+            mm = mmap.mmap(f.fileno(), size)
+        mm[:_HEADER.size] = _HEADER.pack(MAGIC, VERSION, slots, slot_size, 0, time.time())
+        return cls(path, mm, slots, slot_size, writable=True)
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise RingError(f"{path} is not a ring")
+            mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        magic, version, slots, slot_size, head, written = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION or size < _HEADER.size + slots * slot_size:
+            mm.close()
+            raise RingError(f"{path} is not a ring")
+        ring = cls(path, mm, slots, slot_size, writable=False)
+        ring.next = head  # only what's written from now on
+        return ring
+
+    @property
+    def head(self):
+        return struct.unpack_from("<Q", self.mm, _HEAD_OFFSET)[0]
+
+    @property
+    def last_write(self):
+        return _HEADER.unpack_from(self.mm, 0)[5]
+
+    def write(self, data):
+        """Append one record (at most slot size minus its small header)."""
+        if len(data) > self.slot_size - _SLOT.size:
+            raise RingError(f"record of {len(data)} bytes doesn't fit a {self.slot_size} byte slot")
+        n = self.next
+        offset = _HEADER.size + (n % self.slots) * self.slot_size
+        _SLOT.pack_into(self.mm, offset, 0, len(data))  # mark it as being written
+        self.mm[offset + _SLOT.size:offset + _SLOT.size + len(data)] = data
+        _SLOT.pack_into(self.mm, offset, n + 1, len(data))
+        self.next = n + 1
+        struct.pack_into("<Qd", self.mm, _HEAD_OFFSET, self.next, time.time())
+        self.records += 1
+
+    def pending(self):
+        return self.head != self.next
+
+    def read(self):
+        """Every record written since the last call, oldest first."""
+        head = self.head
+        if head - self.next > self.slots:
+            #the writer lapped us: the oldest records are gone
+            self.dropped += head - self.next - self.slots
+            self.next = head - self.slots
+        records = []
+        for n in range(self.next, head):
+            offset = _HEADER.size + (n % self.slots) * self.slot_size
+            stamp, length = _SLOT.unpack_from(self.mm, offset)
+            if stamp != n + 1:
+                continue
+            data = self.mm[offset + _SLOT.size:offset + _SLOT.size + length]
+            if _SLOT.unpack_from(self.mm, offset)[0] != stamp:
+                self.dropped += 1  # overwritten while we copied it
+                continue
+            records.append(data)
+        self.records += len(records)
+        self.next = head
+        return records
+
+    def close(self, unlink=False):
+        try:
+            self.mm.close()
+        except (BufferError, ValueError):
+            pass
+        if unlink:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
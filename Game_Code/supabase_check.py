@@ -0,0 +1,160 @@
+"""CHECKS WHAT SupabaseTransport ASKS FOR AGAINST local_supabase.py, NO supabase PACKAGE NEEDED
+
+Run with `python supabase_check.py`. supabase-py's query builder only turns
+each call chain into one PostgREST request, so this sends those requests
+itself over plain HTTP, in the shape the builder puts on the wire, to a
+local_supabase.py it starts here, and checks the answers the transport relies
+on. The world_snapshot arguments and the Realtime subscription are the
+transport's own code (SupabaseTransport._world_params and _subscribe).
+
+It doesn't run supabase-py itself, or the SQL functions on a real project.
+"""
+
+import json
+import time
+import urllib.error
+import urllib.request
+import uuid
+from urllib.parse import urlencode
+from config import *
+import aoi
+from local_supabase import LocalSupabase
+from transport import SupabaseTransport, _iso, _epoch
+
+ROOM = "check"
+
+
+class Rest:
+    """The PostgREST requests supabase-py sends, made with urllib."""
+
+    def __init__(self, url, key):
+        self.url = url
+        self.key = key
+        self.requests = 0
+
+    def send(self, method, path, params=(), body=None, prefer=None):
+        """(status, decoded body). PostgREST errors raise AssertionError with their message."""
+        url = f"{self.url}/rest/v1/{path}" + (f"?{urlencode(params)}" if params else "")
+        headers = {"apikey": self.key, "Authorization": f"Bearer {self.key}", "Content-Type": "application/json"}
+        if prefer:
+            headers["Prefer"] = prefer
+        data = None if body is None else json.dumps(body).encode()
+        self.requests += 1
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data, headers, method=method)) as resp:
+                raw = resp.read()
+                return resp.status, json.loads(raw) if raw else None
+        except urllib.error.HTTPError as e:
+            raise AssertionError(f"{method} {path} {params}: {e.code} {e.read().decode()}")
+
+
+def check_rest(rest, transport):
+    now = time.time()
+    me, other = str(uuid.uuid4()), str(uuid.uuid4())
+    x, y = WORLD_WIDTH / 2, WORLD_HEIGHT / 2
+    bounds = aoi.bounds_around(x, y)
+
+    #connect(): table("players").select("count", count="exact").limit(1)
+    status, rows = rest.send("GET", "players", [("select", "count"), ("limit", "1")], prefer="count=exact")
+    assert status == 200 and "count" in rows[0], "connection test"
+
+    #probe_clock(): rpc("server_time")
+    _, server = rest.send("POST", "rpc/server_time", body={})
+    assert abs(float(server) - time.time()) < 1.0, "server_time"
+
+    #upsert_player(): table("players").upsert(row, on_conflict="player_id"), with the room and cell columns
+    for pid, px, ts in ((me, x, now), (other, x + 0.5, now + 0.05), (other, x + 0.6, now + 0.1)):
+        row = {"player_id": pid, "player_name": pid[:8], "x": px, "y": y, "rotation": 0.0, "updated_at": ts,
+               "cell": aoi.cell_key(px, y), "room": ROOM}
+        status, _ = rest.send("POST", "players", [("on_conflict", "player_id")], [row],
+                              prefer="return=representation,resolution=merge-duplicates")
+        assert status == 201, "upsert"
+
+    #fetch_players(): select("*").eq("room").gt("updated_at").in_("cell").gte/lte x and y .order("updated_at")
+    min_x, min_y, max_x, max_y = bounds
+    cells = ",".join(str(c) for c in aoi.cell_keys_in_bounds(bounds))
+    _, rows = rest.send("GET", "players", [
+        ("select", "*"), ("room", f"eq.{ROOM}"), ("updated_at", f"gt.{now + 0.01}"), ("cell", f"in.({cells})"),
+        ("x", f"gte.{min_x}"), ("x", f"lte.{max_x}"), ("y", f"gte.{min_y}"), ("y", f"lte.{max_y}"),
+        ("order", "updated_at")])
+    assert [row["player_id"] for row in rows] == [other] and rows[0]["x"] == x + 0.6, "incremental player fetch"
+
+    #insert_cannonballs(): table("cannonballs").insert([...]) with ISO created_at
+    shots = [{"id": str(uuid.uuid4()), "player_id": pid, "x": x, "y": y, "rotation": 0.0, "velocity_x": 1.0,
+              "velocity_y": 0.0, "side": "left", "created_at": _iso(now + i * 0.01), "room": ROOM}
+             for i, pid in enumerate((me, other))]
+    status, rows = rest.send("POST", "cannonballs", body=shots, prefer="return=representation")
+    assert status == 201 and len(rows) == 2, "cannonball insert"
+    assert abs(_epoch(rows[0]["created_at"]) - now) < 1e-3, "created_at round trip"
+
+    #fetch_cannonballs(): select("*").eq("room").gte("created_at", iso).neq("player_id").order("created_at")
+    _, rows = rest.send("GET", "cannonballs", [
+        ("select", "*"), ("room", f"eq.{ROOM}"), ("created_at", f"gte.{_iso(now - 1.0)}"),
+        ("player_id", f"neq.{me}"), ("order", "created_at")])
+    assert [row["player_id"] for row in rows] == [other], "cannonball fetch"
+
+    #fetch_world(): rpc("world_snapshot", SupabaseTransport._world_params(...))
+    params = transport._world_params(now + 0.01, now - 1.0, bounds, me)
+    if not ROOM_COLUMN:
+        params["room"] = ROOM  # the other rooms' rows aren't ours to check
+    _, world = rest.send("POST", "rpc/world_snapshot", body=params)
+    assert [row["player_id"] for row in world["players"]] == [other], "world_snapshot players"
+    assert [row["player_id"] for row in world["cannonballs"]] == [other], "world_snapshot cannonballs"
+    assert isinstance(world["tick"], int), "world_snapshot tick"
+
+    #list_rooms(): select("room").gt("updated_at")
+    _, rows = rest.send("GET", "players", [("select", "room"), ("updated_at", f"gt.{now - ROOM_ACTIVE_WINDOW}")])
+    assert rows and all(set(row) == {"room"} for row in rows), "room directory"
+
+    #chat: insert, select, delete().neq("id", nil uuid)
+    rest.send("POST", "chat", body={"player_name": "check", "message": "hi"}, prefer="return=representation")
+    _, rows = rest.send("GET", "chat", [("select", "*")])
+    assert any(row["message"] == "hi" for row in rows), "chat insert"
+    rest.send("DELETE", "chat", [("id", "neq.00000000-0000-0000-0000-000000000000")], prefer="return=representation")
+    assert rest.send("GET", "chat", [("select", "*")])[1] == [], "chat clear"
+
+    #delete_player(): delete().eq("player_id") on both tables
+    for pid in (me, other):
+        rest.send("DELETE", "players", [("player_id", f"eq.{pid}")], prefer="return=representation")
+        rest.send("DELETE", "cannonballs", [("player_id", f"eq.{pid}")], prefer="return=representation")
+    _, rows = rest.send("GET", "players", [("select", "*"), ("room", f"eq.{ROOM}")])
+    assert rows == [], "player delete"
+
+
+def check_realtime(rest, transport):
+    """SupabaseTransport's own subscription, fed by REST writes."""
+    transport._subscribe()
+    assert transport._subscribed(), "realtime subscribe"
+    now = time.time()
+    pid = str(uuid.uuid4())
+    rest.send("POST", "players", [("on_conflict", "player_id")],
+              [{"player_id": pid, "x": 3.0, "y": 3.0, "rotation": 0.0, "updated_at": now, "room": transport.room}],
+              prefer="return=representation,resolution=merge-duplicates")
+    rest.send("POST", "cannonballs", body=[{"id": str(uuid.uuid4()), "player_id": pid, "x": 3.0, "y": 3.0,
+                                            "rotation": 0.0, "velocity_x": 1.0, "velocity_y": 0.0, "side": "left",
+                                            "created_at": _iso(now), "room": transport.room}])
+    deadline = time.time() + 2.0
+    world = None
+    while time.time() < deadline:
+        world = transport.fetch_world(now - 1.0, now - 1.0)
+        if world.players and world.cannonballs:
+            break
+        time.sleep(0.02)
+    assert [row["player_id"] for row in world.players] == [pid], "realtime player change"
+    assert abs(world.cannonballs[0]["created_at"] - now) < 1e-3, "realtime created_at as epoch seconds"
+    rest.send("DELETE", "cannonballs", [("player_id", f"eq.{pid}")])
+    rest.send("DELETE", "players", [("player_id", f"eq.{pid}")])
+    transport.close()
+
+
+if __name__ == "__main__":
+    server = LocalSupabase(port=0).start()
+    rest = Rest(server.url, SUPABASE_KEY)
+    transport = SupabaseTransport(server.url, SUPABASE_KEY, room=ROOM)
+    try:
+        check_rest(rest, transport)
+        print(f"✅ REST requests answered as expected ({rest.requests} requests)")
+        check_realtime(rest, transport)
+        print("✅ Realtime subscription delivered the changes")
+    finally:
+        server.stop()
@@ -0,0 +1,283 @@
+"""NETWORK TELEMETRY: COUNTERS AND HISTOGRAMS FOR EVERYTHING THAT CROSSES THE WIRE
+
+NetworkManager wraps its transport in a MeteredTransport, which times every
+call per endpoint and counts the rows that come back and how late they were.
+NetworkManager.stats() adds the rest (bytes, queues, reconnects, sample ages).
+With BMS_TELEMETRY_FILE set, a line of JSON with the numbers for the last
+TELEMETRY_INTERVAL seconds, including frame times, is appended there so
+hitches can be lined up with network stalls afterwards. F3 in game shows the
+live numbers.
+"""
+
+import json
+import math
+import time
+from threading import Thread, Lock
+from config import *
+
+#transport calls worth timing; anything else passes straight through
+ENDPOINTS = (
+    "connect", "probe_clock",
+    "upsert_player", "send_inputs", "delete_player",
+    "fetch_world", "fetch_players", "fetch_cannonballs", "fetch_authoritative_state", "fetch_hits",
+    "insert_cannonball", "insert_cannonballs",
+    "insert_chat", "fetch_chats", "delete_chats", "list_rooms",
+)
+
+
+class Histogram:
+    """Log-bucketed histogram of durations (seconds), cheap enough to feed every sample."""
+
+    LOW = 1e-4
+    RATIO = 1.1
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        value = max(value, 0.0)
+        i = 0 if value <= self.LOW else int(math.log(value / self.LOW, self.RATIO)) + 1
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for i, n in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        """Upper edge of the bucket holding the p-th percentile (0 with no samples)."""
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen >= rank:
+                return min(self.LOW * self.RATIO ** i, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+    def to_dict(self):
+        return {"buckets": self.buckets, "count": self.count, "total": self.total, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls()
+        hist.buckets = {int(i): n for i, n in data["buckets"].items()}
+        hist.count, hist.total, hist.max = data["count"], data["total"], data["max"]
+        return hist
+
+
+class Telemetry:
+    """Counters and histograms, kept both since the start and for the current window.
+
+    Anything can record from any thread. snapshot() reads the totals; roll()
+    reads the window and starts a new one (the JSON-lines dump uses it).
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.started = time.time()
+        self._window_started = self.started
+        self._counters = {}
+        self._window_counters = {}
+        self._histograms = {}  # name -> (since start, this window)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+            self._window_counters[name] = self._window_counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        with self._lock:
+            pair = self._histograms.get(name)
+            if pair is None:
+                pair = self._histograms[name] = (Histogram(), Histogram())
+            pair[0].add(value)
+            pair[1].add(value)
+
+    def call(self, endpoint, seconds, ok=True):
+        """One transport call: its round trip goes in the endpoint's histogram."""
+        self.observe(f"rtt.{endpoint}", seconds)
+        if not ok:
+            self.count(f"errors.{endpoint}")
+
+    def histogram(self, name):
+        """A copy of a histogram since the start, merged with any below it ("rtt" is every rtt.<endpoint>)."""
+        with self._lock:
+            hist = Histogram()
+            for key, (total, _) in self._histograms.items():
+                if key == name or key.startswith(name + "."):
+                    hist.merge(total)
+            return hist
+
+    def _read(self, window):
+        i = 1 if window else 0
+        counters = dict(self._window_counters if window else self._counters)
+        histograms = {name: pair[i].summary() for name, pair in self._histograms.items()}
+        endpoints = {}
+        for name, summary in list(histograms.items()):
+            if name.startswith("rtt."):
+                endpoint = name[4:]
+                del histograms[name]
+                endpoints[endpoint] = dict(summary, errors=counters.pop(f"errors.{endpoint}", 0))
+        return {"counters": counters, "histograms": histograms, "endpoints": endpoints}
+
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            data = self._read(window=False)
+        data["seconds"] = now - self.started
+        return data
+
+    def roll(self, now=None):
+        """The window so far, then start a new one."""
+        now = time.time() if now is None else now
+        with self._lock:
+            data = self._read(window=True)
+            self._window_counters = {}
+            self._histograms = {name: (total, Histogram()) for name, (total, _) in self._histograms.items()}
+            data["seconds"] = now - self._window_started
+            self._window_started = now
+        return data
+
+
+class MeteredTransport:
+    """Wraps a transport and reports every call to a Telemetry. Everything else passes straight on."""
+
+    def __init__(self, transport, telemetry):
+        self.inner = transport
+        self.telemetry = telemetry
+        self.clock = None  # a ClockSync, to turn backend timestamps into local time
+        self._newest = {}  # player id -> newest sample timestamp already timed
+        self._seen_shots = {}  # cannonball id -> when it arrived
+
+    def __getattr__(self, name):
+        attr = getattr(self.inner, name)
+        if name not in ENDPOINTS:
+            return attr
+
+        def timed(*args, **kwargs):
+            t0 = time.time()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception:
+                self.telemetry.call(name, time.time() - t0, ok=False)
+                raise
+            self.telemetry.call(name, time.time() - t0)
+            if name == "fetch_world":
+                self._received(result.players, result.cannonballs)
+            elif name == "fetch_players":
+                self._received(players=result)
+            elif name == "fetch_cannonballs":
+                self._received(cannonballs=result)
+            return result
+        return timed
+
+    def _age(self, row, column, now):
+        try:
+            ts = float(row[column])
+        except (KeyError, TypeError, ValueError):
+            return None  # no timestamp, or an ISO string the transport didn't convert
+        return now - (self.clock.to_local(ts) if self.clock else ts)
+
+    def _received(self, players=(), cannonballs=()):
+        #only the first time a sample shows up counts: fetch windows overlap and caches repeat rows
+        now = time.time()
+        telemetry = self.telemetry
+        telemetry.count("rows_received", len(players) + len(cannonballs))
+        for row in players:
+            age = self._age(row, "updated_at", now)
+            pid = row.get("player_id")
+            if age is not None and float(row["updated_at"]) > self._newest.get(pid, -math.inf):
+                self._newest[pid] = float(row["updated_at"])
+                telemetry.observe("sample_delay", age)
+        for row in cannonballs:
+            if row.get("id") in self._seen_shots:
+                continue
+            self._seen_shots[row.get("id")] = now
+            age = self._age(row, "created_at", now)
+            if age is not None:
+                telemetry.observe("shot_delay", age)
+        if len(self._seen_shots) > 4096:
+            #forget shots long gone so this doesn't grow for the whole run
+            cutoff = now - 2 * CANNONBALL_SYNC_WINDOW
+            self._seen_shots = {k: t for k, t in self._seen_shots.items() if t > cutoff}
+        if len(self._newest) > 4096:
+            self._newest = {}
+
+
+class TelemetryDump:
+    """Appends one JSON line per interval to path: stats(window=True) of whatever it's given."""
+
+    def __init__(self, stats, path=TELEMETRY_FILE, interval=TELEMETRY_INTERVAL):
+        self.stats = stats
+        self.path = path
+        self.interval = interval
+        self.running = True
+        self.lines = 0
+        Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        print(f"📈 Writing network telemetry to {self.path} every {self.interval:.0f}s")
+        next_dump = time.time() + self.interval
+        while self.running:
+            time.sleep(max(0.0, next_dump - time.time()))
+            next_dump += self.interval
+            if self.running:
+                self.dump()
+
+    def dump(self):
+        try:
+            line = json.dumps(self.stats(window=True), separators=(",", ":"), default=str)
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+            self.lines += 1
+        except Exception as e:
+            print(f"❌ Telemetry dump failed: {e}")
+
+    def stop(self):
+        #one last line for the time since the previous one
+        if self.running:
+            self.running = False
+            self.dump()
+
+
+def overlay_lines(stats):
+    """A few short lines of text for the in-game overlay."""
+    ms = lambda seconds: f"{seconds * 1000:.0f}ms"
+    counters = stats.get("counters", {})
+    lines = [f"{stats.get('transport', '?')}  {'online' if stats.get('connected') else 'OFFLINE'}  "
+             f"reconnects {counters.get('reconnects', 0)}  clock rtt {ms(stats.get('clock', {}).get('rtt') or 0.0)}"]
+    seconds = max(stats.get("seconds", 0.0), 1e-9)
+    lines.append(f"in {stats.get('bytes_received', 0) / seconds / 1024:.1f} KB/s  "
+                 f"{counters.get('rows_received', 0) / seconds:.0f} rows/s  "
+                 f"send queue {sum(stats.get('send_queue', {}).values())}")
+    for endpoint, hist in sorted(stats.get("endpoints", {}).items(), key=lambda item: -item[1]["count"])[:5]:
+        lines.append(f"{endpoint}: p50 {ms(hist['p50'])}  p99 {ms(hist['p99'])}  max {ms(hist['max'])}"
+                     + (f"  errors {hist['errors']}" if hist["errors"] else ""))
+    for name in ("sample_delay", "shot_delay", "frame_time"):
+        hist = stats.get("histograms", {}).get(name)
+        if hist:
+            lines.append(f"{name.replace('_', ' ')}: p50 {ms(hist['p50'])}  p99 {ms(hist['p99'])}  max {ms(hist['max'])}")
+    ages = stats.get("sample_age", {})
+    if ages:
+        lines.append(f"newest sample age: {ms(min(ages.values()))} .. {ms(max(ages.values()))} over {len(ages)} boats")
+    return lines
@@ -0,0 +1,977 @@
+import asyncio
+import json
+import os
+import re
+import select
+import socket
+import time
+import uuid
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+from threading import Lock, Event
+from config import *
+import aoi
+import changefeed
+import codec
+import rooms
+import shmring
+
+#one consistent read of the world: players and cannonballs changed since the
+#cursors, and cannonballs removed since the last call, as of backend tick `tick`
+WorldDelta = namedtuple("WorldDelta", ["tick", "players", "cannonballs", "removed"])
+
+
+class Transport:
+    """Base class for the backends NetworkManager can talk to."""
+
+    name = "base"
+    #calls wait on the network, so the asyncio engine runs them on a worker thread
+    blocking = True
+    #the backend runs boat movement itself (send_inputs / fetch_authoritative_state)
+    authoritative = False
+    #the backend decides who got hit (fetch_hits); known once connected
+    owns_hits = False
+    #players and cannonballs are only shared within this room
+    room = ROOM
+    #the backend pushes changes into a local copy, so fetches cost nothing and can run as often as we like
+    push = False
+    #updates travel as datagrams, which can be lost, duplicated or reordered (not over a stream)
+    datagrams = False
+    #raw bytes received so far (telemetry)
+    bytes_in = 0
+
+    def connect(self):
+        """Open the connection. Raise if the backend can't be reached."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    #asyncio engine
+    async def call(self, fn, *args):
+        """Run fn(*args), a call into this transport, without stalling the event loop."""
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def wait_for_data(self, timeout):
+        """Wait until there may be something new to fetch. Polled backends just sleep out the interval."""
+        await asyncio.sleep(timeout)
+        return False
+
+    #clock
+    def probe_clock(self):
+        """Measure the backend clock once. Returns a (t0, t1, t2, t3) sample for clock.ClockSync, or None."""
+        return None
+
+    #players
+    def upsert_player(self, data):
+        raise NotImplementedError
+
+    def fetch_players(self, since, bounds=None):
+        """Return player rows with updated_at > since, oldest first.
+
+        bounds, if given, is an (min_x, min_y, max_x, max_y) box from
+        aoi.bounds_around; only players inside it are returned.
+        """
+        raise NotImplementedError
+
+    def delete_player(self, player_id):
+        """Remove a player's row and any cannonballs they fired."""
+        raise NotImplementedError
+
+    def fetch_world(self, player_since, cannonball_since, bounds=None, exclude_player_id=None):
+        """fetch_players and fetch_cannonballs in one go, as a WorldDelta.
+
+        Backends that can answer both in one request override this; the default
+        makes the two fetches and has no tick (None).
+        """
+        return WorldDelta(None, self.fetch_players(player_since, bounds),
+                          self.fetch_cannonballs(cannonball_since, exclude_player_id), ())
+
+    #authoritative movement
+    def send_inputs(self, player_id, inputs):
+        """Send movement.BoatInput entries (oldest first) for the backend to simulate."""
+        raise NotImplementedError
+
+    def fetch_authoritative_state(self):
+        """(last input seq applied, movement state dict) for our boat, or None if nothing new."""
+        return None
+
+    def fetch_hits(self):
+        """Hit messages ({"ball", "shooter", "target", "health"}) since the last call."""
+        return []
+
+    #rooms
+    def list_rooms(self):
+        """{room: players} for the rooms with someone in them (on this backend)."""
+        return {}
+
+    #cannonballs
+    def insert_cannonball(self, data):
+        """Send one cannonball and return the stored row (or None)."""
+        raise NotImplementedError
+
+    def insert_cannonballs(self, rows):
+        """Send a batch of cannonballs. Backends that can bulk insert override this."""
+        return [self.insert_cannonball(row) for row in rows]
+
+    def fetch_cannonballs(self, since, exclude_player_id=None):
+        """Return cannonball rows created at or after since (epoch seconds), oldest first.
+
+        created_at comes back as epoch seconds whatever the backend stores.
+        """
+        raise NotImplementedError
+
+    #chat
+    def insert_chat(self, data):
+        raise NotImplementedError
+
+    def fetch_chats(self):
+        raise NotImplementedError
+
+    def delete_chats(self):
+        raise NotImplementedError
+
+
+def _cache_world(cache, player_since, cannonball_since, bounds=None, exclude_player_id=None):
+    """fetch_world answered from a changefeed.ChangeCache (no tick: changes arrive one by one)."""
+    return WorldDelta(None, cache.players_since(player_since, bounds),
+                      cache.cannonballs_since(cannonball_since, exclude_player_id), cache.take_removed())
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _epoch(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    return float(value)
+
+
+class SupabaseTransport(Transport):
+    """Talks to the hosted Supabase tables over HTTP (the original backend)."""
+
+    name = "supabase"
+
+    def __init__(self, url=SUPABASE_URL, key=SUPABASE_KEY, room=ROOM):
+        self.url = url
+        self.key = key
+        self.room = rooms.clean_room(room)
+        self.client = None
+        self._no_server_time = False
+        self._no_world_snapshot = False
+        self.feed = None  # Realtime subscription (SUPABASE_SUBSCRIBE)
+        self.cache = changefeed.ChangeCache()
+        self._bytes_in = 0  # REST responses, plus what earlier subscriptions received
+
+    def connect(self):
+        if not self.client:
+            from supabase import create_client
+            print(f"🔗 Connecting to Supabase...")
+            self.client = create_client(self.url, self.key)
+
+        # Test connection
+        self.client.table("players").select("count", count="exact").limit(1).execute()
+
+        if SUPABASE_SUBSCRIBE and not (self.feed and self.feed.alive):
+            self._subscribe()
+
+    def _subscribe(self):
+        #the tables must be in the supabase_realtime publication for changes to come through
+        url = self.url.replace("https://", "wss://").replace("http://", "ws://")
+        room_filter = f"room=eq.{self.room}" if ROOM_COLUMN else None
+        self.cache = changefeed.ChangeCache()
+        self.feed = changefeed.ChangeFeed(
+            f"{url}/realtime/v1/websocket?apikey={self.key}&vsn=1.0.0",
+            ("players", "cannonballs"), self._on_change,
+            filters={"players": room_filter, "cannonballs": room_filter}, token=self.key)
+        try:
+            self.feed.connect()
+        except Exception as e:
+            print(f"⚠️  Realtime subscription failed, polling instead: {e}")
+            self._drop_feed()
+            return
+        self.push = True
+        print("📡 Subscribed to player and cannonball changes")
+
+    def _on_change(self, change):
+        if change.table == "cannonballs" and change.record.get("created_at") is not None:
+            change.record["created_at"] = _epoch(change.record["created_at"])
+        self.cache.apply(change)
+
+    def _subscribed(self):
+        """True while reads come from the Realtime cache (falls back to polling if the socket drops)."""
+        if self.feed is None:
+            return False
+        if not self.feed.alive:
+            print("⚠️  Realtime subscription lost, polling until the next reconnect")
+            self._drop_feed()
+            self.push = False
+            return False
+        return True
+
+    def close(self):
+        if self.feed is not None:
+            self.feed.close()
+            self._drop_feed()
+
+    def _drop_feed(self):
+        self._bytes_in += self.feed.bytes_in
+        self.feed = None
+
+    @property
+    def bytes_in(self):
+        return self._bytes_in + (self.feed.bytes_in if self.feed else 0)
+
+    def _received(self, resp):
+        """resp.data, counting its size (the client doesn't expose the raw body; the JSON is within a few bytes of it)."""
+        data = getattr(resp, "data", None)
+        if data:
+            self._bytes_in += len(json.dumps(data, separators=(",", ":")))
+        return data
+
+    async def wait_for_data(self, timeout):
+        if self._subscribed():
+            return await self.cache.wait(timeout)
+        return await super().wait_for_data(timeout)
+
+    def probe_clock(self):
+        #needs a `server_time` SQL function returning extract(epoch from clock_timestamp())
+        if self._no_server_time:
+            return None
+        t0 = time.time()
+        try:
+            resp = self.client.rpc("server_time").execute()
+        except Exception as e:
+            print(f"⚠️  No server_time function, clock sync disabled: {e}")
+            self._no_server_time = True
+            return None
+        t3 = time.time()
+        server = float(resp.data)
+        return (t0, server, server, t3)
+
+    def _in_room(self, query):
+        #without the column every client shares one room
+        return query.eq("room", self.room) if ROOM_COLUMN else query
+
+    def upsert_player(self, data):
+        if AOI_GRID_COLUMN:
+            data = dict(data, cell=aoi.cell_key(float(data["x"]), float(data["y"])))
+        if ROOM_COLUMN:
+            data = dict(data, room=self.room)
+        self.client.table("players").upsert(data, on_conflict="player_id").execute()
+
+    def fetch_players(self, since, bounds=None):
+        if self._subscribed():
+            return self.cache.players_since(since, bounds)
+        query = self._in_room(self.client.table("players").select("*").gt("updated_at", since))
+        if bounds:
+            min_x, min_y, max_x, max_y = bounds
+            if AOI_GRID_COLUMN:
+                query = query.in_("cell", aoi.cell_keys_in_bounds(bounds))
+            query = query.gte("x", min_x).lte("x", max_x).gte("y", min_y).lte("y", max_y)
+        resp = query.order("updated_at").execute()
+        return self._received(resp) or []
+
+    def fetch_world(self, player_since, cannonball_since, bounds=None, exclude_player_id=None):
+        if self._subscribed():
+            return _cache_world(self.cache, player_since, cannonball_since, bounds, exclude_player_id)
+        #needs the `world_snapshot` SQL function from the ReadME; without it this is two requests
+        if self._no_world_snapshot:
+            return super().fetch_world(player_since, cannonball_since, bounds, exclude_player_id)
+        params = self._world_params(player_since, cannonball_since, bounds, exclude_player_id)
+        try:
+            resp = self.client.rpc("world_snapshot", params).execute()
+        except Exception as e:
+            print(f"⚠️  No world_snapshot function, fetching players and cannonballs separately: {e}")
+            self._no_world_snapshot = True
+            return super().fetch_world(player_since, cannonball_since, bounds, exclude_player_id)
+        data = self._received(resp) or {}
+        cannonballs = data.get("cannonballs") or []
+        for row in cannonballs:
+            if row.get("created_at") is not None:
+                row["created_at"] = _epoch(row["created_at"])
+        return WorldDelta(data.get("tick"), data.get("players") or [], cannonballs, ())
+
+    def _world_params(self, player_since, cannonball_since, bounds=None, exclude_player_id=None):
+        """The world_snapshot function's arguments."""
+        min_x, min_y, max_x, max_y = bounds or (None, None, None, None)
+        return {
+            "player_since": player_since,
+            "cannonball_since": _iso(cannonball_since),
+            "min_x": min_x, "min_y": min_y, "max_x": max_x, "max_y": max_y,
+            "exclude_player_id": exclude_player_id,
+            "room": self.room if ROOM_COLUMN else None,
+        }
+
+    def delete_player(self, player_id):
+        self.client.table("players").delete().eq("player_id", player_id).execute()
+        self.client.table("cannonballs").delete().eq("player_id", player_id).execute()
+
+    def insert_cannonball(self, data):
+        rows = self.insert_cannonballs([data])
+        return rows[0] if rows else None
+
+    def insert_cannonballs(self, rows):
+        # created_at is a timestamptz column, so send fire times as ISO strings
+        payload = []
+        for row in rows:
+            row = dict(row)
+            if isinstance(row.get("created_at"), (int, float)):
+                row["created_at"] = _iso(row["created_at"])
+            if ROOM_COLUMN:
+                row["room"] = self.room
+            payload.append(row)
+        resp = self.client.table("cannonballs").insert(payload).execute()
+        return getattr(resp, "data", None) or []
+
+    def fetch_cannonballs(self, since, exclude_player_id=None):
+        if self._subscribed():
+            return self.cache.cannonballs_since(since, exclude_player_id)
+        # created_at is a timestamptz column, so compare against ISO format
+        query = self._in_room(self.client.table("cannonballs").select("*").gte("created_at", _iso(since)))
+        if exclude_player_id:
+            query = query.neq("player_id", exclude_player_id)
+        resp = query.order("created_at").execute()
+        rows = self._received(resp) or []
+        #hand back epoch seconds like the other backends so callers can compare them
+        for row in rows:
+            if row.get("created_at") is not None:
+                row["created_at"] = _epoch(row["created_at"])
+        return rows
+
+    def list_rooms(self):
+        if not ROOM_COLUMN:
+            return {self.room: 0}
+        since = time.time() - ROOM_ACTIVE_WINDOW
+        resp = self.client.table("players").select("room").gt("updated_at", since).execute()
+        counts = {}
+        for row in self._received(resp) or []:
+            counts[row["room"]] = counts.get(row["room"], 0) + 1
+        return counts
+
+    def insert_chat(self, data):
+        resp = self.client.from_("chat").insert(data).execute()
+        return resp.data or None
+
+    def fetch_chats(self):
+        resp = self.client.table("chat").select("*").execute()
+        return self._received(resp) or []
+
+    def delete_chats(self):
+        self.client.table("chat").delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
+
+
+class _Reply:
+    """A control message someone is waiting for: the first one accept(msg) likes."""
+
+    def __init__(self, accept):
+        self.accept = accept
+        self.answer = None  # (msg, time it arrived)
+        self.done = Event()
+
+
+class UDPTransport(Transport):
+    """Client side of relay_server.py.
+
+    Updates go out as single binary datagrams and the relay pushes delta
+    snapshots of everyone else back every tick, so reads never wait on a
+    round trip: the fetch_* methods just drain the socket into a local cache
+    and filter it.
+    """
+
+    name = "udp"
+    #the socket is always non-blocking, so calls can run right on the event loop
+    blocking = False
+    authoritative = True
+    datagrams = True
+
+    def __init__(self, host=RELAY_HOST, port=RELAY_PORT, room=ROOM):
+        self.address = (host, port)
+        self.room = rooms.clean_room(room)
+        self.sock = None
+        self._lock = Lock()  # held only for non-blocking work: the event loop takes it too
+        self._waiting = []  # _Reply for each request waiting on its answer
+        self._loop = None
+        self._readable = None  # asyncio.Event set by the event loop when the socket has data
+        self._decoder = codec.SnapshotDecoder()
+        self._acked_seq = None
+        self._players = {}
+        self._cannonballs = {}
+        self._chats = {}
+        self._state = None  # newest (seq, state) the relay sent for our boat
+        self._hits = []
+        self._removed = deque(maxlen=CANNONBALL_QUEUE_SIZE * 4)  # cannonball ids the relay dropped, for fetch_world
+
+    def connect(self):
+        if self.sock is None:
+            print(f"🔗 Connecting to relay at {self.address[0]}:{self.address[1]} (room {self.room})...")
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.connect(self.address)
+            self.sock.setblocking(False)
+
+        #say hello and wait for the relay to answer (it replays the chat first)
+        self._send({"t": "hello", "room": self.room})
+        #the relay starts a fresh snapshot stream for us
+        self._decoder = codec.SnapshotDecoder()
+        self._acked_seq = None
+        deadline = time.time() + RELAY_CONNECT_TIMEOUT
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not select.select([self.sock], [], [], remaining)[0]:
+                raise socket.timeout("relay didn't answer the hello")
+            try:
+                data = self.sock.recv(RELAY_MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                continue
+            self.bytes_in += len(data)
+            if codec.packet_type(data) in (codec.SNAPSHOT, codec.STATE):
+                continue
+            msg = json.loads(data)
+            if msg.get("t") == "welcome":
+                #a dedicated server (game_server.py) also decides hits
+                self.owns_hits = "hits" in msg.get("authority", ())
+                break
+            self._apply(msg)
+
+    def close(self):
+        self._stop_watching()
+        if self.sock is not None:
+            try:
+                self._send({"t": "bye"})
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+
+    async def wait_for_data(self, timeout):
+        """Return as soon as the relay pushes something (True), or after timeout (False)."""
+        if self._readable is None:
+            loop = asyncio.get_running_loop()
+            try:
+                loop.add_reader(self.sock.fileno(), self._on_readable)
+            except NotImplementedError:
+                #event loops without reader support (Windows proactor) fall back to the interval
+                await asyncio.sleep(timeout)
+                return False
+            self._loop = loop
+            self._readable = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._readable.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _on_readable(self):
+        self._readable.set()
+
+    def _stop_watching(self):
+        if self._readable is not None:
+            try:
+                self._loop.remove_reader(self.sock.fileno())
+            except (OSError, ValueError, RuntimeError):
+                pass
+            self._loop = None
+            self._readable = None
+
+    def _send(self, msg):
+        self.sock.send(json.dumps(msg, separators=(",", ":")).encode())
+
+    def _request(self, msg, accept, timeout):
+        """Send msg and wait (briefly, on this thread) for the answer accept(reply) picks out.
+        Returns (reply, time it arrived), or None on timeout.
+
+        Whoever drains the socket next hands the answer over, so the lock is
+        never held while waiting and the event loop's fetches keep running.
+        """
+        reply = _Reply(accept)
+        sock = self.sock
+        with self._lock:
+            self._waiting.append(reply)
+            self._send(msg)
+        deadline = time.time() + timeout
+        try:
+            while not reply.done.is_set():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                #the event loop may drain the answer first, so check back at least every relay tick
+                if select.select([sock], [], [], min(remaining, RELAY_TICK_INTERVAL))[0]:
+                    with self._lock:
+                        self._drain()
+            return reply.answer
+        finally:
+            with self._lock:
+                if reply in self._waiting:
+                    self._waiting.remove(reply)
+
+    def _answer(self, msg, received):
+        """Hand msg to the request waiting for it. Returns False if nobody is."""
+        for reply in self._waiting:
+            if reply.accept(msg):
+                self._waiting.remove(reply)
+                reply.answer = (msg, received)
+                reply.done.set()
+                return True
+        return False
+
+    def probe_clock(self):
+        """Ping the relay and wait (briefly) for its answer."""
+        t0 = time.time()
+        answer = self._request({"t": "ping", "t0": t0},
+                               lambda msg: msg.get("t") == "pong" and msg.get("t0") == t0, CLOCK_PROBE_TIMEOUT)
+        if answer is None:
+            return None
+        msg, t3 = answer
+        return (t0, msg["t1"], msg["t2"], t3)
+
+    def list_rooms(self):
+        answer = self._request({"t": "rooms"}, lambda msg: msg.get("t") == "rooms", ROOM_QUERY_TIMEOUT)
+        return answer[0]["rooms"] if answer else {}
+
+    def _apply(self, msg):
+        kind = msg.get("t")
+        if kind == "chat":
+            row = msg["row"]
+            self._chats[row["id"]] = row
+        elif kind == "chat_clear":
+            self._chats.clear()
+        elif kind == "hit":
+            self._hits.append(msg)
+
+    def _apply_snapshot(self, data):
+        snapshot = self._decoder.decode(data)
+        if snapshot is None:
+            return
+        #snapshots carry the full player set, cannonballs only change
+        self._players = {row["player_id"]: row for row in snapshot.players}
+        for row in snapshot.new_cannonballs:
+            self._cannonballs[row["id"]] = row
+        for key in snapshot.removed:
+            if self._cannonballs.pop(key, None) is not None:
+                self._removed.append(key)
+
+    def _apply_state(self, data):
+        player_id, seq, state, ts = codec.decode_state(data)
+        if self._state is None or seq > self._state[0]:
+            self._state = (seq, state)
+
+    def _receive(self, data):
+        """Apply a binary packet, or return a JSON control message for the caller."""
+        kind = codec.packet_type(data)
+        if kind == codec.SNAPSHOT:
+            self._apply_snapshot(data)
+        elif kind == codec.STATE:
+            self._apply_state(data)
+        else:
+            return json.loads(data)
+        return None
+
+    def _drain(self):
+        """Apply every datagram the relay has pushed since the last call."""
+        while True:
+            try:
+                data = self.sock.recv(RELAY_MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                break
+            received = time.time()
+            self.bytes_in += len(data)
+            try:
+                msg = self._receive(data)
+                if msg is not None and not self._answer(msg, received):
+                    self._apply(msg)
+            except (ValueError, KeyError, codec.CodecError):
+                continue
+        if self._readable is not None:
+            self._readable.clear()
+
+        #tell the relay which snapshot to delta against next
+        seq = self._decoder.latest_seq
+        if seq is not None and seq != self._acked_seq:
+            self.sock.send(codec.encode_ack(seq))
+            self._acked_seq = seq
+
+        #shots only live for a few seconds, expire them locally
+        cutoff = time.time() - CANNONBALL_RETENTION
+        for cb_id in [k for k, v in self._cannonballs.items() if v["created_at"] < cutoff]:
+            del self._cannonballs[cb_id]
+
+    def upsert_player(self, data):
+        self.sock.send(codec.encode_player_update(data))
+
+    def fetch_players(self, since, bounds=None):
+        #the relay already trims snapshots to our area of interest; the box
+        #check here just keeps results the same as the other backends
+        with self._lock:
+            self._drain()
+            rows = [row for row in self._players.values() if row.get("updated_at", 0.0) > since
+                    and (not bounds or aoi.in_bounds(bounds, row["x"], row["y"]))]
+        return sorted(rows, key=lambda row: row["updated_at"])
+
+    def fetch_world(self, player_since, cannonball_since, bounds=None, exclude_player_id=None):
+        #every snapshot the relay pushes already holds both, so this is one drain of the socket
+        with self._lock:
+            self._drain()
+            players = [row for row in self._players.values() if row.get("updated_at", 0.0) > player_since
+                       and (not bounds or aoi.in_bounds(bounds, row["x"], row["y"]))]
+            cannonballs = [row for row in self._cannonballs.values()
+                           if row["created_at"] >= cannonball_since and row.get("player_id") != exclude_player_id]
+            removed = tuple(self._removed)
+            self._removed.clear()
+            tick = self._decoder.latest_seq
+        return WorldDelta(tick, sorted(players, key=lambda row: row["updated_at"]),
+                          sorted(cannonballs, key=lambda row: row["created_at"]), removed)
+
+    def delete_player(self, player_id):
+        self._send({"t": "leave", "player_id": player_id})
+
+    def send_inputs(self, player_id, inputs):
+        self.sock.send(codec.encode_inputs(player_id, inputs))
+
+    def fetch_authoritative_state(self):
+        with self._lock:
+            self._drain()
+            state, self._state = self._state, None
+        return state
+
+    def fetch_hits(self):
+        with self._lock:
+            self._drain()
+            hits, self._hits = self._hits, []
+        return hits
+
+    def insert_cannonball(self, data):
+        row = dict(data)
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", time.time())
+        self.sock.send(codec.encode_cannonball(row))
+        return row
+
+    def fetch_cannonballs(self, since, exclude_player_id=None):
+        with self._lock:
+            self._drain()
+            rows = [row for row in self._cannonballs.values()
+                    if row["created_at"] >= since and row.get("player_id") != exclude_player_id]
+        return sorted(rows, key=lambda row: row["created_at"])
+
+    def insert_chat(self, data):
+        self._send({"t": "chat", "row": data})
+        return [data]
+
+    def fetch_chats(self):
+        with self._lock:
+            self._drain()
+            return list(self._chats.values())
+
+    def delete_chats(self):
+        self._send({"t": "chat_clear"})
+
+
+class FeedTransport(Transport):
+    """Uses the local change feed stand-in (changefeed.py) as the whole backend.
+
+    Writes go up the websocket as "write" events and every change comes back
+    down it, so like the relay, reads are served from a local copy.
+    """
+
+    name = "feed"
+    blocking = False
+    push = True
+
+    def __init__(self, url=CHANGEFEED_URL, room=ROOM):
+        self.url = url
+        self.room = rooms.clean_room(room)
+        self.feed = None
+        self.cache = changefeed.ChangeCache()
+        self._bytes_in = 0  # what earlier connections received
+
+    @property
+    def bytes_in(self):
+        return self._bytes_in + (self.feed.bytes_in if self.feed else 0)
+
+    def connect(self):
+        print(f"🔗 Connecting to change feed at {self.url} (room {self.room})...")
+        self.close()
+        room_filter = f"room=eq.{self.room}"
+        self.cache = changefeed.ChangeCache()
+        self.feed = changefeed.ChangeFeed(self.url, ("players", "cannonballs", "chat"), self.cache.apply,
+                                          filters={"players": room_filter, "cannonballs": room_filter})
+        self.feed.connect()
+        #changes only cover what happens from now on, so start from what's there
+        for table in ("players", "cannonballs", "chat"):
+            reply = self.feed.call("select", {"table": table})
+            rows = (reply or {}).get("response", {}).get("rows", [])
+            if table != "chat":
+                rows = [row for row in rows if row.get("room") == self.room]
+            self.cache.load(table, rows)
+
+    def close(self):
+        if self.feed is not None:
+            self.feed.close()
+            self._bytes_in += self.feed.bytes_in
+            self.feed = None
+
+    async def wait_for_data(self, timeout):
+        return await self.cache.wait(timeout)
+
+    def _check(self):
+        #NetworkManager reconnects when a call raises
+        if self.feed is None or not self.feed.alive:
+            raise ConnectionError("change feed is down")
+
+    def _write(self, table, kind, record=None, match=None):
+        self._check()
+        self.feed.send("write", {"table": table, "type": kind, "record": record, "match": match})
+
+    def probe_clock(self):
+        t0 = time.time()
+        reply = self.feed.call("now", {}, CLOCK_PROBE_TIMEOUT)
+        t3 = time.time()
+        if not reply:
+            return None
+        server = reply["response"]["time"]
+        return (t0, server, server, t3)
+
+    def upsert_player(self, data):
+        self._write("players", "UPSERT", dict(data, room=self.room))
+
+    def fetch_players(self, since, bounds=None):
+        self._check()
+        return self.cache.players_since(since, bounds)
+
+    def delete_player(self, player_id):
+        self._write("players", "DELETE", match={"player_id": player_id})
+        self._write("cannonballs", "DELETE", match={"player_id": player_id})
+
+    def list_rooms(self):
+        counts = {}
+        reply = self.feed.call("select", {"table": "players"})
+        cutoff = time.time() - ROOM_ACTIVE_WINDOW
+        for row in (reply or {}).get("response", {}).get("rows", []):
+            if float(row.get("updated_at") or 0.0) > cutoff:
+                counts[row.get("room")] = counts.get(row.get("room"), 0) + 1
+        return counts
+
+    def insert_cannonball(self, data):
+        row = dict(data, room=self.room)
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", time.time())
+        self._write("cannonballs", "INSERT", row)
+        return row
+
+    def fetch_cannonballs(self, since, exclude_player_id=None):
+        self._check()
+        return self.cache.cannonballs_since(since, exclude_player_id)
+
+    def fetch_world(self, player_since, cannonball_since, bounds=None, exclude_player_id=None):
+        self._check()
+        return _cache_world(self.cache, player_since, cannonball_since, bounds, exclude_player_id)
+
+    def insert_chat(self, data):
+        row = dict(data)
+        row.setdefault("id", str(uuid.uuid4()))
+        self._write("chat", "INSERT", row)
+        return [row]
+
+    def fetch_chats(self):
+        return self.cache.chats()
+
+    def delete_chats(self):
+        self._write("chat", "DELETE", match={})
+
+
+class SharedMemoryTransport(Transport):
+    """Clients on the same machine, talking through memory-mapped ring files (shmring.py).
+
+    Each client writes its updates (relay packets, JSON for the rest) to its own
+    ring in the room's directory and reads everyone else's rings. There's no
+    server and no socket, so multiplayer-tester.py can run many clients and
+    profile the client side on its own.
+    """
+
+    name = "shm"
+    blocking = False
+    push = True
+
+    def __init__(self, directory=SHM_DIR, room=ROOM):
+        self.root = directory
+        self.room = rooms.clean_room(room)
+        self.directory = os.path.join(directory, self._folder(self.room))
+        self.ring = None
+        self.peers = {}  # path -> shmring.Ring
+        self.cache = changefeed.ChangeCache()
+        self._lock = Lock()  # one reader of the rings at a time
+        self._next_scan = 0.0
+
+    @staticmethod
+    def _folder(room):
+        return re.sub(r"[^A-Za-z0-9_-]", "_", room)
+
+    def connect(self):
+        if self.ring is None:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{uuid.uuid4().hex}.ring")
+            self.ring = shmring.Ring.create(path, SHM_RING_SLOTS, SHM_SLOT_SIZE)
+            print(f"🔗 Shared memory ring {path}")
+        self._scan(time.time())
+
+    def close(self):
+        for peer in self.peers.values():
+            peer.close()
+        self.peers = {}
+        if self.ring is not None:
+            self.ring.close(unlink=True)
+            self.ring = None
+
+    def _scan(self, now):
+        """Map rings that appeared, drop ones that went away (and clear up after crashed clients)."""
+        self._next_scan = now + SHM_SCAN_INTERVAL
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(".ring")]
+        except OSError:
+            return
+        paths = {os.path.join(self.directory, name) for name in names} - {self.ring.path}
+        for path in list(self.peers):
+            if path not in paths:
+                self.peers.pop(path).close()
+        for path in paths - set(self.peers):
+            try:
+                peer = shmring.Ring.open(path)
+            except (OSError, ValueError, shmring.RingError):
+                continue  # still being created
+            if now - peer.last_write > SHM_STALE_AFTER:
+                peer.close(unlink=True)
+                continue
+            self.peers[path] = peer
+
+    def _poll(self):
+        if self.ring is None:
+            raise ConnectionError("shared memory ring is closed")
+        with self._lock:
+            now = time.time()
+            if now >= self._next_scan:
+                self._scan(now)
+            for peer in self.peers.values():
+                for record in peer.read():
+                    self.bytes_in += len(record)
+                    try:
+                        self._apply(record)
+                    except (ValueError, KeyError, codec.CodecError):
+                        continue
+
+    def _apply(self, record):
+        kind = codec.packet_type(record)
+        if kind == codec.PLAYER_UPDATE:
+            self.cache.apply(changefeed.Change("players", "UPDATE", codec.decode_player_update(record), {}))
+        elif kind == codec.CANNONBALL:
+            self.cache.apply(changefeed.Change("cannonballs", "INSERT", codec.decode_cannonball(record), {}))
+        else:
+            msg = json.loads(record)
+            kind = msg.get("t")
+            if kind == "leave":
+                pid = msg["player_id"]
+                self.cache.apply(changefeed.Change("players", "DELETE", {}, {"player_id": pid}))
+                for row in [r for r in self.cache.tables["cannonballs"].values() if r.get("player_id") == pid]:
+                    self.cache.apply(changefeed.Change("cannonballs", "DELETE", {}, {"id": row["id"]}))
+            elif kind == "chat":
+                self.cache.apply(changefeed.Change("chat", "INSERT", msg["row"], {}))
+            elif kind == "chat_clear":
+                for row in self.cache.chats():
+                    self.cache.apply(changefeed.Change("chat", "DELETE", {}, {"id": row["id"]}))
+
+    def _write(self, data):
+        if self.ring is None:
+            raise ConnectionError("shared memory ring is closed")
+        self.ring.write(data)
+
+    def _send(self, msg):
+        self._write(json.dumps(msg, separators=(",", ":")).encode())
+
+    async def wait_for_data(self, timeout):
+        """Peek at the rings every SHM_POLL_INTERVAL until something new is there (True) or timeout (False)."""
+        deadline = time.time() + timeout
+        while True:
+            if any(peer.pending() for peer in self.peers.values()):
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(SHM_POLL_INTERVAL, remaining))
+
+    def upsert_player(self, data):
+        self._write(codec.encode_player_update(data))
+
+    def fetch_players(self, since, bounds=None):
+        self._poll()
+        return self.cache.players_since(since, bounds)
+
+    def delete_player(self, player_id):
+        self._send({"t": "leave", "player_id": player_id})
+
+    def list_rooms(self):
+        #one ring per client, one folder per room
+        counts = {}
+        try:
+            for folder in os.listdir(self.root):
+                rings = [n for n in os.listdir(os.path.join(self.root, folder)) if n.endswith(".ring")]
+                if rings:
+                    counts[folder] = len(rings)
+        except OSError:
+            pass
+        return counts
+
+    def insert_cannonball(self, data):
+        row = dict(data)
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", time.time())
+        self._write(codec.encode_cannonball(row))
+        return row
+
+    def fetch_cannonballs(self, since, exclude_player_id=None):
+        self._poll()
+        return self.cache.cannonballs_since(since, exclude_player_id)
+
+    def fetch_world(self, player_since, cannonball_since, bounds=None, exclude_player_id=None):
+        self._poll()
+        return _cache_world(self.cache, player_since, cannonball_since, bounds, exclude_player_id)
+
+    def insert_chat(self, data):
+        msg = {"t": "chat", "row": data}
+        self._send(msg)
+        self._apply(json.dumps(msg).encode())  # nobody else echoes it back to us
+        return [data]
+
+    def fetch_chats(self):
+        self._poll()
+        return self.cache.chats()
+
+    def delete_chats(self):
+        self._send({"t": "chat_clear"})
+        self._apply(b'{"t":"chat_clear"}')
+
+
+TRANSPORTS = {
+    "supabase": SupabaseTransport,
+    "udp": UDPTransport,
+    "feed": FeedTransport,
+    "shm": SharedMemoryTransport,
+}
+
+
+def create_transport(kind=None, room=ROOM):
+    """Build the transport named in config (or the one passed in) for room."""
+    kind = kind or TRANSPORT
+    if kind not in TRANSPORTS:
+        raise ValueError(f"Unknown transport '{kind}' (expected one of: {', '.join(TRANSPORTS)})")
+    if kind == "udp":
+        #each room lives on one relay
+        host, port = rooms.RoomDirectory().relay_for(room)
+        transport = UDPTransport(host, port, room=room)
+    else:
+        transport = TRANSPORTS[kind](room=room)
+    if NETSIM_PROFILE:
+        import netsim  # it builds on this module
+        transport = netsim.wrap(transport, NETSIM_PROFILE)
+    return transport
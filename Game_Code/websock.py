@@ -0,0 +1,202 @@
+"""Just enough RFC 6455 WebSocket for the change feed, on the standard library.
+
+Text and binary messages, ping/pong and close; no extensions. connect() is
+the client end (ws:// or wss://), accept() the server end of a socket that
+just came out of listen().
+"""
+
+import base64
+import hashlib
+import os
+import socket
+import ssl
+import struct
+from threading import Lock
+from urllib.parse import urlsplit
+
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+TEXT, BINARY, CLOSE, PING, PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+MAX_MESSAGE = 16 * 1024 * 1024
+
+
+class WebSocketError(Exception):
+    pass
+
+
+def _mask(payload, mask):
+    #xor as one big integer, much faster than byte by byte
+    n = len(payload)
+    key = int.from_bytes((mask * (n // 4 + 1))[:n], "big")
+    return (int.from_bytes(payload, "big") ^ key).to_bytes(n, "big")
+
+
+def _accept_key(key):
+    return base64.b64encode(hashlib.sha1(key.encode() + _GUID).digest()).decode()
+
+
+class WebSocket:
+    def __init__(self, sock, client, buffered=b""):
+        self.sock = sock
+        self.client = client  # clients mask what they send, servers don't
+        self._buffer = buffered
+        self._send_lock = Lock()
+        self.closed = False
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def _read(self, n):
+        while len(self._buffer) < n:
+            chunk = self.sock.recv(max(4096, n - len(self._buffer)))
+            if not chunk:
+                raise ConnectionError("websocket closed by peer")
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:n], self._buffer[n:]
+        return data
+
+    def _send_frame(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        mask_bit = 0x80 if self.client else 0
+        n = len(payload)
+        if n < 126:
+            header += bytes([mask_bit | n])
+        elif n < 65536:
+            header += bytes([mask_bit | 126]) + struct.pack("!H", n)
+        else:
+            header += bytes([mask_bit | 127]) + struct.pack("!Q", n)
+        if self.client:
+            mask = os.urandom(4)
+            header += mask
+            payload = _mask(payload, mask)
+        with self._send_lock:
+            self.sock.sendall(header + payload)
+
+    def send(self, message):
+        """Send a str as a text message or bytes as a binary one."""
+        if isinstance(message, str):
+            self._send_frame(TEXT, message.encode())
+        else:
+            self._send_frame(BINARY, bytes(message))
+
+    def recv(self):
+        """The next message (str or bytes), answering pings on the way; None once closed."""
+        parts = []
+        opcode = None
+        while True:
+            first, second = self._read(2)
+            op = first & 0x0F
+            n = second & 0x7F
+            if n == 126:
+                n = struct.unpack("!H", self._read(2))[0]
+            elif n == 127:
+                n = struct.unpack("!Q", self._read(8))[0]
+            if n > MAX_MESSAGE:
+                raise WebSocketError(f"frame of {n} bytes")
+            mask = self._read(4) if second & 0x80 else None
+            payload = self._read(n)
+            if mask:
+                payload = _mask(payload, mask)
+
+            if op == PING:
+                self._send_frame(PONG, payload)
+                continue
+            if op == PONG:
+                continue
+            if op == CLOSE:
+                if not self.closed:
+                    self.closed = True
+                    try:
+                        self._send_frame(CLOSE, payload[:2])
+                    except OSError:
+                        pass
+                return None
+            if op != 0:
+                opcode = op  # first frame of a message (0 continues one)
+            parts.append(payload)
+            if first & 0x80:
+                data = b"".join(parts)
+                return data.decode() if opcode == TEXT else data
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                self._send_frame(CLOSE, struct.pack("!H", 1000))
+            except OSError:
+                pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def _read_headers(sock):
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ConnectionError("closed during websocket handshake")
+        data += chunk
+        if len(data) > 65536:
+            raise WebSocketError("handshake too large")
+    head, rest = data.split(b"\r\n\r\n", 1)
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return lines[0], headers, rest
+
+
+def connect(url, timeout=5.0):
+    """Open a client WebSocket to a ws:// or wss:// url."""
+    parts = urlsplit(url)
+    secure = parts.scheme == "wss"
+    port = parts.port or (443 if secure else 80)
+    sock = socket.create_connection((parts.hostname, port), timeout=timeout)
+    try:
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parts.hostname)
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        sock.sendall((
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {parts.hostname}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode())
+        status, headers, rest = _read_headers(sock)
+        if " 101 " not in status + " " or headers.get("sec-websocket-accept") != _accept_key(key):
+            raise WebSocketError(f"handshake refused: {status}")
+    except Exception:
+        sock.close()
+        raise
+    sock.settimeout(None)
+    return WebSocket(sock, client=True, buffered=rest)
+
+
+def upgrade(sock, key, buffered=b""):
+    """Answer a websocket upgrade request whose headers were already read (key: Sec-WebSocket-Key)."""
+    sock.sendall((
+        "HTTP/1.1 101 Switching Protocols\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Accept: {_accept_key(key)}\r\n\r\n"
+    ).encode())
+    return WebSocket(sock, client=False, buffered=buffered)
+
+
+def accept(sock):
+    """Finish the server side of the handshake on an accepted socket. Returns (WebSocket, request path)."""
+    request, headers, rest = _read_headers(sock)
+    key = headers.get("sec-websocket-key")
+    if not key or headers.get("upgrade", "").lower() != "websocket":
+        sock.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+        raise WebSocketError(f"not a websocket request: {request}")
+    path = request.split(" ")[1] if request.count(" ") >= 2 else "/"
+    return upgrade(sock, key, rest), path